@@ -0,0 +1,96 @@
+from dotenv import dotenv_values
+from Backend.PersistentCache import PersistentCache, NormalizeQuery
+from Backend.KeywordRules import RegisterRules, Hits
+import threading
+import hashlib
+import time
+import os
+import re
+
+env_vars = dotenv_values(".env")
+# Off by default: a cached answer does not pick up a better model or newer facts
+AnswerCacheEnabled = env_vars.get("AnswerCache", "False").lower() == "true"
+AnswerCacheSize = int(env_vars.get("AnswerCacheSize", 256))
+AnswerCacheTTL = float(env_vars.get("AnswerCacheTTL", 24 * 3600))
+AnswerCachePath = os.path.join("Data", "AnswerCache.json")
+
+# Words pointing back at earlier turns or at the user: the answer depends on the conversation
+ContextWords = {
+    "he", "she", "him", "her", "his", "hers", "it", "its", "they", "them", "their",
+    "this", "that", "these", "those", "i", "me", "my", "mine", "we", "us", "our",
+}
+RegisterRules({
+    "answer.followup": [
+        "tell me more", "more about", "what about", "elaborate", "continue", "go on",
+        "again", "you said", "previous", "earlier", "the same", "above",
+    ],
+})
+# DetectQueryType results whose answer changes with the clock
+TimeSensitiveTypes = {"news", "weather", "datetime"}
+
+stats = {"hits": 0, "misses": 0, "skipped_context": 0, "skipped_time": 0, "stored": 0, "saved_time": 0.0}
+stats_lock = threading.Lock()
+
+
+def ContextFingerprint(*parts):
+    """Hash of whatever shapes an answer besides the question (system prompt, model)"""
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+def SkipReason(query):
+    """"context" or "time" if `query` must not be answered from the cache, else None"""
+    # Imported here so loading the chatbot does not load the search engine
+    from Backend.RealtimeSearchEngine import DetectQueryType
+    text = query.lower()
+    hits = Hits(text)
+    if ContextWords & set(re.findall(r"[a-z]+", text)) or "answer.followup" in hits:
+        return "context"
+    if "query.temporal" in hits or DetectQueryType(text) in TimeSensitiveTypes:
+        return "time"
+    return None
+
+
+class AnswerCache:
+    """
+    ChatBot answers to self-contained questions ("who was akbar?"), kept for
+    AnswerCacheTTL in an LRU of AnswerCacheSize entries that survives restarts.
+    Keys are the context fingerprint plus the normalized query, so changing the
+    system prompt or model never serves an answer written for the old one.
+    """
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.cache = PersistentCache(AnswerCachePath, max_entries=AnswerCacheSize, ttl=AnswerCacheTTL)
+
+    def key(self, query):
+        """Cache key for `query`, or None if its answer may not be cached"""
+        reason = SkipReason(query)
+        if reason:
+            with stats_lock:
+                stats[f"skipped_{reason}"] += 1
+            return None
+        return f"{self.fingerprint} {NormalizeQuery(query)}"
+
+    def get(self, key):
+        start = time.time()
+        entry = self.cache.get(key)
+        with stats_lock:
+            if entry is None:
+                stats["misses"] += 1
+                return None
+            stats["hits"] += 1
+            stats["saved_time"] += max(0.0, entry["seconds"] - (time.time() - start))
+        print("[AnswerCache] Hit")
+        return entry["answer"]
+
+    def set(self, key, answer, seconds):
+        """Remember `answer` and how long it took to generate"""
+        self.cache.set(key, {"answer": answer, "seconds": seconds})
+        with stats_lock:
+            stats["stored"] += 1
+
+
+def Stats():
+    with stats_lock:
+        lookups = stats["hits"] + stats["misses"]
+        return dict(stats, hit_rate=stats["hits"] / lookups if lookups else 0.0)
@@ -1,13 +1,18 @@
 # Backend/Automation.py
 
-from AppOpener import close, open as appopen
 from webbrowser import open as webopen
-from pywhatkit import search, playonyt
 import subprocess
 import os
 import asyncio
 import shutil
 from pathlib import Path
+from Backend.Tracing import Span, Traced
+from Backend.Startup import LazyModule
+from Backend.Cancellation import CurrentToken, Cancelled
+
+# Slow to import (pywhatkit checks the internet connection); loaded on first use
+AppOpener = LazyModule("AppOpener")
+pywhatkit = LazyModule("pywhatkit")
 
 valid_functions = [
     "open", "close", "play", "system", "content", 
@@ -23,7 +28,7 @@ def OpenApp(app_name):
     """Open application using AppOpener with fallback"""
     try:
         print(f"[OpenApp] Attempting to open: {app_name}")
-        appopen(app_name, match_closest=True, output=True, throw_error=True)
+        AppOpener.open(app_name, match_closest=True, output=True, throw_error=True)
         print(f"[OpenApp] Successfully opened: {app_name}")
         return True
     except Exception as e:
@@ -81,7 +86,7 @@ def CloseApp(app_name):
     """Close application using AppOpener"""
     try:
         print(f"[CloseApp] Attempting to close: {app_name}")
-        close(app_name, match_closest=True, output=True, throw_error=True)
+        AppOpener.close(app_name, match_closest=True, output=True, throw_error=True)
         print(f"[CloseApp] Successfully closed: {app_name}")
         return True
     except Exception as e:
@@ -111,7 +116,7 @@ def PlayYoutube(query):
     """Play video on YouTube"""
     try:
         print(f"[PlayYoutube] Playing: {query}")
-        playonyt(query)
+        pywhatkit.playonyt(query)
         return True
     except Exception as e:
         print(f"[PlayYoutube] Error: {e}")
@@ -127,7 +132,7 @@ def GoogleSearch(query):
     """Search on Google"""
     try:
         print(f"[GoogleSearch] Searching: {query}")
-        search(query)
+        pywhatkit.search(query)
         return True
     except Exception as e:
         print(f"[GoogleSearch] Error: {e}")
@@ -487,6 +492,16 @@ def ParseCommand(cmd):
 
 # ==================== MAIN AUTOMATION ====================
 
+async def TimedTask(name, coroutine):
+    """Await a task inside its own trace span, unless the turn was cancelled before it started"""
+    token = CurrentToken()
+    if token.cancelled:
+        coroutine.close()
+        raise Cancelled(token.reason)
+    with Span(f"automation.{name.replace(' ', '_')}"):
+        return await coroutine
+
+@Traced("automation")
 async def Automation(commands):
     """
     Main automation function
@@ -505,6 +520,7 @@ async def Automation(commands):
     print(f"{'='*60}\n")
 
     funcs = []
+    func_names = []
     command_descriptions = []
 
     for idx, cmd in enumerate(commands):
@@ -583,10 +599,16 @@ async def Automation(commands):
         else:
             print(f"[Automation] ⚠️  No handler for function: {func_name}")
 
+        if len(funcs) > len(func_names):
+            func_names.append(func_name)
+
     # Execute all functions concurrently
     if funcs:
         print(f"\n[Automation] Executing {len(funcs)} task(s)...\n")
-        results = await asyncio.gather(*funcs, return_exceptions=True)
+        results = await asyncio.gather(
+            *(TimedTask(name, func) for name, func in zip(func_names, funcs)),
+            return_exceptions=True
+        )
         
         print(f"\n{'='*60}")
         print(f"[Automation] Execution Results")
@@ -0,0 +1,131 @@
+from contextlib import contextmanager
+import contextvars
+import threading
+import functools
+import re
+
+# Phrases that only interrupt the assistant instead of starting a new turn
+StopCommands = {"stop", "stop it", "stop talking", "stop speaking", "cancel", "be quiet", "quiet", "enough", "shut up"}
+
+
+class Cancelled(Exception):
+    """Raised inside a backend when its turn has been cancelled"""
+
+
+class CancelToken:
+    """
+    Cooperative cancellation flag for one turn.
+    Backends call check() (or test .cancelled) between units of work and use
+    wait() instead of sleep() so a cancel wakes them immediately.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.reason = None
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.reason = reason
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[Cancellation] Callback error: {e}")
+
+    def on_cancel(self, callback):
+        """Call `callback()` once when the token is cancelled (right away if it already is)"""
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        callback()
+
+    def check(self):
+        if self.event.is_set():
+            raise Cancelled(self.reason)
+
+    def wait(self, timeout):
+        """Sleep up to `timeout` seconds; returns True as soon as the token is cancelled"""
+        return self.event.wait(timeout)
+
+
+# Token of the turn the current code runs for; copied into TaskGraph nodes and
+# speech threads together with the rest of the context
+current_token = contextvars.ContextVar("current_token", default=None)
+never_cancelled = CancelToken()
+
+
+def CurrentToken():
+    """The running turn's token, or one that is never cancelled outside a turn"""
+    return current_token.get() or never_cancelled
+
+
+class TurnManager:
+    """
+    Tracks the newest turn. Starting a turn cancels the previous one, so
+    stale LLM streams, searches and speech stop as soon as the user moves on.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = None
+
+    def begin(self, reason="superseded by a new command"):
+        token = CancelToken()
+        with self.lock:
+            previous, self.current = self.current, token
+        if previous:
+            previous.cancel(reason)
+        return token
+
+    def cancel(self, reason="stopped by user"):
+        """Cancel the running turn, if any; returns True if one was running"""
+        with self.lock:
+            previous, self.current = self.current, None
+        if previous:
+            previous.cancel(reason)
+        return previous is not None
+
+    def end(self, token):
+        with self.lock:
+            if self.current is token:
+                self.current = None
+
+
+# Turns of the local (GUI/voice) assistant
+turns = TurnManager()
+
+
+@contextmanager
+def Turn(manager=turns):
+    """Run the enclosed code as a new turn, cancelling the previous one"""
+    token = manager.begin()
+    reset = current_token.set(token)
+    try:
+        yield token
+    finally:
+        current_token.reset(reset)
+        manager.end(token)
+
+
+def Cancellable(func):
+    """Decorator: every call runs as a new turn of the local assistant"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with Turn():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def IsStopCommand(text):
+    return re.sub(r"[^a-z ]", "", str(text).lower()).strip() in StopCommands
@@ -0,0 +1,234 @@
+from json import load, dumps, loads
+from dotenv import dotenv_values
+import threading
+import atexit
+import time
+import os
+
+# One JSON message per line; appends never rewrite earlier messages
+ChatLogPath = os.path.join("Data", "ChatLog.jsonl")
+
+env_vars = dotenv_values(".env")
+# fsync every batch so a crash or power cut loses at most the last flush interval
+ChatLogFsync = env_vars.get("ChatLogFsync", "True").lower() == "true"
+# Seconds the writer waits to batch appends from concurrent turns
+ChatLogFlushInterval = float(env_vars.get("ChatLogFlushInterval", 0.2))
+# Failed writes are retried with exponential backoff up to this delay, and this many times in a row
+ChatLogRetryMaxDelay = float(env_vars.get("ChatLogRetryMaxDelay", 30))
+ChatLogMaxRetries = int(env_vars.get("ChatLogMaxRetries", 8))
+
+# Guards the table of open stores
+ChatLogLock = threading.RLock()
+
+
+class ChatLogStore:
+    """
+    Append-only JSONL chat log with an in-memory index of line offsets,
+    written by one background thread.
+    append() queues the new messages and returns; the writer waits
+    ChatLogFlushInterval seconds for more to arrive, then writes the whole
+    batch with one write + fsync, so concurrent turns never race on the file.
+    Readers see queued messages at once. Tail reads seek straight to the first
+    wanted message, so only the queued messages are held in memory.
+    A line half-written by a crash is cut off on open.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()  # guards offsets, size and pending
+        self.write_lock = threading.Lock()  # one flush at a time (writer thread or shutdown)
+        self.offsets = []  # byte offset of every message line on disk
+        self.size = 0
+        self.pending = []  # (message, encoded line) not yet on disk
+        self.wake = threading.Event()
+        self.closed = False
+        self.failing = False
+        self.counters = {"appends": 0, "writes": 0, "lines": 0, "failed_writes": 0}
+        MigrateJsonLog(path)
+        self.open()
+        threading.Thread(target=self.run, daemon=True, name="ChatLogWriter").start()
+
+    def open(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            print(f"[ChatLog] Dropping a partially written message at the end of {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        offset = 0
+        for line in data[:end].splitlines(keepends=True):
+            if line.strip():
+                self.offsets.append(offset)
+            offset += len(line)
+        self.size = end
+
+    def append(self, messages):
+        entries = [(dict(message), dumps(message, ensure_ascii=False).encode("utf-8") + b"\n") for message in messages]
+        with self.lock:
+            self.pending.extend(entries)
+            self.counters["appends"] += 1
+        self.wake.set()
+
+    def run(self):
+        while not self.closed:
+            self.wake.wait()
+            # Let appends from other turns pile up so they share one write
+            time.sleep(ChatLogFlushInterval)
+            self.wake.clear()
+            failures = 0
+            while not self.flush():
+                failures += 1
+                if failures >= ChatLogMaxRetries:
+                    # The messages stay queued (and readable); the next append or exit tries again
+                    print(f"[ChatLog] Giving up on {self.path} after {failures} failed writes; "
+                          f"{len(self.pending)} messages are only in memory")
+                    break
+                time.sleep(min(ChatLogRetryMaxDelay, ChatLogFlushInterval * 2 ** failures))
+
+    def flush(self):
+        """Write every queued message now (also called at exit); returns False if the write failed"""
+        with self.write_lock:
+            with self.lock:
+                batch = [line for _, line in self.pending]
+            if not batch:
+                return True
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "ab") as f:
+                    f.write(b"".join(batch))
+                    f.flush()
+                    if ChatLogFsync:
+                        os.fsync(f.fileno())
+            except OSError as e:
+                with self.lock:
+                    self.counters["failed_writes"] += 1
+                if not self.failing:
+                    print(f"[ChatLog] Could not write {self.path}, retrying with backoff: {e}")
+                self.failing = True
+                return False
+            if self.failing:
+                print(f"[ChatLog] Writing {self.path} again")
+                self.failing = False
+            with self.lock:
+                # Appends made during the write stay queued behind this batch
+                del self.pending[:len(batch)]
+                for line in batch:
+                    self.offsets.append(self.size)
+                    self.size += len(line)
+                self.counters["writes"] += 1
+                self.counters["lines"] += len(batch)
+            return True
+
+    def close(self):
+        """Write what is queued and stop the writer thread"""
+        self.closed = True
+        self.wake.set()
+        self.flush()
+
+    def read(self, last=None):
+        """All messages, or only the `last` N"""
+        return self.tail(last)[1]
+
+    def tail(self, last=None):
+        """(index of the first message returned, the last N messages); all of them if `last` is None"""
+        with self.lock:
+            total = len(self.offsets) + len(self.pending)
+        first = max(0, total - last) if last is not None else 0
+        return first, self.slice(first, total)
+
+    def slice(self, start, end):
+        """Messages start..end-1, like list slicing with non-negative indices"""
+        with self.lock:
+            on_disk = len(self.offsets)
+            begin = self.offsets[start] if start < on_disk else self.size
+            stop = self.offsets[end] if end < on_disk else self.size
+            queued = [message for message, _ in self.pending[max(0, start - on_disk):max(0, end - on_disk)]]
+        messages = []
+        if stop > begin:
+            try:
+                with open(self.path, "rb") as f:
+                    f.seek(begin)
+                    data = f.read(stop - begin)
+            except FileNotFoundError:
+                data = b""
+            for line in data.splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    messages.append(loads(line))
+                except ValueError:
+                    print(f"[ChatLog] Skipping a corrupt line in {self.path}")
+        return messages + queued
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, messages=len(self.offsets) + len(self.pending), pending=len(self.pending))
+
+    def __len__(self):
+        with self.lock:
+            return len(self.offsets) + len(self.pending)
+
+
+stores = {}
+
+
+def Store(path=ChatLogPath):
+    with ChatLogLock:
+        store = stores.get(path)
+        if store is None:
+            store = stores[path] = ChatLogStore(path)
+        return store
+
+
+def MigrateJsonLog(path):
+    """One-time conversion of the old whole-file ChatLog.json next to `path`"""
+    legacy_path = os.path.splitext(path)[0] + ".json"
+    if legacy_path == path or os.path.exists(path) or not os.path.exists(legacy_path):
+        return
+    try:
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            messages = load(f)
+    except ValueError as e:
+        print(f"[ChatLog] Could not migrate {legacy_path}: {e}")
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for message in messages:
+            f.write(dumps(message, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    os.replace(legacy_path, legacy_path + ".migrated")
+    print(f"[ChatLog] Migrated {len(messages)} messages from {legacy_path}")
+
+
+def ReadChatLog(path=ChatLogPath, last=None):
+    """Return the stored conversation (or its `last` N messages); empty if there is none"""
+    return Store(path).read(last)
+
+
+def AppendChatLog(new_messages, path=ChatLogPath):
+    """Queue messages for the log's writer; they are visible to readers at once"""
+    Store(path).append(list(new_messages))
+
+
+def CloseChatLog(path):
+    """Write and forget the store of `path` (e.g. when a server session ends); it is reopened on next use"""
+    with ChatLogLock:
+        store = stores.pop(path, None)
+    if store:
+        store.close()
+
+
+def FlushChatLogs():
+    """Write every store's queued messages now; call before os._exit(), which skips atexit"""
+    with ChatLogLock:
+        open_stores = list(stores.values())
+    for store in open_stores:
+        store.flush()
+
+
+atexit.register(FlushChatLogs)
@@ -1,19 +1,24 @@
-import json  # Ensure the import is used
-from json import load, dump
 from dotenv import dotenv_values
-import requests
 import datetime
-from groq import Groq
+from Backend.ChatLog import AppendChatLog, ChatLogPath
+from Backend.ContextWindow import PackContext, MessageTokens
+from Backend.PromptCompiler import EstimateTokens
+from Backend.Streaming import Consume, AsyncIterate
+from Backend.Tracing import Span, Traced
+from Backend.Startup import Lazy, LazyModule
+from Backend.LLMRouter import RouteStream, ChatRoutes
+from Backend.Cancellation import CurrentToken, Cancelled
+from Backend.AnswerCache import AnswerCache, AnswerCacheEnabled, ContextFingerprint
+import time
 
 # Load environment variables
 env_vars = dotenv_values(".env")
 
 Username = env_vars.get("Username")
 Assistantname = env_vars.get("Assistantname")
-GroqAPIKey = env_vars.get("GroqAPIKey")
 
-# Initialize Groq client
-client = Groq(api_key=GroqAPIKey)
+# Imported on first use to keep startup fast
+requests = LazyModule("requests")
 
 messages = []
 
@@ -28,17 +33,10 @@ SystemChatBot = [
     {"role": "system", "content": System}
 ]
 
-# Load chat log
-try:
-    with open(r"Data\ChatLog.json", "r") as f:
-        messages = load(f)
-except FileNotFoundError:
-    with open(r"Data\ChatLog.json", "w") as f:
-        dump([], f)
-except json.JSONDecodeError:
-    print("ChatLog.json is empty or corrupted. Initializing with an empty list.")
-    with open(r"Data\ChatLog.json", "w") as f:
-        dump([], f)
+ChatModel = "llama-3.3-70b-versatile"
+
+# Answers to repeated self-contained questions (opt-in, see Backend/AnswerCache.py)
+answer_cache = Lazy("answer.cache", lambda: AnswerCache(ContextFingerprint(System, ChatModel)), warm=AnswerCacheEnabled)
 
 # Real-time info
 def RealtimeInformation():
@@ -63,52 +61,116 @@ def AnswerModifier(Answer):
     modified_answer = '\n'.join(non_empty_lines)
     return modified_answer
 
-# Main ChatBot function
-def ChatBot(Query):
-    """Send the user's query to the chatbot and return the AI's response"""
-    try:
-        with open(r"Data\ChatLog.json", "r") as f:
-            messages = load(f)
+def FreshAnswer(Query, LogPath, token, meta):
+    """
+    Yield the text deltas of a fresh answer (stops early if the turn is cancelled).
+    Groq answers, hedged with the secondary provider when it is slow (see Backend/LLMRouter.py).
+    """
+    # Recent turns within the token budget, plus a summary of older ones
+    messages = PackContext(LogPath)
+
+    messages.append({"role": "user", "content": f"{Query}"})
 
-        messages.append({"role": "user", "content": f"{Query}"})
+    request = SystemChatBot + [{"role": "system", "content": RealtimeInformation()}] + messages
+    meta["prompt_tokens"] = sum(MessageTokens(message) for message in request)
 
+    with Span("chatbot.groq", history=len(messages)) as span:
         # Use updated model
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=SystemChatBot + [{"role": "system", "content": RealtimeInformation()}] + messages,
+        completion = RouteStream(
+            ChatRoutes(ChatModel),
+            request,
+            meta,
             max_tokens=1024,
             temperature=0.7,
             top_p=1,
-            stream=True,
             stop=None
         )
 
-        Answer = ""
-
-        for chunk in completion:
-            if chunk.choices[0].delta.content:
-                Answer += chunk.choices[0].delta.content
-
-        Answer = Answer.replace("</s>", "")
-        Answer = AnswerModifier(Answer)
-
-        messages.append({"role": "assistant", "content": Answer})
-
-        with open(r"Data\ChatLog.json", "w") as f:
-            dump(messages, f, indent=4)
-
-        return Answer
-
+        first = True
+
+        for delta in completion:
+            if token.cancelled:
+                # Closing the stream stops the request and frees its connection
+                span.set(cancelled=True)
+                completion.close()
+                break
+            if first:
+                span.set(ttft=time.time() - span.start, provider=meta.get("provider"))
+                first = False
+            yield delta
+
+def StreamChatBot(Query, LogPath=ChatLogPath, BeforeSave=None):
+    """
+    Generator form of ChatBot: yields the answer's text deltas as they stream in,
+    then one metadata dict (answer, cached, provider, hedged, prompt_tokens, completion_tokens, ttft, elapsed).
+    AnswerModifier, the answer cache and the chat log are applied once the stream is complete.
+    Raises Cancelled if the turn is cancelled; nothing is saved in that case.
+    """
+    token = CurrentToken()
+    start = time.time()
+    meta = {"answer": "", "cached": False, "prompt_tokens": 0, "completion_tokens": 0, "ttft": None, "elapsed": 0.0}
+    try:
+        cache_key = answer_cache.get().key(Query) if AnswerCacheEnabled else None
+        Answer = answer_cache.get().get(cache_key) if cache_key else None
+
+        if Answer is not None:
+            meta.update(cached=True, ttft=time.time() - start)
+            yield Answer
+        else:
+            Answer = ""
+            for delta in FreshAnswer(Query, LogPath, token, meta):
+                if not Answer:
+                    meta["ttft"] = time.time() - start
+                Answer += delta
+                yield delta
+            token.check()
+
+            Answer = Answer.replace("</s>", "")
+            Answer = AnswerModifier(Answer)
+            if cache_key and Answer:
+                answer_cache.get().set(cache_key, Answer, time.time() - start)
+
+        if BeforeSave:
+            BeforeSave()
+            token.check()
+
+        AppendChatLog([
+            {"role": "user", "content": f"{Query}"},
+            {"role": "assistant", "content": Answer},
+        ], LogPath)
+
+        meta.update(answer=Answer, completion_tokens=EstimateTokens(Answer))
+
+    except Cancelled:
+        print(f"[ChatBot] Cancelled: {token.reason}")
+        raise
     except requests.exceptions.RequestException as e:
+        # The history is kept; a failed request must not cost the user their conversation
         print(f"Connection error: {e}")
-        with open(r"Data\ChatLog.json", "w") as f:
-            dump([], f, indent=4)
-        return "Connection error, please try again."
+        meta.update(answer="Connection error, please try again.", error=str(e))
     except Exception as e:
         print(f"Error: {e}")
-        with open(r"Data\ChatLog.json", "w") as f:
-            dump([], f, indent=4)
-        return "An error occurred, please try again."
+        meta.update(answer="An error occurred, please try again.", error=str(e))
+
+    meta["elapsed"] = time.time() - start
+    yield meta
+
+def AStreamChatBot(Query, LogPath=ChatLogPath, BeforeSave=None):
+    """StreamChatBot for asyncio callers: `async for item in AStreamChatBot(query)`"""
+    return AsyncIterate(StreamChatBot(Query, LogPath, BeforeSave))
+
+# Main ChatBot function
+@Traced("chatbot")
+def ChatBot(Query, OnText=None, LogPath=ChatLogPath, BeforeSave=None):
+    """
+    Send the user's query to the chatbot and return the AI's response.
+    If `OnText` is given it is called with every text delta as it streams in.
+    `LogPath` selects the conversation history (one file per server session).
+    `BeforeSave()` runs just before the answer is saved; a speculative run
+    waits there until it is committed (see Backend/Speculation.py).
+    Raises Cancelled if the turn is cancelled; nothing is saved in that case.
+    """
+    return Consume(StreamChatBot(Query, LogPath, BeforeSave), OnText)["answer"]
 
 # Run chatbot
 if __name__ == "__main__":
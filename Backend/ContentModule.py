@@ -6,18 +6,17 @@ from pathlib import Path
 import random
 import re
 from dotenv import dotenv_values
+from Backend.KeywordRules import RegisterRules, Hits
+from Backend.LLMClient import Complete
 
 # Load API keys
 env_vars = dotenv_values(".env")
 
-# Try to import Cohere (optional, will use fallback if not available)
+# Try to import Cohere (optional, will use fallback if not available); calls go through Backend/LLMClient.py
 try:
     import cohere
     COHERE_AVAILABLE = True
-    CohereAPIKey = env_vars.get("CohereAPIKey", "")
-    if CohereAPIKey:
-        co = cohere.Client(api_key=CohereAPIKey)
-    else:
+    if not env_vars.get("CohereAPIKey", ""):
         COHERE_AVAILABLE = False
         print("[ContentModule] No Cohere API key found in .env")
 except ImportError:
@@ -128,20 +127,20 @@ def WriteToNotepad(query):
         traceback.print_exc()
         return False
 
+# Kinds of text worth generating with AI instead of typing verbatim
+RegisterRules({"content.ai": [
+    "letter", "application", "email", "essay", "story", "poem", 
+    "article", "report", "speech", "script", "code", "program",
+    "proposal", "resume", "cv", "bio", "description", "review",
+    "summary", "analysis", "explanation", "tutorial", "guide",
+    "apology", "thank", "invitation", "announcement", "notice"
+]})
+
 def NeedsAIGeneration(query_lower):
     """Determine if query needs AI generation"""
-    ai_keywords = [
-        "letter", "application", "email", "essay", "story", "poem", 
-        "article", "report", "speech", "script", "code", "program",
-        "proposal", "resume", "cv", "bio", "description", "review",
-        "summary", "analysis", "explanation", "tutorial", "guide",
-        "apology", "thank", "invitation", "announcement", "notice"
-    ]
-    
     # Check if query contains any AI-worthy keywords
-    for keyword in ai_keywords:
-        if keyword in query_lower:
-            return True
+    if "content.ai" in Hits(query_lower):
+        return True
     
     # If it's asking to "write" something with multiple words, probably needs AI
     if "write" in query_lower or "create" in query_lower or "generate" in query_lower:
@@ -173,25 +172,14 @@ Do not include any meta-commentary. Just write the requested content directly.""
         
         print(f"[AI] Generating: {content_request}")
         
-        response = co.chat(
-            model='command-xlarge-nightly',
-            message=prompt,
+        generated_text = Complete(
+            "cohere",
+            'command-xlarge-nightly',
+            [{"role": "user", "content": prompt}],
             temperature=0.8,
             max_tokens=1000
         )
         
-        # Extract text from response
-        generated_text = ""
-        if hasattr(response, 'text'):
-            generated_text = response.text
-        elif hasattr(response, 'message'):
-            generated_text = response.message
-        else:
-            # Try to get text from stream
-            for event in response:
-                if hasattr(event, 'text'):
-                    generated_text += event.text
-        
         if generated_text:
             print(f"[AI] Generated {len(generated_text)} characters")
             return generated_text.strip()
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from json import load, dump
+from dotenv import dotenv_values
+from Backend.ChatLog import Store, ChatLogPath
+from Backend.PromptCompiler import EstimateTokens
+from Backend.LLMClient import Complete
+from Backend.Tracing import Span
+import threading
+import os
+
+env_vars = dotenv_values(".env")
+# Tokens of chat history sent with each LLM call (summary included)
+ContextTokenBudget = int(env_vars.get("ContextTokenBudget", 3000))
+# Never look further back than this many messages when packing
+MaxContextMessages = int(env_vars.get("MaxContextMessages", 64))
+SummaryEnabled = env_vars.get("ContextSummary", "True").lower() == "true"
+# Fold older messages into the summary once this many have fallen out of the window
+SummaryBatch = int(env_vars.get("ContextSummaryBatch", 6))
+SummaryModel = env_vars.get("ContextSummaryModel", "llama-3.1-8b-instant")
+# Share of the budget the messages after the summary may go over it while the summary catches up
+SummaryOvershoot = float(env_vars.get("ContextSummaryOvershoot", 0.25))
+
+
+# One background writer is plenty: summaries are rare and never on the critical path
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ContextSummary")
+
+
+def MessageTokens(message):
+    # A few tokens of role markup per message
+    return EstimateTokens(str(message.get("content", ""))) + 4
+
+
+def Summarize(previous, messages):
+    """Fold `messages` into the running summary `previous` with a small Groq model"""
+    conversation = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    prompt = (
+        "Update the running summary of a conversation between a user and an assistant.\n"
+        "Keep names, facts, preferences and open questions; drop small talk. At most 150 words.\n\n"
+        f"Current summary:\n{previous or '(empty)'}\n\nNew messages:\n{conversation}\n\nUpdated summary:"
+    )
+    return Complete("groq", SummaryModel, [{"role": "user", "content": prompt}], max_tokens=300, temperature=0.3).strip()
+
+
+class RollingSummary:
+    """
+    Summary of messages 0..upto-1 of one chat log for one token budget, saved
+    next to it (ChatLog.summary.3000.json) and extended in the background as
+    the log grows. Each budget packs a different number of recent messages,
+    so each keeps its own summary boundary.
+    """
+
+    def __init__(self, log_path, budget):
+        self.log_path = log_path
+        self.path = f"{os.path.splitext(log_path)[0]}.summary.{budget}.json"
+        self.lock = threading.Lock()
+        self.upto = 0
+        self.text = ""
+        self.updating = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = load(f)
+            self.upto, self.text = data["upto"], data["text"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    def snapshot(self):
+        """(upto, text), read together"""
+        with self.lock:
+            return self.upto, self.text
+
+    def extend_to(self, end):
+        """Schedule folding messages upto..end-1 into the summary, if enough have piled up"""
+        with self.lock:
+            if self.updating or end - self.upto < SummaryBatch:
+                return False
+            self.updating = True
+        executor.submit(self.update, end)
+        return True
+
+    def update(self, end):
+        try:
+            with self.lock:
+                start, previous = self.upto, self.text
+            messages = Store(self.log_path).slice(start, end)
+            with Span("context.summary", messages=len(messages)):
+                text = Summarize(previous, messages)
+            with self.lock:
+                self.upto, self.text = end, text
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                dump({"upto": end, "text": text}, f, indent=4, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"[ContextWindow] Could not update the summary: {e}")
+        finally:
+            with self.lock:
+                self.updating = False
+
+
+summaries = {}
+summaries_lock = threading.Lock()
+
+
+def Summary(log_path, budget):
+    with summaries_lock:
+        summary = summaries.get((log_path, budget))
+        if summary is None:
+            summary = summaries[(log_path, budget)] = RollingSummary(log_path, budget)
+        return summary
+
+
+def PackContext(LogPath=ChatLogPath, budget=None):
+    """
+    Chat history for the next LLM call: the newest messages of the log that
+    fit in `budget` tokens, preceded by the rolling summary of older ones.
+    """
+    budget = ContextTokenBudget if budget is None else budget
+    first, recent = Store(LogPath).tail(MaxContextMessages)
+
+    summary = Summary(LogPath, budget) if SummaryEnabled else None
+    upto, text = summary.snapshot() if summary else (0, "")
+    prefix = []
+    if text:
+        prefix = [{"role": "system", "content": f"Summary of the earlier conversation:\n{text}"}]
+        budget -= MessageTokens(prefix[0])
+
+    packed, used = [], 0
+    for message in reversed(recent):
+        cost = MessageTokens(message)
+        if used + cost > budget:
+            break
+        packed.append(message)
+        used += cost
+    packed.reverse()
+
+    start = first + len(recent) - len(packed)
+    if summary and start > 0:
+        summary.extend_to(start)
+    if not prefix:
+        return packed
+    # The summary ends at message `upto`: send every message after it, including
+    # the few that no longer fit until the summary catches up, and none it covers.
+    # If the summary has fallen too far behind (e.g. it keeps failing), keep to the budget.
+    if upto >= first:
+        after = recent[upto - first:]
+        if sum(MessageTokens(message) for message in after) <= budget * (1 + SummaryOvershoot):
+            return prefix + after
+    return prefix + packed[max(0, upto - start):]
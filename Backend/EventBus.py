@@ -0,0 +1,121 @@
+import threading
+import queue
+import os
+
+# Topics carried by the bus
+STATUS = "status"
+RESPONSE = "response"
+PARTIAL = "partial"  # answer text so far while it is still streaming
+MIC = "mic"
+IMAGE = "image"  # image generation job events
+
+
+class EventBus:
+    """
+    Thread-safe publish/subscribe bus for assistant state.
+    Keeps the last value of every topic so late readers can catch up,
+    and lets threads block until a topic changes instead of polling.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._state = {}
+        self._versions = {}
+        self._subscribers = {}
+
+    def publish(self, topic, value):
+        """Store the new value and notify every subscriber and waiter"""
+        with self._condition:
+            self._state[topic] = value
+            self._versions[topic] = self._versions.get(topic, 0) + 1
+            callbacks = list(self._subscribers.get(topic, ())) + list(self._subscribers.get("*", ()))
+            self._condition.notify_all()
+
+        for callback in callbacks:
+            try:
+                callback(topic, value)
+            except Exception as e:
+                print(f"[EventBus] Subscriber error on '{topic}': {e}")
+
+    def subscribe(self, topic, callback):
+        """Call `callback(topic, value)` on every publish; use '*' for all topics"""
+        with self._condition:
+            self._subscribers.setdefault(topic, []).append(callback)
+        return callback
+
+    def unsubscribe(self, topic, callback):
+        with self._condition:
+            if callback in self._subscribers.get(topic, []):
+                self._subscribers[topic].remove(callback)
+
+    def listen(self, *topics, maxsize=0):
+        """Return a queue that receives (topic, value) tuples for the given topics"""
+        events = queue.Queue(maxsize=maxsize)
+
+        def enqueue(topic, value):
+            try:
+                events.put_nowait((topic, value))
+            except queue.Full:
+                print(f"[EventBus] Listener queue full, dropping '{topic}' event")
+
+        for topic in topics or ("*",):
+            self.subscribe(topic, enqueue)
+        return events
+
+    def get(self, topic, default=None):
+        with self._condition:
+            return self._state.get(topic, default)
+
+    def snapshot(self, topic, default=None):
+        """Return (version, value) so a caller can later wait for the next change"""
+        with self._condition:
+            return self._versions.get(topic, 0), self._state.get(topic, default)
+
+    def wait(self, topic, since, timeout=None):
+        """
+        Block until `topic` has been published after version `since`.
+        Returns (version, value); on timeout the version is unchanged.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._versions.get(topic, 0) > since, timeout=timeout)
+            return self._versions.get(topic, 0), self._state.get(topic)
+
+
+class FileMirror:
+    """
+    Optional sink that mirrors bus topics into the legacy Frontend/Files/*.data
+    files for external tools. Writes happen on a background thread and only the
+    latest value of each topic is written.
+    """
+
+    def __init__(self, bus, paths):
+        self.paths = paths
+        self.events = bus.listen(*paths.keys())
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            pending = dict([self.events.get()])
+            # Coalesce bursts of updates into a single write per topic
+            while True:
+                try:
+                    topic, value = self.events.get_nowait()
+                    pending[topic] = value
+                except queue.Empty:
+                    break
+
+            for topic, value in pending.items():
+                try:
+                    os.makedirs(os.path.dirname(self.paths[topic]), exist_ok=True)
+                    with open(self.paths[topic], 'w', encoding='utf-8') as file:
+                        file.write(str(value))
+                except Exception as e:
+                    print(f"[FileMirror] Error writing {self.paths[topic]}: {e}")
+
+
+# Shared bus for the whole assistant
+bus = EventBus()
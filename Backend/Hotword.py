@@ -2,10 +2,14 @@ import threading
 from time import sleep
 from Backend.TextToSpeech import TextToSpeech
 from Frontend.GUI import SetAsssistantStatus, ShowTextToScreen, SetMicrophoneStatus
+from Backend.Tracing import NewRequestId, RecordSpan, RunInRequest
+from Backend.Startup import Lazy, LazyModule
+from Backend.Cancellation import turns, IsStopCommand
+from Backend.KeywordRules import RegisterRules, FirstRule
 from dotenv import dotenv_values
 import datetime
-import speech_recognition as sr
 import random
+import time
 
 # Load environment variables
 env_vars = dotenv_values(".env")
@@ -104,15 +108,19 @@ QUICK_RESPONSES = {
         "Happy to help!",
     ],
 }
+QuickResponseRules = [f"quick.{key}" for key in QUICK_RESPONSES]
+RegisterRules({f"quick.{key}": [key] for key in QUICK_RESPONSES})
 
 # Flag to prevent overlapping speech
 is_speaking = threading.Event()
 last_activation_time = None
 hotword_triggered = False
 
-# Initialize recognizer and microphone
-recognizer = sr.Recognizer()
-microphone = sr.Microphone()
+# Recognizer and microphone are created on first use; opening the
+# microphone enumerates audio devices, which is slow
+sr = LazyModule("speech_recognition", warm=True)
+recognizer = Lazy("recognizer", lambda: sr.Recognizer())
+microphone = Lazy("microphone", lambda: sr.Microphone())
 
 
 def get_time_based_greeting():
@@ -214,11 +222,9 @@ def get_current_date():
 
 def check_quick_response(query):
     """Check if query matches a quick response pattern."""
-    query_lower = query.lower().strip()
-    
-    for key, responses in QUICK_RESPONSES.items():
-        if key in query_lower:
-            return random.choice(responses)
+    rule = FirstRule(query, QuickResponseRules)
+    if rule:
+        return random.choice(QUICK_RESPONSES[rule[len("quick."):]])
     
     return None
 
@@ -247,13 +253,15 @@ def HotwordListener(main_execution_callback):
 
     while True:
         try:
-            with microphone as source:
-                recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            with microphone.get() as source:
+                recognizer.get().adjust_for_ambient_noise(source, duration=0.5)
                 print("Listening...")
-                audio = recognizer.listen(source, phrase_time_limit=5)
+                audio = recognizer.get().listen(source, phrase_time_limit=5)
 
             try:
-                query = recognizer.recognize_google(audio).lower()
+                recognize_start = time.time()
+                query = recognizer.get().recognize_google(audio).lower()
+                recognize_end = time.time()
                 print(f"Heard: {query}")
 
                 # Check if hotword is detected
@@ -290,8 +298,14 @@ def HotwordListener(main_execution_callback):
                         for hotword in HOTWORDS:
                             command = command.replace(hotword, "").strip()
                         
+                        # A new command interrupts whatever the previous turn is still doing
+                        if command and IsStopCommand(command):
+                            turns.cancel("stopped by user")
+                            SetAsssistantStatus("Available...")
+
                         # If there's a command after the hotword
-                        if len(command) > 3:
+                        elif len(command) > 3:
+                            turns.cancel("interrupted by a new command")
                             # Check for quick response
                             quick_response = check_quick_response(command)
                             if quick_response:
@@ -303,12 +317,15 @@ def HotwordListener(main_execution_callback):
                                 ShowTextToScreen(f"{Username}: {command}")
                                 TextToSpeech(acknowledgment)
                                 
-                                SetMicrophoneStatus("True")
+                                # The command runs on its own thread; Mic=True would start a second turn in FirstThread
                                 SetAsssistantStatus("Processing command...")
                                 
+                                # Start the command's trace with the recognition time
+                                request_id = NewRequestId()
+                                RecordSpan("hotword.recognize", recognize_start, recognize_end, request_id=request_id)
                                 threading.Thread(
-                                    target=main_execution_callback,
-                                    args=(command,),
+                                    target=RunInRequest,
+                                    args=(request_id, main_execution_callback, command),
                                     daemon=True
                                 ).start()
                         else:
@@ -326,19 +343,25 @@ def HotwordListener(main_execution_callback):
                         continue
 
                     is_speaking.set()
+
+                    # A new command interrupts whatever the previous turn is still doing
+                    turns.cancel("stopped by user" if IsStopCommand(query) else "interrupted by a new command")
                     
                     # Check for quick response
                     quick_response = check_quick_response(query)
-                    if quick_response:
+                    if IsStopCommand(query):
+                        SetAsssistantStatus("Available...")
+                    elif quick_response:
                         ShowTextToScreen(f"{Username}: {query}\n{AssistantName}: {quick_response}")
                         TextToSpeech(quick_response)
                     else:
-                        SetMicrophoneStatus("True")
                         SetAsssistantStatus("Processing command...")
                         
+                        request_id = NewRequestId()
+                        RecordSpan("hotword.recognize", recognize_start, recognize_end, request_id=request_id)
                         threading.Thread(
-                            target=main_execution_callback,
-                            args=(query,),
+                            target=RunInRequest,
+                            args=(request_id, main_execution_callback, query),
                             daemon=True
                         ).start()
 
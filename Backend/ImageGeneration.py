@@ -1,16 +1,34 @@
 import asyncio
 from random import randint
-from PIL import Image
-import requests
-from dotenv import get_key
+from dotenv import get_key, dotenv_values
 import os
 from time import sleep
+import threading
+import queue
+import itertools
 import base64
 import json
+import contextvars
+
+try:
+    from Backend.Tracing import Span
+    from Backend.Startup import LazyModule
+except ImportError:
+    # Running as a standalone script: make the project root importable
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Backend.Tracing import Span
+    from Backend.Startup import LazyModule
+
+# Only needed once an image is actually requested
+requests = LazyModule("requests")
+Image = LazyModule("PIL.Image")
 
 # Set API URL and headers
 API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
 headers = {"Authorization": f"Bearer {get_key('.env', 'HuggingFaceAPIKey')}"}
+# Seconds one request may take; a hung request would otherwise hold up every queued job
+ImageRequestTimeout = float(dotenv_values(".env").get("ImageRequestTimeout", 120))
 
 # Ensure the Data folder exists
 if not os.path.exists("Data"):
@@ -33,28 +51,51 @@ def open_images(prompt):
         except IOError:
             print(f"Unable to open {image_path}. Ensure the image file exists and is valid.")
 
+def CreateSession():
+    session = requests.Session()
+    session.headers.update(headers)
+    return session
+
+# One Session per thread (a Session is not safe to share between threads), kept open
+# so the TLS connections to the endpoint stay warm between jobs
+local = threading.local()
+
+def Session():
+    if getattr(local, "session", None) is None:
+        local.session = CreateSession()
+    return local.session
+
+def post(payload):
+    return Session().post(API_URL, json=payload, timeout=ImageRequestTimeout)
+
 async def query(payload):
     try:
-        response = await asyncio.to_thread(requests.post, API_URL, headers=headers, json=payload)
+        with Span("image.request"):
+            response = await asyncio.to_thread(post, payload)
         response.raise_for_status()  # Raise an error for HTTP failures
         return response.content
     except requests.exceptions.RequestException as e:
         print(f"Error querying API: {e}")
         return None
 
-async def generate_images(prompt: str):
+async def indexed_query(i, payload):
+    return i, await query(payload)
+
+async def generate_images(prompt: str, on_progress=None):
     tasks = []
     for i in range(4):
         seed = randint(0, 1000000)
         payload = {
             "inputs": f"{prompt}, quality=4k, sharpness=maximum, Ultra High details, high resolution, seed={seed}"
         }
-        task = asyncio.create_task(query(payload))
+        task = asyncio.create_task(indexed_query(i, payload))
         tasks.append(task)
 
-    responses = await asyncio.gather(*tasks)
+    saved = []
 
-    for i, response_content in enumerate(responses):
+    # Save each image as soon as its request finishes so progress can be reported
+    for finished in asyncio.as_completed(tasks):
+        i, response_content = await finished
         if response_content:
             try:
                 response_json = json.loads(response_content)
@@ -63,35 +104,118 @@ async def generate_images(prompt: str):
                     image_base64 = response_json["images"][0]
                     image_bytes = base64.b64decode(image_base64)
 
-                    with open(fr"Data\{prompt.replace(' ', '_')}{i + 1}.jpg", "wb") as f:
+                    image_path = fr"Data\{prompt.replace(' ', '_')}{i + 1}.jpg"
+                    with open(image_path, "wb") as f:
                         f.write(image_bytes)
+                    saved.append(image_path)
+                    if on_progress:
+                        on_progress(len(saved))
                 else:
                     print(f"Unexpected API response format: {response_json}")
             except Exception as e:
                 print(f"Error saving image {i + 1}: {e}")
 
-def GenerateImages(prompt: str):
-    asyncio.run(generate_images(prompt))
-    open_images(prompt)
+    return saved
+
+def GenerateImages(prompt: str, on_progress=None, show=True):
+    """Generate and save the images; `show` opens them in the local image viewer"""
+    saved = asyncio.run(generate_images(prompt, on_progress))
+    if show:
+        open_images(prompt)
+    return saved
+
+
+class ImageWorker:
+    """
+    Long-lived image generation worker.
+    Jobs are queued with an ID and processed back to back on one thread;
+    progress and completion are reported to `on_event` as
+    {"job_id", "prompt", "state", "saved", "images"} with state queued,
+    generating, progress, done or failed; "saved" counts images written so far.
+    `show_images` opens finished images on this machine (desktop mode only).
+    """
+
+    def __init__(self, on_event=None, show_images=False):
+        self.on_event = on_event
+        self.show_images = show_images
+        self.jobs = queue.Queue()
+        self.ids = itertools.count(1)
+        self.thread = threading.Thread(target=self._run, daemon=True, name="ImageWorker")
+        self.thread.start()
+
+    def submit(self, prompt):
+        job_id = next(self.ids)
+        # Keep the submitter's trace context so the job shows up in its request
+        self.jobs.put((job_id, prompt, contextvars.copy_context()))
+        self._publish(job_id, prompt, "queued")
+        return job_id
+
+    def _publish(self, job_id, prompt, state, saved=0, images=None):
+        if self.on_event:
+            try:
+                self.on_event({"job_id": job_id, "prompt": prompt, "state": state, "saved": saved, "images": images or []})
+            except Exception as e:
+                print(f"[ImageWorker] Event handler error: {e}")
 
-# Main execution loop
-while True:
-    try:
-        with open(r"Frontend\Files\ImageGeneration.data", "r") as f:
-            data = str(f.read())
+    def _run(self):
+        while True:
+            job_id, prompt, context = self.jobs.get()
+            context.run(self._process, job_id, prompt)
+
+    def _process(self, job_id, prompt):
+        with Span("image.job", job_id=job_id):
+            try:
+                print(f"[ImageWorker] Generating images for job {job_id}: {prompt}")
+                self._publish(job_id, prompt, "generating")
+                saved = GenerateImages(
+                    prompt,
+                    on_progress=lambda count: self._publish(job_id, prompt, "progress", count),
+                    show=self.show_images,
+                )
+                self._publish(job_id, prompt, "done" if saved else "failed", len(saved), saved)
+            except Exception as e:
+                print(f"[ImageWorker] Job {job_id} failed: {e}")
+                self._publish(job_id, prompt, "failed")
 
-        prompt, status = data.split(",")
-        status = status.strip()
 
-        if status.lower() == "true":
-            print("Generating Images...")
-            GenerateImages(prompt=prompt)
+worker = None
+worker_lock = threading.Lock()
 
-            with open(r"Frontend\Files\ImageGeneration.data", "w") as f:
-                f.write("False, False")
-            break
-        else:
-            sleep(1)
+def StartImageWorker(on_event=None, show_images=False):
+    """
+    Start the shared image worker once; later calls return the running one.
+    The application entry point should call it first, since the first call's
+    `on_event` and `show_images` are the ones that stick.
+    """
+    global worker
+    with worker_lock:
+        if worker is None:
+            worker = ImageWorker(on_event, show_images)
+    return worker
+
+def SubmitImageJob(prompt: str):
+    """Queue a prompt on the shared image worker and return its job ID"""
+    return StartImageWorker().submit(prompt)
+
+
+# Standalone mode: serve prompts written to ImageGeneration.data by external tools
+if __name__ == "__main__":
+    while True:
+        try:
+            with open(r"Frontend\Files\ImageGeneration.data", "r") as f:
+                data = str(f.read())
+
+            prompt, status = data.split(",")
+            status = status.strip()
+
+            if status.lower() == "true":
+                print("Generating Images...")
+                GenerateImages(prompt=prompt)
 
-    except :
-        pass
\ No newline at end of file
+                with open(r"Frontend\Files\ImageGeneration.data", "w") as f:
+                    f.write("False, False")
+            else:
+                sleep(1)
+
+        except :
+            sleep(1)
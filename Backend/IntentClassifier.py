@@ -0,0 +1,359 @@
+from collections import Counter, defaultdict
+import threading
+import json
+import math
+import time
+import os
+import re
+
+DecisionLogPath = os.path.join("Data", "DecisionLog.jsonl")
+
+# Decision categories, longest first so "generate image" wins over "general"
+Categories = [
+    "generate image", "google search", "youtube search",
+    "general", "realtime", "open", "close", "play",
+    "system", "content", "reminder", "exit",
+]
+
+# Categories whose payload is free text the user names (app, song, topic);
+# only the words before it say what kind of command it is
+SlotCategories = {"open", "close", "play", "generate image", "google search", "youtube search"}
+
+# Leading/trailing words removed to get the payload of a slot command
+SlotPrefixes = {
+    "open": ["open up", "open", "launch", "start"],
+    "close": ["close", "quit", "exit", "kill"],
+    "play": ["play"],
+    "generate image": ["generate an image of", "generate image of", "generate an image", "generate image",
+                       "create an image of", "create image of", "make an image of", "make image of", "draw"],
+    "google search": ["google search for", "google search", "search google for", "search for", "search", "google"],
+    "youtube search": ["youtube search for", "youtube search", "search youtube for", "search for", "search", "youtube"],
+}
+# Politeness and filler around a command that is not part of its payload
+# ("could you open calculator for me please" -> "open calculator")
+LeadingFillers = ["please", "kindly", "can you", "could you", "would you", "will you"]
+TrailingFillers = ["please", "right now", "now", "for me", "quickly"]
+SlotSuffixes = {
+    "google search": ["on google", "in google"],
+    "youtube search": ["on youtube", "in youtube"],
+    "play": ["on youtube"],
+}
+
+# A few hand-written examples so every category is represented before any
+# decisions have been logged
+SeedExamples = [
+    ("open chrome", "open chrome"), ("open notepad", "open notepad"), ("launch spotify", "open spotify"),
+    ("start calculator", "open calculator"), ("open youtube", "open youtube"),
+    ("close notepad", "close notepad"), ("close chrome", "close chrome"), ("quit spotify", "close spotify"),
+    ("play despacito", "play despacito"), ("play let her go", "play let her go"),
+    ("play afsanay by ys", "play afsanay by ys"),
+    ("generate image of a lion", "generate image a lion"), ("generate an image of a sunset", "generate image a sunset"),
+    ("google search python tutorials", "google search python tutorials"),
+    ("search for cheap flights on google", "google search cheap flights"),
+    ("youtube search lofi music", "youtube search lofi music"),
+    ("search cooking videos on youtube", "youtube search cooking videos"),
+    ("mute", "system mute"), ("unmute", "system unmute"), ("volume up", "system volume up"),
+    ("volume down", "system volume down"), ("mute the volume", "system mute"),
+    ("bye", "exit"), ("goodbye", "exit"), ("bye lio", "exit"),
+    ("what's the time", "general what's the time"), ("what is the date today", "general what is the date today"),
+    ("tell me a joke", "general tell me a joke"), ("how are you", "general how are you"),
+    ("what is today's news", "realtime what is today's news"), ("what is the weather today", "realtime what is the weather today"),
+    ("what is the latest news", "realtime what is the latest news"),
+]
+
+# Words that only move a slot command's trigger toward a command when the
+# payload has been seen with that category before ("start the car", "play chess with me")
+AmbiguousTriggers = {"start", "kill", "play", "draw", "search"}
+
+# Openings that begin a new command, so "open chrome and close notepad" is two
+# clauses while "open chrome and firefox" is one (bare site names stay payload)
+CommandStarts = sorted(
+    {prefix for category, prefixes in SlotPrefixes.items() for prefix in prefixes if prefix not in ("google", "youtube")}
+    | {"tell", "mute", "unmute", "volume", "write", "type", "remind", "set", "show", "find",
+       "what", "what's", "who", "how", "when", "where", "why"},
+    key=len, reverse=True)
+
+ClauseSeparator = re.compile(r"\s*(?:,|\band then\b|\bthen\b|\band\b|\balso\b)\s*")
+Token = re.compile(r"[a-z0-9']+")
+
+
+def Tokens(text):
+    return Token.findall(text.lower())
+
+
+def CommandCategory(command):
+    """Category of a decision command such as 'open chrome' or 'general how are you'"""
+    command = command.strip().lower()
+    for category in Categories:
+        if command == category or command.startswith(category + " "):
+            return category
+    return None
+
+
+def StartsCommand(text):
+    text = text.strip().lower()
+    return any(text == start or text.startswith(start + " ") for start in CommandStarts)
+
+
+def SplitClauses(query):
+    """
+    Split a query where a separator is followed by a new command:
+    "open chrome and tell me a joke" -> ["open chrome", "tell me a joke"],
+    "tell me about salt and pepper" stays whole.
+    """
+    clauses = []
+    position = 0
+    for separator in ClauseSeparator.finditer(query):
+        rest = query[separator.end():]
+        if separator.start() > position and rest and StartsCommand(rest):
+            clauses.append(query[position:separator.start()])
+            position = separator.end()
+    clauses.append(query[position:])
+    return [clause for clause in clauses if clause.strip()]
+
+
+def StripFillers(text, fillers, leading):
+    """Remove `fillers` from the start (or end) of `text` until none is left"""
+    stripped = True
+    while stripped:
+        stripped = False
+        for filler in fillers:
+            if leading and text.startswith(filler + " "):
+                text, stripped = text[len(filler):].strip(), True
+            elif not leading and text.endswith(" " + filler):
+                text, stripped = text[:-len(filler)].strip(), True
+    return text
+
+
+def StripAffixes(text, category):
+    """Return (trigger words, payload) of a slot command"""
+    text = StripFillers(text.strip().lower(), LeadingFillers, leading=True)
+    trigger = ""
+    for prefix in SlotPrefixes.get(category, []):
+        if text == prefix or text.startswith(prefix + " "):
+            trigger, text = prefix, text[len(prefix):].strip()
+            break
+    for suffix in SlotSuffixes.get(category, []):
+        if text.endswith(" " + suffix):
+            trigger, text = f"{trigger} {suffix}".strip(), text[:-len(suffix)].strip()
+            break
+    return trigger, StripFillers(text, TrailingFillers, leading=False)
+
+
+def Features(text):
+    """Unigrams, bigrams and the first word (commands are verb-first)"""
+    words = Tokens(text)
+    features = list(words)
+    features += [f"{a}_{b}" for a, b in zip(words, words[1:])]
+    if words:
+        features.append(f"^{words[0]}")
+    return features
+
+
+class IntentClassifier:
+    """
+    Multinomial naive Bayes over query clauses.
+    Classify() returns the same decision list FirstLayerDMM would
+    (e.g. ["open chrome", "general tell me about gandhi"]) and a confidence:
+    the class probability times the share of the clause's words seen in
+    training, so unfamiliar names ("who is <someone>") stay with Cohere.
+    """
+
+    def __init__(self, examples=()):
+        self.lock = threading.Lock()
+        self.class_counts = Counter()
+        self.feature_counts = defaultdict(Counter)
+        self.feature_totals = Counter()
+        self.vocabulary = set()
+        self.payload_vocabulary = defaultdict(set)
+        for query, decision in examples:
+            self.learn(query, decision)
+
+    def learn(self, query, decision):
+        """Add one (query, decision list or string) example"""
+        commands = [decision] if isinstance(decision, str) else list(decision)
+        commands = [c.strip() for command in commands for c in command.split(",") if c.strip()]
+        if len(commands) == 1:
+            pairs = [(query, CommandCategory(commands[0]))]
+        else:
+            # The query's clauses don't line up with the commands; learn from the commands themselves
+            pairs = []
+            for command in commands:
+                category = CommandCategory(command)
+                text = command[len(category):] if category in ("general", "realtime") else command
+                pairs.append((text, category))
+
+        with self.lock:
+            for text, category in pairs:
+                if not category:
+                    continue
+                if category in SlotCategories:
+                    trigger, payload = StripAffixes(text, category)
+                    self.payload_vocabulary[category].update(Tokens(payload))
+                    text = trigger or text
+                features = Features(text)
+                self.class_counts[category] += 1
+                self.feature_counts[category].update(features)
+                self.feature_totals[category] += len(features)
+                self.vocabulary.update(features)
+
+    def predict(self, text):
+        """Return [(category, probability)] sorted by probability"""
+        features = Features(text)
+        with self.lock:
+            total = sum(self.class_counts.values())
+            if not total or not features:
+                return []
+            vocabulary_size = len(self.vocabulary) + 1
+            scores = {}
+            for category, count in self.class_counts.items():
+                counts = self.feature_counts[category]
+                denominator = self.feature_totals[category] + vocabulary_size
+                score = math.log(count / total)
+                for feature in features:
+                    score += math.log((counts[feature] + 1) / denominator)
+                scores[category] = score
+        top = max(scores.values())
+        weights = {category: math.exp(score - top) for category, score in scores.items()}
+        norm = sum(weights.values())
+        return sorted(((category, weight / norm) for category, weight in weights.items()), key=lambda item: -item[1])
+
+    def coverage(self, text):
+        words = Tokens(text)
+        if not words:
+            return 0.0
+        with self.lock:
+            return sum(word in self.vocabulary for word in words) / len(words)
+
+    def payload_coverage(self, payload, category):
+        """Share of the payload's words seen in `category` payloads before"""
+        words = Tokens(payload)
+        if not words:
+            return 0.0
+        with self.lock:
+            known = self.payload_vocabulary[category]
+            return sum(word in known for word in words) / len(words)
+
+    def classify_clause(self, clause):
+        """Return (commands, confidence) for one clause (see SplitClauses)"""
+        ranked = self.predict(clause)
+        if not ranked:
+            return [], 0.0
+        category, probability = ranked[0]
+
+        if category in SlotCategories:
+            trigger, payload = StripAffixes(clause, category)
+            if not payload or not trigger:
+                return [], 0.0
+            # Judge the command by its trigger words alone; the payload is free text
+            trigger_probability = dict(self.predict(trigger)).get(category, 0.0)
+            confidence = max(probability, trigger_probability) * self.coverage(trigger)
+            if trigger.split()[0] in AmbiguousTriggers:
+                confidence *= self.payload_coverage(payload, category)
+            if category in ("open", "close"):
+                # "open chrome and firefox" -> one command per app; no item starts
+                # another command, SplitClauses made that a clause of its own
+                items = [item for item in ClauseSeparator.split(payload) if item]
+                return [f"{category} {item}" for item in items], confidence
+            return [f"{category} {payload}"], confidence
+
+        confidence = probability * self.coverage(clause)
+        if category == "exit":
+            return ["exit"], confidence
+        return [f"{category} {clause.strip()}"], confidence
+
+    def Classify(self, query):
+        """
+        Return (decision list, confidence). Compound requests ("open chrome and
+        tell me a joke") are classified clause by clause, but returned with
+        confidence 0 so they are left to Cohere.
+        """
+        query = query.strip().rstrip(".!")
+        clauses = SplitClauses(query)
+        if len(clauses) > 1:
+            return [command for clause in clauses for command in self.classify_clause(clause)[0]], 0.0
+        return self.classify_clause(query)
+
+
+# ==================== TRAINING DATA ====================
+
+def ExamplesFromChatHistory(history):
+    """(query, decision) pairs from Cohere-style User/Chatbot turns"""
+    examples = []
+    for turn, reply in zip(history, history[1:]):
+        if turn["role"] == "User" and reply["role"] == "Chatbot":
+            examples.append((turn["message"], reply["message"]))
+    return examples
+
+
+def ExamplesFromPreamble(preamble):
+    """(query, decision) pairs quoted in the preamble ("if the query is 'x' respond with 'y'")"""
+    pattern = re.compile(r"if the query is '(.+?)' respond with '(.+?)'(?=[\s,.]|$)")
+    return pattern.findall(preamble)
+
+
+def LoadDecisionLog(path=DecisionLogPath):
+    examples = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    examples.append((record["query"], record["decision"]))
+                except (ValueError, KeyError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return examples
+
+
+def BuildClassifier(history=(), preamble=""):
+    examples = SeedExamples + ExamplesFromChatHistory(list(history)) + ExamplesFromPreamble(preamble) + LoadDecisionLog()
+    return IntentClassifier(examples)
+
+
+def LogDecision(query, decision, classifier=None, path=DecisionLogPath):
+    """Remember a decision made by Cohere so the local classifier learns it"""
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"query": query, "decision": decision, "time": time.time()}, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"[IntentClassifier] Error logging decision: {e}")
+    if classifier is not None:
+        classifier.learn(query, decision)
+
+
+# ==================== STATS ====================
+
+stats = {"local": 0, "remote": 0, "local_time": 0.0, "remote_time": 0.0}
+stats_lock = threading.Lock()
+
+
+def RecordDecision(source, seconds):
+    """Count a decision made by the local classifier ("local") or by Cohere ("remote")"""
+    with stats_lock:
+        stats[source] += 1
+        stats[f"{source}_time"] += seconds
+
+
+def Stats():
+    with stats_lock:
+        total = stats["local"] + stats["remote"]
+        return {
+            "local": stats["local"],
+            "remote": stats["remote"],
+            "hit_rate": stats["local"] / total if total else 0.0,
+            "local_avg_ms": stats["local_time"] / stats["local"] * 1000 if stats["local"] else 0.0,
+            "remote_avg_ms": stats["remote_time"] / stats["remote"] * 1000 if stats["remote"] else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    # python -m Backend.IntentClassifier "open chrome and tell me a joke" ...
+    import sys
+    from Backend.Model import ChatHistory, preamble
+    classifier = BuildClassifier(ChatHistory, preamble)
+    for query in sys.argv[1:] or ["open chrome and firefox", "play despacito", "who is akshay kumar"]:
+        decision, confidence = classifier.Classify(query)
+        print(f"{confidence:5.2f}  {query!r} -> {decision}")
@@ -0,0 +1,104 @@
+from functools import lru_cache
+from collections import deque
+import threading
+
+# Every keyword table of the assistant, compiled into one Aho-Corasick
+# automaton so a query is scanned once no matter how many tables ask about it.
+# Modules register their tables at import time with RegisterRules().
+Rules = {}  # rule name -> keywords (plain substrings, like `word in text`)
+rules_lock = threading.Lock()
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over many named keyword lists.
+    match(text) returns the names of every rule with at least one keyword
+    occurring in `text` (a substring match, exactly like `any(k in text ...)`).
+    """
+
+    def __init__(self, rules):
+        self.transitions = [{}]  # state -> {char: state}
+        self.outputs = [set()]   # state -> rule names ending here
+        for name, keywords in rules.items():
+            for keyword in keywords:
+                self.add(keyword, name)
+        self.compile()
+
+    def add(self, keyword, name):
+        state = 0
+        for char in keyword:
+            following = self.transitions[state].get(char)
+            if following is None:
+                following = len(self.transitions)
+                self.transitions[state][char] = following
+                self.transitions.append({})
+                self.outputs.append(set())
+            state = following
+        self.outputs[state].add(name)
+
+    def compile(self):
+        """Add failure links and fold them into a full transition table"""
+        fail = [0] * len(self.transitions)
+        goto = [dict(edges) for edges in self.transitions]
+        queue = deque(self.transitions[0].values())  # depth-1 states fail to the root
+        while queue:
+            state = queue.popleft()
+            # Missing edges jump straight to where the failure chain would land
+            # (shallower states are complete already, thanks to the breadth-first order)
+            for char, following in goto[fail[state]].items():
+                goto[state].setdefault(char, following)
+            for char, following in self.transitions[state].items():
+                queue.append(following)
+                fail[following] = goto[fail[state]].get(char, 0)
+                self.outputs[following] |= self.outputs[fail[following]]
+        self.goto = goto
+        self.outputs = [frozenset(names) for names in self.outputs]
+
+    def match(self, text):
+        goto, outputs = self.goto, self.outputs
+        state = 0
+        hits = set()
+        for char in text:
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                hits |= outputs[state]
+        return frozenset(hits)
+
+
+matcher = None
+
+
+def RegisterRules(tables):
+    """Add or replace rules, e.g. RegisterRules({"search.news": ["news", "latest"]})"""
+    global matcher
+    with rules_lock:
+        Rules.update({name: list(keywords) for name, keywords in tables.items()})
+        matcher = None
+    Hits.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def Hits(text):
+    """Names of every registered rule that matches `text` (case-insensitive)"""
+    global matcher
+    current = matcher
+    if current is None:
+        with rules_lock:
+            if matcher is None:
+                matcher = KeywordMatcher(Rules)
+            current = matcher
+    return current.match(text.lower())
+
+
+def HasAny(text, rule):
+    """Same as any(keyword in text.lower() for keyword in Rules[rule])"""
+    return rule in Hits(text)
+
+
+def FirstRule(text, rules):
+    """First of `rules` (in order) that matches `text`, or None"""
+    hits = Hits(text)
+    for rule in rules:
+        if rule in hits:
+            return rule
+    return None
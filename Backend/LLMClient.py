@@ -0,0 +1,233 @@
+from dotenv import dotenv_values
+from Backend.Startup import Lazy
+from Backend.Cancellation import CurrentToken, Cancelled
+import concurrent.futures
+import threading
+import asyncio
+import inspect
+import random
+import queue
+
+env_vars = dotenv_values(".env")
+GroqAPIKey = env_vars.get("GroqAPIKey")
+CohereAPIKey = env_vars.get("CohereAPIKey")
+# Seconds to open a connection, and to wait for the next bytes of a response
+LLMConnectTimeout = float(env_vars.get("LLMConnectTimeout", 5))
+LLMReadTimeout = float(env_vars.get("LLMReadTimeout", 30))
+# Extra attempts after a transient failure (connection error, timeout, 429, 5xx)
+LLMRetries = int(env_vars.get("LLMRetries", 2))
+LLMRetryBackoff = float(env_vars.get("LLMRetryBackoff", 0.5))
+# Keep-alive connections kept open per provider
+LLMPoolSize = int(env_vars.get("LLMPoolSize", 8))
+# Requests in flight per provider, across the whole assistant
+Concurrency = {
+    "groq": int(env_vars.get("GroqConcurrency", 4)),
+    "cohere": int(env_vars.get("CohereConcurrency", 4)),
+}
+
+stats = {provider: {"requests": 0, "retries": 0, "errors": 0, "waited": 0} for provider in Concurrency}
+stats_lock = threading.Lock()
+
+
+def Count(provider, counter):
+    with stats_lock:
+        stats[provider][counter] += 1
+
+
+def StartLoop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True, name="LLMClient").start()
+    return loop
+
+
+# Every provider call runs on this event loop, in its own daemon thread
+loop = Lazy("llm.loop", StartLoop)
+
+
+def HttpClient():
+    """Pooled keep-alive connections for one provider; None lets the SDK build its own"""
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=LLMPoolSize, max_keepalive_connections=LLMPoolSize, keepalive_expiry=60),
+        timeout=httpx.Timeout(LLMReadTimeout, connect=LLMConnectTimeout),
+    )
+
+
+def CreateGroq():
+    from groq import AsyncGroq
+    http_client = HttpClient()
+    options = {"http_client": http_client} if http_client else {}
+    # Retries are ours, so the SDK's own are turned off
+    return AsyncGroq(api_key=GroqAPIKey, timeout=LLMReadTimeout, max_retries=0, **options)
+
+
+def CreateCohere():
+    import cohere
+    http_client = HttpClient()
+    options = {"httpx_client": http_client} if http_client else {}
+    return cohere.AsyncClient(api_key=CohereAPIKey, timeout=LLMReadTimeout, **options)
+
+
+# Provider clients, built on first use (or warmed up in the background by Main)
+groq = Lazy("llm.groq", CreateGroq)
+cohere = Lazy("llm.cohere", CreateCohere)
+
+# Created on the loop thread the first time each provider is used
+semaphores = {}
+
+
+def Semaphore(provider):
+    if provider not in semaphores:
+        semaphores[provider] = asyncio.Semaphore(Concurrency[provider])
+    return semaphores[provider]
+
+
+def Retryable(error):
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    name = type(error).__name__
+    return isinstance(error, (ConnectionError, asyncio.TimeoutError)) or "Timeout" in name or "Connection" in name
+
+
+# ---------- providers: async generators of text deltas ----------
+
+async def GroqStream(model, messages, **options):
+    stream = await groq.get().chat.completions.create(model=model, messages=messages, stream=True, **options)
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        # Give the connection back to the pool right away
+        closed = getattr(stream, "close", lambda: None)()
+        if inspect.isawaitable(closed):
+            await closed
+
+
+def CohereRequest(messages):
+    """
+    (preamble, chat_history, message) for Cohere from OpenAI-style messages.
+    Cohere-style turns ({"role": "User"/"Chatbot", "message": ...}) are accepted too.
+    """
+    preamble = "\n\n".join(m["content"] for m in messages if m["role"] == "system") or None
+    turns = [m for m in messages if m["role"] != "system"]
+    history = [
+        {"role": "User" if m["role"].lower() == "user" else "Chatbot", "message": m.get("content", m.get("message"))}
+        for m in turns[:-1]
+    ]
+    return preamble, history, turns[-1].get("content", turns[-1].get("message"))
+
+
+async def CohereStream(model, messages, **options):
+    preamble, history, message = CohereRequest(messages)
+    if preamble:
+        options["preamble"] = preamble
+    # Groq/OpenAI option names
+    if "top_p" in options:
+        options["p"] = options.pop("top_p")
+    stop = options.pop("stop", None)
+    if stop:
+        options["stop_sequences"] = [stop] if isinstance(stop, str) else list(stop)
+    stream = cohere.get().chat_stream(
+        model=model, message=message, chat_history=history, request_options={"max_retries": 0}, **options
+    )
+    async for event in stream:
+        if getattr(event, "event_type", None) == "text-generation":
+            yield event.text
+
+
+Providers = {"groq": GroqStream, "cohere": CohereStream}
+
+
+# ---------- public API ----------
+
+async def AStream(provider, model, messages, **options):
+    """
+    Stream the text of one chat completion from `provider` ("groq" or "cohere").
+    `messages` are role/content dicts as for Groq. A transient failure is retried
+    with jittered exponential backoff, as long as no text has been yielded yet.
+    Must run on the shared loop (the provider clients are bound to it); threads use Stream().
+    """
+    for attempt in range(LLMRetries + 1):
+        started = False
+        try:
+            semaphore = Semaphore(provider)
+            if semaphore.locked():
+                Count(provider, "waited")
+            async with semaphore:
+                Count(provider, "requests")
+                async for delta in Providers[provider](model, messages, **options):
+                    started = True
+                    yield delta
+            return
+        except Exception as e:
+            if started or attempt == LLMRetries or not Retryable(e):
+                Count(provider, "errors")
+                raise
+            delay = random.uniform(0, LLMRetryBackoff * 2 ** attempt)
+            Count(provider, "retries")
+            print(f"[LLMClient] {provider} request failed ({e}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+async def AComplete(provider, model, messages, **options):
+    """The whole text of one chat completion"""
+    return "".join([delta async for delta in AStream(provider, model, messages, **options)])
+
+
+def Stream(provider, model, messages, **options):
+    """
+    AStream() for threaded callers: the request runs on the shared loop and its
+    deltas are yielded here. It is stopped (freeing its connection) when the
+    caller stops iterating or the turn is cancelled.
+    """
+    return Bridge(lambda: AStream(provider, model, messages, **options))
+
+
+def Bridge(make_stream):
+    """Run the async generator returned by `make_stream()` on the shared loop and yield its items in this thread"""
+    token = CurrentToken()
+    deltas = queue.Queue()
+    done = object()
+
+    async def pump():
+        async for delta in make_stream():
+            deltas.put(delta)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), loop.get())
+    future.add_done_callback(lambda _: deltas.put(done))
+    try:
+        while True:
+            try:
+                item = deltas.get(timeout=0.1)
+            except queue.Empty:
+                item = None
+            if token.cancelled:
+                future.cancel()
+                raise Cancelled(token.reason)
+            if item is None:
+                continue
+            if item is done:
+                break
+            yield item
+        try:
+            future.result()
+        except concurrent.futures.CancelledError:
+            raise Cancelled(token.reason or "cancelled")
+    finally:
+        future.cancel()
+
+
+def Complete(provider, model, messages, **options):
+    """The whole text of one chat completion, for threaded callers"""
+    return "".join(Stream(provider, model, messages, **options))
+
+
+def Stats():
+    with stats_lock:
+        return {provider: dict(counters) for provider, counters in stats.items()}
@@ -0,0 +1,190 @@
+from dotenv import dotenv_values
+from Backend.LLMClient import AStream, Bridge
+import threading
+import asyncio
+import time
+
+env_vars = dotenv_values(".env")
+HedgingEnabled = env_vars.get("LLMHedging", "True").lower() == "true"
+# Seconds the primary may take to its first token before the secondary is asked too
+HedgeDeadline = float(env_vars.get("HedgeDeadline", 1.5))
+HedgeProvider = env_vars.get("HedgeProvider", "cohere")
+HedgeModel = env_vars.get("HedgeModel", "command-r-plus")
+# Failures (or lost hedges) in a row that take a provider out of first place, and for how long
+CircuitFailures = int(env_vars.get("CircuitFailures", 3))
+CircuitCooldown = float(env_vars.get("CircuitCooldown", 30))
+
+stats = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0, "failed": 0}
+lock = threading.Lock()
+
+
+class ProviderHealth:
+    """
+    Recent behaviour of one provider: smoothed time to first token, and a
+    circuit breaker that opens after CircuitFailures failures in a row (or
+    right away on a rate limit) so the next requests start elsewhere.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.ttft = None
+        self.consecutive = 0
+        self.open_until = 0.0
+        self.counters = {"wins": 0, "failures": 0, "lost": 0}
+
+    def available(self):
+        return time.time() >= self.open_until
+
+    def success(self, ttft):
+        with lock:
+            self.ttft = ttft if self.ttft is None else 0.8 * self.ttft + 0.2 * ttft
+            self.consecutive = 0
+            self.counters["wins"] += 1
+
+    def failure(self, error=None, counter="failures"):
+        with lock:
+            self.consecutive += 1
+            self.counters[counter] += 1
+            rate_limited = getattr(error, "status_code", None) == 429
+            if rate_limited or self.consecutive >= CircuitFailures:
+                self.open_until = time.time() + CircuitCooldown
+                print(f"[LLMRouter] {self.name} unhealthy, routing around it for {CircuitCooldown:.0f}s")
+
+    def snapshot(self):
+        with lock:
+            return dict(self.counters, ttft=self.ttft, available=self.available(), consecutive=self.consecutive)
+
+
+health = {}
+
+
+def Health(provider):
+    with lock:
+        if provider not in health:
+            health[provider] = ProviderHealth(provider)
+        return health[provider]
+
+
+def Count(counter):
+    with lock:
+        stats[counter] += 1
+
+
+def ChatRoutes(model):
+    """Groq `model` first, then the hedge provider (if hedging is on)"""
+    routes = [("groq", model)]
+    if HedgingEnabled:
+        routes.append((HedgeProvider, HedgeModel))
+    return routes
+
+
+class Attempt:
+    """One provider's stream, read ahead into a queue so a hedge can be decided on its first token"""
+
+    done = object()
+
+    def __init__(self, provider, model, messages, options):
+        self.provider = provider
+        self.started = time.time()
+        self.first = asyncio.get_running_loop().create_future()
+        self.deltas = asyncio.Queue()
+        self.task = asyncio.ensure_future(self.run(model, messages, options))
+
+    async def run(self, model, messages, options):
+        try:
+            async for delta in AStream(self.provider, model, messages, **options):
+                if not self.first.done():
+                    self.first.set_result(time.time() - self.started)
+                await self.deltas.put(delta)
+            if not self.first.done():
+                self.first.set_result(time.time() - self.started)
+            await self.deltas.put(self.done)
+        except Exception as e:
+            if not self.first.done():
+                self.first.set_exception(e)
+            else:
+                await self.deltas.put(e)
+
+
+async def ARouteStream(routes, messages, meta=None, **options):
+    """
+    Stream one answer for `messages` from `routes` [(provider, model), ...].
+    The next route is started as a hedge once the running ones have gone
+    HedgeDeadline seconds without a first token, and right away when they fail.
+    The first route to produce text wins; the others are cancelled.
+    Routes whose provider is unhealthy are tried last.
+    Fills `meta` with the winning provider and whether a hedge was needed.
+    """
+    meta = {} if meta is None else meta
+    pending = sorted(routes, key=lambda route: not Health(route[0]).available())
+    attempts, live = [], []
+    error = None
+    winner = None
+    hedged = False
+    Count("requests")
+    try:
+        while winner is None:
+            if not live:
+                if not pending:
+                    Count("failed")
+                    raise error
+                if attempts:
+                    Count("failovers")
+                    print(f"[LLMRouter] {attempts[-1].provider} failed ({error}), failing over to {pending[0][0]}")
+                provider, model = pending.pop(0)
+                live.append(Attempt(provider, model, messages, options))
+                attempts.append(live[-1])
+                continue
+
+            futures = {attempt.first: attempt for attempt in live}
+            finished, _ = await asyncio.wait(futures, timeout=HedgeDeadline if pending else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+            if not finished:
+                provider, model = pending.pop(0)
+                Count("hedged")
+                hedged = True
+                print(f"[LLMRouter] No first token from {live[-1].provider} after {HedgeDeadline:.1f}s, hedging with {provider}")
+                live.append(Attempt(provider, model, messages, options))
+                attempts.append(live[-1])
+                continue
+
+            for future in finished:
+                attempt = futures[future]
+                if future.exception():
+                    error = future.exception()
+                    live.remove(attempt)
+                    Health(attempt.provider).failure(error)
+                elif winner is None:
+                    winner = attempt
+
+        Health(winner.provider).success(winner.first.result())
+        for attempt in live:
+            if attempt is not winner:
+                attempt.task.cancel()
+                Health(attempt.provider).failure(counter="lost")
+        if hedged and winner is not attempts[0]:
+            Count("hedge_wins")
+        meta.update(provider=winner.provider, hedged=hedged)
+
+        while True:
+            item = await winner.deltas.get()
+            if item is Attempt.done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        for attempt in attempts:
+            attempt.task.cancel()
+
+
+def RouteStream(routes, messages, meta=None, **options):
+    """ARouteStream() for threaded callers, like LLMClient.Stream()"""
+    return Bridge(lambda: ARouteStream(routes, messages, meta, **options))
+
+
+def Stats():
+    with lock:
+        result = dict(stats)
+    result["providers"] = {name: provider.snapshot() for name, provider in list(health.items())}
+    return result
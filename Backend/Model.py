@@ -1,11 +1,41 @@
-import cohere
 from rich import print
 from dotenv import dotenv_values
+from Backend.Tracing import Span, Traced
+from Backend.Startup import Lazy
+from Backend.LLMClient import Complete
+from Backend.IntentClassifier import BuildClassifier, LogDecision, RecordDecision
+from Backend.PersistentCache import PersistentCache, NormalizeQuery
+from Backend.KeywordRules import RegisterRules, Hits
+from Backend.PromptCompiler import PromptCompiler
+import hashlib
+import json
+import time
+import os
 
 env_vars = dotenv_values(".env")
-CohereAPIKey = env_vars["CohereAPIKey"]
+LocalIntent = env_vars.get("LocalIntent", "True").lower() == "true"
+IntentConfidence = float(env_vars.get("IntentConfidence", 0.8))
+DecisionCacheEnabled = env_vars.get("DecisionCache", "True").lower() == "true"
+DecisionCacheSize = int(env_vars.get("DecisionCacheSize", 512))
+DecisionCacheTTL = float(env_vars.get("DecisionCacheTTL", 7 * 24 * 3600))
+DecisionCachePath = os.path.join("Data", "DecisionCache.json")
+CompilePrompt = env_vars.get("DMMPromptCompiler", "True").lower() == "true"
+FewShotBudget = int(env_vars.get("DMMFewShotBudget", 200))
 
-co = cohere.Client(api_key=CohereAPIKey)
+# Keyword tables of the pre-Cohere checks and FallbackDMM
+RegisterRules({
+    "dmm.save_target": ["file", "notepad", "document", "text", "the"],
+    "dmm.write": ["write", "type"],
+    "dmm.notepad_content": ["create", "make", "joke", "poem", "story"],
+    "fallback.write": ["write", "type", "create text", "create file"],
+    "fallback.open": ["open", "launch", "start"],
+    "fallback.close": ["close", "exit app", "quit"],
+    "fallback.image": ["generate image", "create image", "make image"],
+    "fallback.reminder": ["remind", "reminder", "set reminder"],
+    "fallback.system": ["volume", "mute", "unmute", "brightness"],
+    "fallback.realtime": ["news", "weather", "temperature", "current", "latest", "today's"],
+    "fallback.exit": ["exit", "quit", "bye", "goodbye", "stop assistant"],
+})
 
 funcs = [
     "exit", "general", "realtime", "open", "close", "play",
@@ -57,59 +87,112 @@ ChatHistory = [
     {"role": "Chatbot", "message": "content save file name test.txt"}
 ]
 
-def FirstLayerDMM(prompt: str = "test"):
+# Preamble rules plus the few-shot examples most relevant to each query
+prompt_compiler = Lazy("dmm.prompt", lambda: PromptCompiler(preamble, ChatHistory, FewShotBudget))
+
+# Local intent classifier; Cohere is only asked when it is unsure
+classifier = Lazy("intent.classifier", lambda: BuildClassifier(ChatHistory, preamble))
+
+
+def PromptFingerprint():
+    """Hash of everything that shapes Cohere's decisions"""
+    data = json.dumps([preamble, ChatHistory, funcs], sort_keys=True)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+# Normalized prompt -> Cohere decision, kept across restarts
+decision_cache = Lazy("decision.cache", lambda: PersistentCache(
+    DecisionCachePath, DecisionCacheSize, DecisionCacheTTL, PromptFingerprint()))
+
+
+def InvalidateDecisionCache():
     """
-    First Layer Decision Making Model
-    Uses Cohere AI to classify user queries with fallback logic
+    Call after changing `preamble` or `ChatHistory`: recompiles the prompt
+    and drops cached decisions if the prompt changed.
+    """
+    if prompt_compiler.loaded:
+        prompt_compiler.get().load(preamble, ChatHistory)
+    return decision_cache.get().invalidate(PromptFingerprint())
+
+def PreCheck(prompt):
+    """
+    Patterns FirstLayerDMM handles before asking Cohere.
+    Returns (decision, what was detected), or (None, None).
     """
-    
-    # ========== PRE-PROCESSING FALLBACK ==========
-    # Handle specific patterns before sending to Cohere
     prompt_lower = prompt.lower().strip()
+    hits = Hits(prompt_lower)
     
     # Handle save commands (high priority)
-    if "save" in prompt_lower and any(word in prompt_lower for word in ["file", "notepad", "document", "text", "the"]):
-        print("[FirstLayerDMM] Detected save command via fallback")
-        return [f"content {prompt}"]
+    if "save" in prompt_lower and "dmm.save_target" in hits:
+        return [f"content {prompt}"], "save command"
     
     # Handle write/type commands with notepad
-    if any(word in prompt_lower for word in ["write", "type"]) and "notepad" in prompt_lower:
-        print("[FirstLayerDMM] Detected write command via fallback")
-        return [f"content {prompt}"]
+    if "dmm.write" in hits and "notepad" in prompt_lower:
+        return [f"content {prompt}"], "write command"
     
     # Handle general content creation with notepad
-    if "notepad" in prompt_lower and any(word in prompt_lower for word in ["create", "make", "joke", "poem", "story"]):
-        print("[FirstLayerDMM] Detected content creation via fallback")
-        return [f"content {prompt}"]
+    if "notepad" in prompt_lower and "dmm.notepad_content" in hits:
+        return [f"content {prompt}"], "content creation"
     
     # Handle exit commands
     if prompt_lower in ["exit", "quit", "bye", "goodbye", "stop"]:
-        print("[FirstLayerDMM] Detected exit command via fallback")
-        return ["exit"]
+        return ["exit"], "exit command"
     
+    return None, None
+
+@Traced("dmm")
+def FirstLayerDMM(prompt: str = "test"):
+    """
+    First Layer Decision Making Model
+    Uses Cohere AI to classify user queries with fallback logic
+    """
+    
+    # ========== PRE-PROCESSING FALLBACK ==========
+    # Handle specific patterns before sending to Cohere
+    decision, detected = PreCheck(prompt)
+    if decision:
+        print(f"[FirstLayerDMM] Detected {detected} via fallback")
+        return decision
+    
+    # ========== DECISION CACHE ==========
+    cache_key = NormalizeQuery(prompt)
+    if DecisionCacheEnabled and cache_key:
+        cached = decision_cache.get().get(cache_key)
+        if cached:
+            print(f"[FirstLayerDMM] Cached decision: {cached}")
+            return list(cached)
+
+    # ========== LOCAL CLASSIFIER ==========
+    if LocalIntent:
+        start = time.time()
+        with Span("dmm.local") as span:
+            decision, confidence = classifier.get().Classify(prompt)
+            span.set(confidence=round(confidence, 3))
+        if decision and confidence >= IntentConfidence:
+            RecordDecision("local", time.time() - start)
+            print(f"[FirstLayerDMM] Local decision ({confidence:.2f}): {decision}")
+            return decision
+
     # ========== COHERE API PROCESSING ==========
+    start = time.time()
     try:
         messages.append({"role": "user", "content": f"{prompt}"})
 
-        stream = co.chat(
-            model='command-xlarge-nightly', 
-            message=prompt,
-            temperature=0.7,
-            chat_history=ChatHistory,
-            prompt_truncation='OFF',
-            connectors=[],
-            preamble=preamble
-        )
-
-        response = ""
+        if CompilePrompt:
+            compiled = prompt_compiler.get().compile(prompt)
+            system_prompt, history, tokens = compiled.preamble, compiled.chat_history, compiled.tokens
+        else:
+            system_prompt, history, tokens = preamble, ChatHistory, None
 
-        for event in stream:
-            # Print the event to see its structure
-            if event[0] == 'text':
-                response = event[1]  # Get the text response
-            
-            if hasattr(event, 'event_type') and event.event_type == "text-generation":
-                response += event.text
+        with Span("dmm.cohere", input_tokens=tokens):
+            response = Complete(
+                "cohere",
+                'command-xlarge-nightly',
+                [{"role": "system", "content": system_prompt}] + history + [{"role": "user", "content": prompt}],
+                temperature=0.7,
+                prompt_truncation='OFF',
+                connectors=[]
+            )
 
         response = response.replace("\n", "")
         response = response.split(",")
@@ -131,6 +214,11 @@ def FirstLayerDMM(prompt: str = "test"):
             return FallbackDMM(prompt)
         
         print(f"[FirstLayerDMM] Cohere response: {response}")
+        RecordDecision("remote", time.time() - start)
+        # Reminders carry dates Cohere resolved relative to today
+        if DecisionCacheEnabled and cache_key and not any(task.startswith("reminder") for task in response):
+            decision_cache.get().set(cache_key, response)
+        LogDecision(prompt, response, classifier.get() if classifier.loaded else None)
         return response
     
     except Exception as e:
@@ -145,20 +233,21 @@ def FallbackDMM(prompt: str):
     print("[FallbackDMM] Using fallback logic...")
     
     prompt_lower = prompt.lower().strip()
+    hits = Hits(prompt_lower)
     
     # Save commands
     if "save" in prompt_lower:
         return [f"content {prompt}"]
     
     # Write/type commands
-    if any(word in prompt_lower for word in ["write", "type", "create text", "create file"]):
+    if "fallback.write" in hits:
         if "notepad" in prompt_lower:
             return [f"content {prompt}"]
         else:
             return [f"content {prompt}"]
     
     # Open commands
-    if any(word in prompt_lower for word in ["open", "launch", "start"]):
+    if "fallback.open" in hits:
         app_name = prompt_lower
         for word in ["open", "launch", "start"]:
             app_name = app_name.replace(word, "")
@@ -166,7 +255,7 @@ def FallbackDMM(prompt: str):
         return [f"open {app_name}"]
     
     # Close commands
-    if any(word in prompt_lower for word in ["close", "exit app", "quit"]):
+    if "fallback.close" in hits:
         app_name = prompt_lower
         for word in ["close", "exit", "quit"]:
             app_name = app_name.replace(word, "")
@@ -191,7 +280,7 @@ def FallbackDMM(prompt: str):
             return [f"google search {prompt_lower.replace('search', '').strip()}"]
     
     # Image generation
-    if any(word in prompt_lower for word in ["generate image", "create image", "make image"]):
+    if "fallback.image" in hits:
         image_prompt = prompt_lower
         for word in ["generate image", "create image", "make image", "generate", "create", "make"]:
             image_prompt = image_prompt.replace(word, "")
@@ -199,19 +288,19 @@ def FallbackDMM(prompt: str):
         return [f"generate image {image_prompt}"]
     
     # Reminder
-    if any(word in prompt_lower for word in ["remind", "reminder", "set reminder"]):
+    if "fallback.reminder" in hits:
         return [f"reminder {prompt}"]
     
     # System commands
-    if any(word in prompt_lower for word in ["volume", "mute", "unmute", "brightness"]):
+    if "fallback.system" in hits:
         return [f"system {prompt}"]
     
     # Realtime queries (news, weather, current events)
-    if any(word in prompt_lower for word in ["news", "weather", "temperature", "current", "latest", "today's"]):
+    if "fallback.realtime" in hits:
         return [f"realtime {prompt}"]
     
     # Exit commands
-    if any(word in prompt_lower for word in ["exit", "quit", "bye", "goodbye", "stop assistant"]):
+    if "fallback.exit" in hits:
         return ["exit"]
     
     # Default to general query
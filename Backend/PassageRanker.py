@@ -0,0 +1,214 @@
+from dotenv import dotenv_values
+from Backend.Startup import Lazy
+from Backend.Tracing import Span, RecordSpan
+from Backend.Cancellation import CurrentToken
+from Backend.PromptCompiler import EstimateTokens
+from Backend.SearchCache import SearchCache
+from Backend.SearchProviders import Session, bs4, CanonicalUrl
+from concurrent.futures import ThreadPoolExecutor, wait
+from collections import Counter
+import contextvars
+import threading
+import math
+import time
+import os
+import re
+
+env_vars = dotenv_values(".env")
+# Off by default: fetching pages adds a round trip before the answer starts
+PageFetchEnabled = env_vars.get("PageFetch", "False").lower() == "true"
+# Top results whose pages are fetched, fetches in flight, and seconds the whole stage may take
+PageFetchCount = int(env_vars.get("PageFetchCount", 3))
+PageFetchWorkers = int(env_vars.get("PageFetchWorkers", 4))
+PageFetchTimeout = float(env_vars.get("PageFetchTimeout", 3.0))
+# Bytes read from one page; the rest of a larger page is ignored
+PageMaxBytes = int(env_vars.get("PageMaxBytes", 2 * 1024 * 1024))
+# Words per passage, and tokens of passages handed to the LLM
+PassageWords = int(env_vars.get("PassageWords", 80))
+PassageBudget = int(env_vars.get("PassageBudget", 800))
+PageCachePath = os.path.join("Data", "PageCache.sqlite3")
+PageCacheMaxBytes = int(env_vars.get("PageCacheMaxBytes", 50 * 1024 * 1024))
+PageCacheTTL = float(env_vars.get("PageCacheTTL", 6 * 3600))
+
+# Page parts that are never the main text
+BoilerplateTags = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg"]
+TextTags = ["p", "li", "h1", "h2", "h3", "h4", "blockquote", "td", "pre"]
+StopWords = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "by", "at", "from", "is", "are",
+    "was", "were", "be", "been", "it", "its", "this", "that", "as", "what", "who", "which", "how", "when",
+    "where", "why", "do", "does", "did", "about", "tell", "me", "please", "can", "you",
+}
+
+# Extracted page text by URL, in the same kind of store as the search results
+page_cache = Lazy("page.cache", lambda: SearchCache(PageCachePath, PageCacheMaxBytes, PageCacheTTL, legacy_dir=None, verbose=False), warm=False)
+pool = Lazy("page.pool", lambda: ThreadPoolExecutor(max_workers=PageFetchWorkers, thread_name_prefix="PageFetch"), warm=False)
+
+stats = {"runs": 0, "fetched": 0, "cached": 0, "errors": 0, "timeouts": 0, "skipped": 0, "truncated": 0, "passages": 0, "selected": 0, "tokens": 0}
+stats_lock = threading.Lock()
+
+
+def Count(**amounts):
+    with stats_lock:
+        for counter, amount in amounts.items():
+            stats[counter] += amount
+
+
+# ---------- fetch and extract ----------
+
+def ExtractText(html):
+    """Main text of a page: its paragraphs, list items and headings, without navigation and other boilerplate"""
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    for tag in soup(BoilerplateTags):
+        tag.decompose()
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    blocks = [" ".join(tag.get_text(" ", strip=True).split()) for tag in root.find_all(TextTags)]
+    blocks = [block for block in blocks if len(block.split()) >= 5]
+    if not blocks:
+        blocks = [" ".join(root.get_text(" ", strip=True).split())]
+    return "\n".join(blocks)
+
+
+def ReadPage(url):
+    """
+    HTML of `url`, at most PageMaxBytes of it, or None if it is not an HTML
+    page (PDFs, images and downloads are never read)
+    """
+    with Session().get(url, timeout=PageFetchTimeout, stream=True) as response:
+        response.raise_for_status()
+        if "html" not in response.headers.get("Content-Type", "").lower():
+            Count(skipped=1)
+            return None
+        chunks, size = [], 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= PageMaxBytes:
+                Count(truncated=1)
+                break
+        return b"".join(chunks)[:PageMaxBytes].decode(response.encoding or "utf-8", "replace")
+
+
+def FetchPage(url):
+    """Extracted text of `url`, from the page cache or the web (records a span either way)"""
+    start = time.time()
+    key = CanonicalUrl(url)
+    text = page_cache.get().get(key, kind="page")
+    if text is not None:
+        Count(cached=1)
+        RecordSpan("pages.fetch.page", start, time.time(), url=url, cached=True)
+        return text
+    html = ReadPage(url)
+    fetched = time.time()
+    # Non-HTML pages are cached as empty text, so they are not requested again
+    text = ExtractText(html) if html else ""
+    page_cache.get().set(key, text)
+    Count(fetched=1)
+    RecordSpan("pages.fetch.page", start, time.time(), url=url, cached=False, extract=time.time() - fetched)
+    return text
+
+
+def FetchPages(urls):
+    """{url: text} for the pages that arrived within PageFetchTimeout; fetches run in the module's own page.pool"""
+    futures = {pool.get().submit(contextvars.copy_context().run, FetchPage, url): url for url in urls}
+    done, pending = wait(futures, timeout=PageFetchTimeout)
+    pages = {}
+    for future, url in futures.items():
+        if future in pending:
+            future.cancel()
+            Count(timeouts=1)
+            print(f"[Pages] {url} missed the {PageFetchTimeout:.1f}s deadline")
+        elif future.exception():
+            Count(errors=1)
+            print(f"[Pages] Could not fetch {url}: {future.exception()}")
+        elif future.result():
+            pages[url] = future.result()
+    return pages
+
+
+# ---------- passages and BM25 ----------
+
+def Terms(text):
+    return [word for word in re.findall(r"\w+", text.lower()) if word not in StopWords]
+
+
+def SplitPassages(text, words=PassageWords):
+    """Consecutive blocks joined into passages of about `words` words; long blocks are cut"""
+    passages, current = [], []
+    for block in text.split("\n"):
+        block_words = block.split()
+        while len(block_words) > words:
+            passages.append(" ".join(block_words[:words]))
+            block_words = block_words[words:]
+        if current and len(current) + len(block_words) > words:
+            passages.append(" ".join(current))
+            current = []
+        current.extend(block_words)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def BM25Scores(query, passages, k1=1.5, b=0.75):
+    """BM25 score of every passage for `query`, with document frequencies taken over `passages`"""
+    query_terms = set(Terms(query))
+    documents = [Counter(Terms(passage)) for passage in passages]
+    if not documents or not query_terms:
+        return [0.0] * len(passages)
+    average = sum(sum(document.values()) for document in documents) / len(documents) or 1
+    frequency = {term: sum(1 for document in documents if term in document) for term in query_terms}
+    scores = []
+    for document in documents:
+        length = sum(document.values())
+        score = 0.0
+        for term in query_terms:
+            tf = document[term]
+            if not tf:
+                continue
+            idf = math.log(1 + (len(documents) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average))
+        scores.append(score)
+    return scores
+
+
+def RankedPassages(query, results, budget=PassageBudget):
+    """
+    Passages from the pages of the top `results` (SearchResults) that best
+    match `query`, best first, within `budget` tokens: [(passage, url), ...].
+    Pages that fail or miss the deadline are left out.
+    """
+    token = CurrentToken()
+    Count(runs=1)
+    urls = [result.url for result in results[:PageFetchCount]]
+    with Span("pages.fetch", pages=len(urls)) as span:
+        pages = FetchPages(urls)
+        span.set(fetched=len(pages))
+    token.check()
+
+    with Span("pages.rank") as span:
+        passages = [(passage, url) for url, text in pages.items() for passage in SplitPassages(text)]
+        scores = BM25Scores(query, [passage for passage, _ in passages])
+        # Best score first; ties keep page order
+        ranked = sorted(range(len(passages)), key=lambda index: -scores[index])
+        selected, seen, used = [], set(), 0
+        for index in ranked:
+            if scores[index] <= 0:
+                break
+            # The same text syndicated on several pages is passed once
+            if passages[index][0] in seen:
+                continue
+            seen.add(passages[index][0])
+            tokens = EstimateTokens(passages[index][0])
+            if used + tokens > budget:
+                continue
+            selected.append(passages[index])
+            used += tokens
+        span.set(passages=len(passages), selected=len(selected), tokens=used)
+    Count(passages=len(passages), selected=len(selected), tokens=used)
+    return selected
+
+
+def Stats():
+    with stats_lock:
+        result = dict(stats)
+    result["cache"] = page_cache.get().stats() if page_cache.loaded else {}
+    return result
@@ -0,0 +1,148 @@
+from collections import OrderedDict
+import threading
+import atexit
+import json
+import time
+import os
+import re
+
+
+def NormalizeQuery(text):
+    """Lower-case, drop punctuation (keeping apostrophes) and collapse whitespace"""
+    text = re.sub(r"[^\w\s']", " ", str(text).lower())
+    return " ".join(text.split())
+
+
+class PersistentCache:
+    """
+    LRU cache with a per-entry TTL, saved to a JSON file so it survives restarts.
+    `fingerprint` identifies whatever produced the values (e.g. a hash of the
+    prompt); a file saved under a different fingerprint is discarded on load.
+    """
+
+    def __init__(self, path, max_entries=512, ttl=7 * 24 * 3600, fingerprint=None, save_interval=5.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fingerprint = fingerprint
+        self.save_interval = save_interval
+        self.entries = OrderedDict()  # key -> (value, expires_at)
+        self.lock = threading.RLock()
+        # One writer at a time, so an older snapshot never replaces a newer one
+        self.save_lock = threading.Lock()
+        # Changes made, and changes known to be on disk
+        self.changes = 0
+        self.saved = 0
+        self.last_save = 0.0
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+        self.load()
+        atexit.register(self.save)
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[PersistentCache] Could not read {self.path}: {e}")
+            return
+
+        if data.get("fingerprint") != self.fingerprint:
+            print(f"[PersistentCache] {self.path} was built for a different fingerprint; starting empty")
+            self.changes += 1
+            return
+        now = time.time()
+        with self.lock:
+            for key, value, expires_at in data.get("entries", []):
+                if expires_at > now:
+                    self.entries[key] = (value, expires_at)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def save(self):
+        """
+        Write the cache to disk if it changed (atomically, via a temp file).
+        It only counts as saved once the file is replaced; a failed write is
+        retried by the next save.
+        """
+        with self.save_lock:
+            with self.lock:
+                if self.changes == self.saved:
+                    return
+                changes = self.changes
+                data = {
+                    "fingerprint": self.fingerprint,
+                    "entries": [[key, value, expires_at] for key, (value, expires_at) in self.entries.items()],
+                }
+                self.last_save = time.time()
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_path, self.path)
+            except Exception as e:
+                print(f"[PersistentCache] Could not save {self.path}: {e}")
+                return
+            with self.lock:
+                self.saved = changes
+
+    def get(self, key, default=None):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                self.counters["misses"] += 1
+                return default
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self.entries[key]
+                self.changes += 1
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return default
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return value
+
+    def peek(self, key):
+        """Return a live entry without touching LRU order or counters"""
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None or item[1] <= time.time():
+                return None
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (value, time.time() + (self.ttl if ttl is None else ttl))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+            self.changes += 1
+            due = time.time() - self.last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def invalidate(self, fingerprint=None):
+        """Drop every entry; with a new `fingerprint`, only if it differs from the current one"""
+        with self.lock:
+            if fingerprint is not None:
+                if fingerprint == self.fingerprint:
+                    return False
+                self.fingerprint = fingerprint
+            self.entries.clear()
+            self.changes += 1
+            self.counters["invalidations"] += 1
+        self.save()
+        return True
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, size=len(self.entries),
+                        hit_rate=self.counters["hits"] / lookups if lookups else 0.0)
+
+    def __len__(self):
+        return len(self.entries)
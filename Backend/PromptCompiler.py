@@ -0,0 +1,146 @@
+from collections import Counter
+import threading
+import math
+import re
+
+# Inline examples in the preamble ("like if the query is 'x' respond with 'y'")
+InlineExample = re.compile(r"(?:like )?if the query is '(.+?)' respond with '(.+?)'(?=[\s,.]|$)")
+Word = re.compile(r"\w+|[^\w\s]")
+
+encoding = None
+
+
+def EstimateTokens(text):
+    """
+    Token count of `text`: exact with tiktoken if it is installed, otherwise
+    an estimate (one token per word or punctuation mark, long words split every 6 characters).
+    """
+    global encoding
+    if encoding is None:
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            encoding = False
+    if encoding:
+        return len(encoding.encode(text))
+    return sum(max(1, math.ceil(len(piece) / 6)) for piece in Word.findall(text))
+
+
+def Words(text):
+    return set(re.findall(r"[a-z0-9']+", text.lower()))
+
+
+def SplitPreamble(preamble):
+    """Return (rules text without inline examples, [(query, decision)] taken out)"""
+    examples = InlineExample.findall(preamble)
+    rules = InlineExample.sub("", preamble)
+    rules = re.sub(r"(\s*,\s*)+(?=etc|and so on|\.)", " ", rules)
+    rules = re.sub(r"\s+etc\s*\.", " etc.", rules)
+    rules = "\n".join(" ".join(line.split()) for line in rules.strip().splitlines() if line.strip())
+    return rules, examples
+
+
+def PairChatHistory(history):
+    """(query, decision) pairs of User/Chatbot turns; a User turn without a reply is dropped"""
+    return [(turn["message"], reply["message"]) for turn, reply in zip(history, history[1:])
+            if turn["role"] == "User" and reply["role"] == "Chatbot"]
+
+
+class FewShot:
+    def __init__(self, query, decision, pinned=False):
+        self.query = query
+        self.decision = decision
+        self.pinned = pinned
+        self.words = Words(query)
+        # Each of the two chat turns costs a few tokens of role markup on top of its text
+        self.tokens = EstimateTokens(query) + EstimateTokens(decision) + 8
+
+    def turns(self):
+        return [{"role": "User", "message": self.query}, {"role": "Chatbot", "message": self.decision}]
+
+
+class CompiledPrompt:
+    def __init__(self, preamble, chat_history, tokens):
+        self.preamble = preamble
+        self.chat_history = chat_history
+        self.tokens = tokens
+
+
+class PromptCompiler:
+    """
+    Builds the DMM prompt for one query.
+    The static part (the preamble's rules, with its inline examples moved into
+    the few-shot pool) is assembled and measured once; per query only the
+    few-shot examples most relevant to it are picked, within `budget` tokens.
+    Multi-command examples are pinned so the "open x, general y" format is
+    always demonstrated.
+    """
+
+    def __init__(self, preamble, history, budget=200):
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.load(preamble, history)
+
+    def load(self, preamble, history):
+        rules, inline = SplitPreamble(preamble)
+        pool = [FewShot(query, decision) for query, decision in inline]
+        pool += [FewShot(query, decision, pinned="," in decision) for query, decision in PairChatHistory(history)]
+
+        # Rarer words say more about relevance
+        document_frequency = Counter(word for example in pool for word in example.words)
+        idf = {word: math.log((1 + len(pool)) / (1 + count)) + 1 for word, count in document_frequency.items()}
+
+        with self.lock:
+            self.rules = rules
+            self.pool = pool
+            self.idf = idf
+            self.sections = {
+                "preamble": EstimateTokens(preamble),
+                "rules": EstimateTokens(rules),
+                "history": sum(EstimateTokens(turn["message"]) + 4 for turn in history),
+                "examples": sum(example.tokens for example in pool),
+            }
+            # Cost of each rule line, to see which ones are worth trimming
+            self.rule_tokens = [(line[:48], EstimateTokens(line)) for line in rules.splitlines()]
+
+    def relevance(self, example, words):
+        overlap = example.words & words
+        if not overlap:
+            return 0.0
+        return sum(self.idf.get(word, 1.0) for word in overlap) / math.sqrt(len(example.words))
+
+    def compile(self, query):
+        words = Words(query)
+        with self.lock:
+            ranked = sorted(self.pool, key=lambda example: (not example.pinned, -self.relevance(example, words)))
+            chosen, used = [], 0
+            for example in ranked:
+                if used + example.tokens > self.budget:
+                    continue
+                if not example.pinned and not self.relevance(example, words):
+                    break
+                chosen.append(example)
+                used += example.tokens
+
+            # Most relevant example last, right before the query
+            chosen.sort(key=lambda example: (not example.pinned, self.relevance(example, words)))
+            history = [turn for example in chosen for turn in example.turns()]
+            tokens = self.sections["rules"] + used + EstimateTokens(query)
+            full = self.sections["preamble"] + self.sections["history"] + EstimateTokens(query)
+            self.counters["calls"] += 1
+            self.counters["tokens"] += tokens
+            self.counters["full_tokens"] += full
+        return CompiledPrompt(self.rules, history, tokens)
+
+    def stats(self):
+        with self.lock:
+            calls = self.counters["calls"]
+            return dict(
+                sections=dict(self.sections),
+                rules=list(self.rule_tokens),
+                calls=calls,
+                avg_tokens=self.counters["tokens"] / calls if calls else 0.0,
+                avg_full_tokens=self.counters["full_tokens"] / calls if calls else 0.0,
+            )
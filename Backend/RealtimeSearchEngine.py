@@ -2,31 +2,36 @@ import os
 import datetime
 import json
 from json import load, dump
-from googlesearch import search
-from groq import Groq
 from dotenv import dotenv_values
-import hashlib
 import time
+import threading
 import re
 from collections import Counter
+from Backend.ChatLog import AppendChatLog, ChatLogPath
+from Backend.ContextWindow import PackContext, MessageTokens
+from Backend.PromptCompiler import EstimateTokens
+from Backend.Streaming import Consume, AsyncIterate
+from Backend.Tracing import Span, Traced
+from Backend.Startup import Lazy
+from Backend.SearchCache import SearchCache, SearchCacheTTL
+from Backend.SearchProviders import Search as SearchAll
+from Backend.PassageRanker import PageFetchEnabled, RankedPassages
+from Backend.LLMRouter import RouteStream, ChatRoutes
+from Backend.Cancellation import CurrentToken, Cancelled
+from Backend.KeywordRules import RegisterRules, Hits, FirstRule
 
 # Load environment variables
 env_vars = dotenv_values(".env")
 Username = env_vars.get("Username", "User")
 Assistantname = env_vars.get("Assistantname", "Jarvis")
-GroqAPIKey = env_vars.get("GroqAPIKey")
-
-# Initialize Groq client
-client = Groq(api_key=GroqAPIKey)
+RealtimeContextBudget = int(env_vars.get("RealtimeContextBudget", 1500))
 
 # Ensure Data folder exists
 if not os.path.exists("Data"):
     os.makedirs("Data")
 
-# Cache directory for search results
-CACHE_DIR = "Data/SearchCache"
-if not os.path.exists(CACHE_DIR):
-    os.makedirs(CACHE_DIR)
+# Search results cache (one SQLite file, LRU under a byte budget); opened on first use
+search_cache = Lazy("search.cache", SearchCache)
 
 # Query history for analytics
 QUERY_HISTORY_PATH = "Data/QueryHistory.json"
@@ -34,16 +39,6 @@ QUERY_HISTORY_PATH = "Data/QueryHistory.json"
 # Fact checking database
 FACT_CHECK_PATH = "Data/FactCheck.json"
 
-# Initialize ChatLog
-ChatLogPath = r"Data\ChatLog.json"
-try:
-    with open(ChatLogPath, "r", encoding='utf-8') as f:
-        messages = load(f)
-except:
-    messages = []
-    with open(ChatLogPath, "w", encoding='utf-8') as f:
-        dump(messages, f, indent=4)
-
 # Enhanced system prompt
 System = f"""
 You are {Assistantname}, an advanced AI assistant helping {Username}.
@@ -97,89 +92,73 @@ Time: {hour}:{minute} ({time_of_day})
 
 Use this information to provide contextually relevant answers."""
 
-# Cache management functions
-def get_cache_key(query):
-    """Generate a unique cache key for a query"""
-    return hashlib.md5(query.lower().strip().encode()).hexdigest()
-
-def get_cached_results(query, cache_duration=3600):
-    """
-    Get cached search results if available and fresh
-    cache_duration: in seconds (default 1 hour)
-    """
-    cache_key = get_cache_key(query)
-    cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
-    
-    if os.path.exists(cache_file):
-        try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-            
-            # Check if cache is still valid
-            cache_time = cache_data.get('timestamp', 0)
-            if time.time() - cache_time < cache_duration:
-                print(f"[Cache] Using cached results for: {query}")
-                return cache_data.get('results')
-        except:
-            pass
-    
-    return None
-
-def save_to_cache(query, results):
-    """Save search results to cache"""
-    cache_key = get_cache_key(query)
-    cache_file = os.path.join(CACHE_DIR, f"{cache_key}.json")
-    
-    cache_data = {
-        'query': query,
-        'timestamp': time.time(),
-        'results': results
-    }
-    
-    try:
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=4)
-        print(f"[Cache] Saved results for: {query}")
-    except Exception as e:
-        print(f"[Cache] Error saving: {e}")
-
 # Enhanced Google Search with caching and better formatting
+@Traced("search.google")
 def GoogleSearch(query, max_results=5, use_cache=True):
     """
-    Perform Google search with caching and enhanced result formatting
+    Perform a web search (every provider in SearchProviders, merged) with
+    caching and enhanced result formatting. Cached results live as long as
+    their query type's CachePolicy allows; stale ones are returned right
+    away while a background search refreshes them.
     """
     print(f"[Search] Searching for: {query}")
+    query_type = DetectQueryType(query)
     
     # Check cache first
     if use_cache:
-        cached_results = get_cached_results(query)
+        cached_results, stale = search_cache.get().lookup(query, query_type)
         if cached_results:
+            if stale:
+                RefreshInBackground(query, max_results, query_type)
             return cached_results
     
+    answer = FormatSearch(query, max_results)
+    
+    # Save to cache
+    if answer and use_cache:
+        StoreSearch(query, answer, query_type)
+    
+    return answer
+
+
+def FormatSearch(query, max_results=5):
+    """
+    Search results for `query` formatted for the LLM, or "" if there are none
+    """
     try:
-        results = list(search(query, advanced=True, num_results=max_results))
+        results = SearchAll(query, max_results)
         
         if not results:
             return ""
         
+        # Best passages from the top pages, when page fetching is on; they replace those pages' snippets
+        passages = []
+        if PageFetchEnabled:
+            try:
+                passages = RankedPassages(query, results)
+            except Cancelled:
+                raise
+            except Exception as e:
+                print(f"[Pages] Passage ranking failed: {e}")
+        
         # Format results with better structure
         answer = f"Search Results for '{query}':\n\n"
+        passage_urls = {url for _, url in passages}
         
         for i, r in enumerate(results, start=1):
-            title = r.title if hasattr(r, 'title') else "No title"
-            url = r.url if hasattr(r, 'url') else (r.link if hasattr(r, 'link') else r)
-            description = r.description if hasattr(r, 'description') else ""
+            title, url, description = r.title, r.url, r.description
             
             answer += f"[{i}] {title}\n"
-            if description:
+            if description and url not in passage_urls:
                 # Limit description length
                 description = description[:200] + "..." if len(description) > 200 else description
                 answer += f"    {description}\n"
             answer += f"    Source: {url}\n\n"
         
-        # Save to cache
-        if use_cache:
-            save_to_cache(query, answer)
+        if passages:
+            answer += "Relevant passages from these pages:\n\n"
+            for passage, url in passages:
+                answer += f"- {passage}\n    Source: {url}\n\n"
         
         return answer
         
@@ -188,50 +167,81 @@ def GoogleSearch(query, max_results=5, use_cache=True):
         print(f"[Search Error] {error_msg}")
         return ""
 
+
+def StoreSearch(query, answer, query_type):
+    ttl, max_stale = CachePolicy(query_type)
+    if ttl > 0:
+        search_cache.get().set(query, answer, ttl=ttl, max_stale=max_stale)
+
+
+# Stale searches being refreshed, so each is refreshed only once at a time
+refreshing = set()
+refreshing_lock = threading.Lock()
+
+
+def RefreshInBackground(query, max_results, query_type):
+    """Search `query` again on a daemon thread and replace its cached results"""
+    with refreshing_lock:
+        if query in refreshing:
+            return
+        refreshing.add(query)
+
+    def refresh():
+        try:
+            with Span("search.refresh", query_type=query_type):
+                answer = FormatSearch(query, max_results)
+            if answer:
+                StoreSearch(query, answer, query_type)
+            search_cache.get().refreshed(query_type, ok=bool(answer))
+        finally:
+            with refreshing_lock:
+                refreshing.discard(query)
+
+    # Not tied to the current turn: a cancelled turn still leaves a refreshed cache
+    threading.Thread(target=refresh, daemon=True, name="SearchRefresh").start()
+
+
+# Query types in priority order, with the keywords that signal them
+QueryTypes = [
+    ("comparison", ["vs", "versus", "compare", "difference between", "better than"]),
+    ("news", ["news", "latest", "recent", "today", "yesterday", "breaking"]),
+    ("weather", ["weather", "temperature", "forecast", "rain", "sunny", "climate"]),
+    ("datetime", ["time", "date", "day", "when is", "what day"]),
+    ("factual", ["what is", "who is", "where is", "define", "meaning", "explain"]),
+    ("howto", ["how to", "tutorial", "guide", "steps", "instructions"]),
+    ("list", ["list of", "top 10", "best", "recommended", "suggestions"]),
+    ("calculation", ["calculate", "solve", "math", "equation", "convert"]),
+    ("opinion", ["review", "opinion", "should i", "is it worth", "recommend"]),
+]
+QueryTypeRules = [f"query.{name}" for name, _ in QueryTypes]
+RegisterRules({f"query.{name}": keywords for name, keywords in QueryTypes})
+RegisterRules({"query.temporal": ["latest", "recent", "today", "now"]})
+
 # Detect query type for better handling
 def DetectQueryType(query):
     """
     Detect what type of query this is to optimize response
     """
-    query_lower = query.lower()
-    
-    # Comparison queries
-    if any(word in query_lower for word in ["vs", "versus", "compare", "difference between", "better than"]):
-        return "comparison"
-    
-    # News-related queries
-    if any(word in query_lower for word in ["news", "latest", "recent", "today", "yesterday", "breaking"]):
-        return "news"
-    
-    # Weather queries
-    if any(word in query_lower for word in ["weather", "temperature", "forecast", "rain", "sunny", "climate"]):
-        return "weather"
-    
-    # Time/date queries
-    if any(word in query_lower for word in ["time", "date", "day", "when is", "what day"]):
-        return "datetime"
-    
-    # Factual queries
-    if any(word in query_lower for word in ["what is", "who is", "where is", "define", "meaning", "explain"]):
-        return "factual"
-    
-    # How-to queries
-    if any(word in query_lower for word in ["how to", "tutorial", "guide", "steps", "instructions"]):
-        return "howto"
-    
-    # List queries
-    if any(word in query_lower for word in ["list of", "top 10", "best", "recommended", "suggestions"]):
-        return "list"
-    
-    # Calculation/Math
-    if any(word in query_lower for word in ["calculate", "solve", "math", "equation", "convert"]):
-        return "calculation"
-    
-    # Opinion/Review queries
-    if any(word in query_lower for word in ["review", "opinion", "should i", "is it worth", "recommend"]):
-        return "opinion"
-    
-    return "general"
+    rule = FirstRule(query, QueryTypeRules)
+    return rule[len("query."):] if rule else "general"
+
+
+# Seconds cached search results stay fresh per query type, and how much longer
+# they may still be served (while being refreshed) once they have expired
+CachePolicies = {
+    "news": (10 * 60, 30 * 60),
+    "weather": (30 * 60, 30 * 60),
+    "datetime": (0, 0),  # never cached
+    "factual": (7 * 24 * 3600, 7 * 24 * 3600),
+    "howto": (3 * 24 * 3600, 3 * 24 * 3600),
+    "list": (24 * 3600, 24 * 3600),
+    "general": (SearchCacheTTL, SearchCacheTTL),
+}
+
+
+def CachePolicy(query_type):
+    """(ttl, max_stale) in seconds for search results of `query_type`"""
+    return CachePolicies.get(query_type, CachePolicies["general"])
 
 
 # Advanced query preprocessing
@@ -246,7 +256,7 @@ def PreprocessQuery(query):
     query_lower = query.lower()
     
     # If asking about current events, add temporal context
-    if any(word in query_lower for word in ["latest", "recent", "today", "now"]):
+    if "query.temporal" in Hits(query_lower):
         current_year = datetime.datetime.now().year
         if str(current_year) not in query:
             query = f"{query} {current_year}"
@@ -259,16 +269,11 @@ def MultiSourceSearch(query, max_results=5):
     """
     Search multiple sources and aggregate results
     """
-    all_results = []
-    
-    # Google Search
     try:
-        google_results = list(search(query, advanced=True, num_results=max_results))
-        all_results.extend(google_results)
+        return SearchAll(query, max_results)
     except Exception as e:
-        print(f"[MultiSearch] Google error: {e}")
-    
-    return all_results
+        print(f"[MultiSearch] Error: {e}")
+        return []
 
 
 # Extract key information from search results
@@ -453,65 +458,91 @@ def ValidateResponse(response):
     
     return True
 
-# Main Realtime Search Engine function
-def RealtimeSearchEngine(prompt, max_results=5, use_cache=True):
+# Streaming Realtime Search Engine
+def StreamRealtimeSearchEngine(prompt, max_results=5, use_cache=True, LogPath=ChatLogPath, Search=None):
     """
-    Enhanced realtime search with better accuracy and features
+    Generator form of RealtimeSearchEngine: yields the answer's text deltas as
+    they stream in, then one metadata dict (answer, query_type, attempts,
+    provider, hedged, prompt_tokens, completion_tokens, ttft, elapsed).
+    AnswerModifier and the chat log are applied once the stream is complete.
+    Raises Cancelled if the turn is cancelled; nothing is saved in that case.
+    An error after text was yielded is not retried: the partial answer is
+    kept and the error recorded in the metadata.
     """
-    global SystemChatBot, messages
-
+    token = CurrentToken()
+    start = time.time()
+    meta = {"answer": "", "query_type": None, "attempts": 0, "prompt_tokens": 0, "completion_tokens": 0, "ttft": None, "elapsed": 0.0}
     print(f"\n[RealtimeSearch] Processing query: {prompt}")
     
     # Detect query type
     query_type = DetectQueryType(prompt)
+    meta["query_type"] = query_type
     print(f"[RealtimeSearch] Query type: {query_type}")
 
-    # Load chat history
-    try:
-        with open(ChatLogPath, "r", encoding='utf-8') as f:
-            messages = load(f)
-    except:
-        messages = []
+    # Recent chat history within the token budget (search results take the rest)
+    messages = PackContext(LogPath, RealtimeContextBudget)
 
     # Add user query
     messages.append({"role": "user", "content": prompt})
 
     # Get Google Search results with caching
-    search_results = GoogleSearch(prompt, max_results=max_results, use_cache=use_cache)
+    if Search:
+        search_results = Search()
+    else:
+        search_results = GoogleSearch(prompt, max_results=max_results, use_cache=use_cache)
+    token.check()
     
     if not search_results:
         search_context = f"No specific search results found for '{prompt}'. Provide a general, accurate answer based on your knowledge."
     else:
         search_context = f"Use these search results to answer accurately:\n\n{search_results}\n\nProvide a concise answer citing relevant sources."
 
-    # Append system message with search results
-    SystemChatBot.append({"role": "system", "content": search_context})
+    # Add system message with search results (kept per call so parallel searches don't mix)
+    SystemMessages = SystemChatBot + [{"role": "system", "content": search_context}]
 
     # Send request to Groq with retry logic
     max_retries = 2
+    yielded = False
     for attempt in range(max_retries):
         try:
             print(f"[RealtimeSearch] Sending request to AI (attempt {attempt + 1})")
-            
-            completion = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=SystemChatBot + [{"role": "system", "content": Information()}] + messages[-10:],  # Last 10 messages for context
-                max_tokens=2048,
-                temperature=0.7,
-                top_p=0.9,
-                stream=True,
-                stop=None
-            )
-
-            Answer = ""
-            for chunk in completion:
-                if chunk.choices[0].delta.content:
-                    Answer += chunk.choices[0].delta.content
-
+            meta["attempts"] = attempt + 1
+
+            request = SystemMessages + [{"role": "system", "content": Information()}] + messages
+            meta["prompt_tokens"] = sum(MessageTokens(message) for message in request)
+
+            with Span("realtime.groq", attempt=attempt + 1) as span:
+                # Groq, hedged with the secondary provider when it is slow (see Backend/LLMRouter.py)
+                completion = RouteStream(
+                    ChatRoutes("llama-3.3-70b-versatile"),
+                    request,
+                    meta,
+                    max_tokens=2048,
+                    temperature=0.7,
+                    top_p=0.9,
+                    stop=None
+                )
+
+                Answer = ""
+                for delta in completion:
+                    if token.cancelled:
+                        # Closing the stream stops the request and frees its connection
+                        span.set(cancelled=True)
+                        completion.close()
+                        break
+                    if not Answer:
+                        span.set(ttft=time.time() - span.start, provider=meta.get("provider"))
+                        meta["ttft"] = meta["ttft"] or time.time() - start
+                    Answer += delta
+                    yielded = True
+                    yield delta
+
+            token.check()
+            streamed = bool(Answer)
             Answer = AnswerModifier(Answer)
             
-            # Validate response quality
-            if not ValidateResponse(Answer):
+            # Validate response quality (a streamed answer has already been shown and spoken, so keep it)
+            if not ValidateResponse(Answer) and not streamed:
                 if attempt < max_retries - 1:
                     print("[RealtimeSearch] Response quality low, retrying...")
                     continue
@@ -520,48 +551,60 @@ def RealtimeSearchEngine(prompt, max_results=5, use_cache=True):
             
             # Save to chat log
             messages.append({"role": "assistant", "content": Answer})
-            
-            with open(ChatLogPath, "w", encoding='utf-8') as f:
-                dump(messages, f, indent=4, ensure_ascii=False)
+            AppendChatLog(messages[-2:], LogPath)
 
-            SystemChatBot.pop()
             print(f"[RealtimeSearch] Response generated successfully")
-            return Answer
+            meta.update(answer=Answer, completion_tokens=EstimateTokens(Answer))
+            break
 
+        except Cancelled:
+            print(f"[RealtimeSearch] Cancelled: {token.reason}")
+            raise
         except Exception as e:
             print(f"[RealtimeSearch] Error on attempt {attempt + 1}: {e}")
+            if yielded:
+                # Part of the answer is already shown; a retry would repeat it, so keep what arrived
+                Answer = AnswerModifier(Answer)
+                messages.append({"role": "assistant", "content": Answer})
+                AppendChatLog(messages[-2:], LogPath)
+                meta.update(answer=Answer, completion_tokens=EstimateTokens(Answer), error=str(e))
+                break
             if attempt < max_retries - 1:
-                time.sleep(1)
+                # Retry after a second unless the turn is cancelled meanwhile
+                if token.wait(1):
+                    raise Cancelled(token.reason)
                 continue
             else:
-                SystemChatBot.pop()
-                return f"I encountered an error processing your query. Please try again."
+                meta.update(answer="I encountered an error processing your query. Please try again.", error=str(e))
+    else:
+        meta["answer"] = meta["answer"] or "Unable to process query after multiple attempts."
 
-    return "Unable to process query after multiple attempts."
+    meta["elapsed"] = time.time() - start
+    yield meta
 
-# Clear old cache (optional cleanup function)
-def ClearOldCache(max_age_hours=24):
-    """Remove cache files older than specified hours"""
-    try:
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
-        
-        for filename in os.listdir(CACHE_DIR):
-            filepath = os.path.join(CACHE_DIR, filename)
-            if os.path.isfile(filepath):
-                file_age = current_time - os.path.getmtime(filepath)
-                if file_age > max_age_seconds:
-                    os.remove(filepath)
-                    print(f"[Cache] Removed old cache: {filename}")
-    except Exception as e:
-        print(f"[Cache] Error clearing cache: {e}")
+def AStreamRealtimeSearchEngine(prompt, max_results=5, use_cache=True, LogPath=ChatLogPath, Search=None):
+    """StreamRealtimeSearchEngine for asyncio callers: `async for item in AStreamRealtimeSearchEngine(prompt)`"""
+    return AsyncIterate(StreamRealtimeSearchEngine(prompt, max_results, use_cache, LogPath, Search))
+
+# Main Realtime Search Engine function
+@Traced("realtime")
+def RealtimeSearchEngine(prompt, max_results=5, use_cache=True, OnText=None, LogPath=ChatLogPath, Search=None):
+    """
+    Enhanced realtime search with better accuracy and features
+    If `OnText` is given it is called with every text delta as it streams in.
+    `LogPath` selects the conversation history (one file per server session).
+    `Search()`, if given, supplies the search results instead of GoogleSearch
+    (used to hand over a speculative search, see Backend/Speculation.py).
+    Raises Cancelled if the turn is cancelled; nothing is saved in that case.
+    """
+    return Consume(StreamRealtimeSearchEngine(prompt, max_results, use_cache, LogPath, Search), OnText)["answer"]
 
 # Main loop for testing
 if __name__ == "__main__":
     print(f"{Assistantname} Realtime Search Engine is online!\n")
     
-    # Clear old cache on startup
-    ClearOldCache()
+    # Drop expired searches on startup
+    search_cache.get().purge_expired()
     
     while True:
         prompt = input("\nEnter Your Query (or 'exit' to quit): ").strip()
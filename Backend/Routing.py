@@ -0,0 +1,146 @@
+from Backend.Automation import Automation
+from Backend.ImageGeneration import SubmitImageJob
+from Backend.KeywordRules import RegisterRules, Hits
+from asyncio import run
+
+# Decision prefixes handled by Automation
+valid_functions = [
+    "open", "close", "play", "system", "content",
+    "google search", "youtube search",
+    "open file", "edit file", "read file", "create file",
+    "delete file", "copy file", "move file", "rename file",
+    "list files", "file info"
+]
+
+RegisterRules({
+    # QueryModifier: a question word followed by a space
+    "question": [word + " " for word in ['how','what','who','where','when','why','which','whom','can you',"what's", "where's","how's"]],
+})
+
+
+def QueryModifier(Query):
+    """Lower-case the query and end it with '?' for questions or '.' otherwise"""
+    new_query = Query.lower().strip()
+    query_words  = new_query.split()
+
+    if "question" in Hits(new_query):
+        if query_words[-1][-1] in ['.','?','!']:
+            new_query = new_query[:-1] + "?"
+        else:
+            new_query += "?"
+    else:
+        if query_words[-1][-1] in ['.','?','!']:
+            new_query = new_query[:-1] + '.'
+        else:
+            new_query += '.'
+
+    return new_query.capitalize()
+
+
+def FallbackDecision(Query):
+    """Parse the query directly when FirstLayerDMM returns nothing"""
+    print("[Fix] FirstLayerDMM returned empty. Parsing query directly...")
+    Query_lower = Query.lower().strip()
+
+    # Plain scans on purpose: the first keyword usually hits, which is cheaper
+    # than a KeywordRules lookup for these short tables
+    # Check for automation commands
+    if any(keyword in Query_lower for keyword in ["open", "close", "play", "start", "launch"]):
+        Decision = [Query_lower]
+        print(f"[Fix] Detected automation command: {Decision}")
+
+    # Check for search commands
+    elif "search" in Query_lower:
+        if "youtube" in Query_lower:
+            Decision = [Query_lower]
+        elif "google" in Query_lower:
+            Decision = [Query_lower]
+        else:
+            Decision = [f"google search {Query_lower.replace('search', '').strip()}"]
+        print(f"[Fix] Detected search command: {Decision}")
+
+    # Check for content/notepad commands
+    elif any(keyword in Query_lower for keyword in ["write", "create", "type"]) and "notepad" in Query_lower:
+        Decision = [f"content {Query}"]
+        print(f"[Fix] Detected content command: {Decision}")
+
+    # Check for exit commands
+    elif any(keyword in Query_lower for keyword in ["exit", "quit", "bye", "goodbye", "stop"]):
+        Decision = ["exit"]
+        print(f"[Fix] Detected exit command")
+
+    # Otherwise treat as general query
+    else:
+        Decision = [f"general {Query}"]
+        print(f"[Fix] Treating as general query")
+
+    return Decision
+
+
+def CategorizeDecision(Decision):
+    """
+    Split FirstLayerDMM's decision into task categories.
+    Returns (ordered_tasks, groups): ordered_tasks is a list of (category, payload)
+    in the order the user asked, with every automation command batched into the
+    first automation entry; groups maps each category to its commands.
+    """
+    groups = {"automation": [], "general": [], "realtime": [], "image": []}
+    ordered_tasks = []
+
+    for cmd in Decision:
+        cmd_lower = cmd.lower()
+
+        # Check if it's an automation command
+        if any(cmd_lower.startswith(func) for func in valid_functions):
+            if not groups["automation"]:
+                ordered_tasks.append(("automation", groups["automation"]))
+            groups["automation"].append(cmd)
+        # Check for general queries
+        elif cmd_lower.startswith("general"):
+            groups["general"].append(cmd.replace("general", "").strip())
+            ordered_tasks.append(("general", groups["general"][-1]))
+        # Check for realtime queries
+        elif cmd_lower.startswith("realtime"):
+            groups["realtime"].append(cmd.replace("realtime", "").strip())
+            ordered_tasks.append(("realtime", groups["realtime"][-1]))
+        # Check for image generation
+        elif "generate" in cmd_lower or "image" in cmd_lower:
+            groups["image"].append(cmd)
+            ordered_tasks.append(("image", cmd))
+        # Default to general query if no match
+        else:
+            groups["general"].append(cmd)
+            ordered_tasks.append(("general", cmd))
+
+    return ordered_tasks, groups
+
+
+# ==================== TASK RUNNERS ====================
+
+def RunAutomation(commands):
+    """Run automation commands in the calling worker thread"""
+    try:
+        run(Automation(commands))
+        return True
+    except Exception:
+        import traceback
+        traceback.print_exc()
+        raise
+
+
+def RunStreaming(func, query, buffer):
+    """Run ChatBot/RealtimeSearchEngine, forwarding text deltas into `buffer`"""
+    try:
+        return func(query, OnText=buffer.write)
+    finally:
+        buffer.close()
+
+
+def StartImageGeneration(ImageGenerationQuery):
+    """Queue the prompt on the persistent image worker"""
+    prompt = ImageGenerationQuery
+    if prompt.lower().startswith("generate image"):
+        prompt = prompt[len("generate image"):].strip() or ImageGenerationQuery
+    job_id = SubmitImageJob(prompt)
+    print(f"[Routing] Image generation queued as job {job_id}")
+    return job_id
@@ -0,0 +1,195 @@
+from dotenv import dotenv_values
+import threading
+import sqlite3
+import hashlib
+import json
+import time
+import os
+
+env_vars = dotenv_values(".env")
+SearchCachePath = os.path.join("Data", "SearchCache.sqlite3")
+# Total size of cached results; least recently used entries go first beyond it
+SearchCacheMaxBytes = int(env_vars.get("SearchCacheMaxBytes", 20 * 1024 * 1024))
+SearchCacheTTL = float(env_vars.get("SearchCacheTTL", 3600))
+# Seconds past expiry an entry may still be served while it is refreshed (per entry; 0 = never)
+SearchCacheMaxStale = float(env_vars.get("SearchCacheMaxStale", 0))
+# Where the old one-JSON-file-per-query cache lived
+LegacyCacheDir = os.path.join("Data", "SearchCache")
+
+Schema = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    results TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE INDEX IF NOT EXISTS entries_stale_until ON entries (stale_until);
+"""
+
+
+def CacheKey(query):
+    """Same key as the old per-file cache, so migrated entries are found again"""
+    return hashlib.md5(query.lower().strip().encode()).hexdigest()
+
+
+class SearchCache:
+    """
+    Search results in one SQLite file. Lookups and expiry go through indexes
+    (no directory scans), and the least recently used entries are evicted
+    once the results exceed `max_bytes` in total.
+    An expired entry is kept until its `stale_until` time, so lookup() can
+    still serve it while the caller refreshes it.
+    """
+
+    def __init__(self, path=SearchCachePath, max_bytes=SearchCacheMaxBytes, ttl=SearchCacheTTL, legacy_dir=LegacyCacheDir, verbose=True):
+        self.path = path
+        self.verbose = verbose
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0, "stale_hits": 0}
+        self.by_type = {}  # query type -> freshness counters, see lookup()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(Schema)
+        self.bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.last_purge = 0.0
+        if legacy_dir:
+            self.migrate(legacy_dir)
+
+    def get(self, query, kind="general"):
+        """Cached results for `query`, or None if there are none or they have expired"""
+        results, stale = self.lookup(query, kind, allow_stale=False)
+        return results
+
+    def lookup(self, query, kind="general", allow_stale=True):
+        """
+        (results, stale) for `query`: fresh results with stale False, expired
+        ones still within their staleness bound with stale True (if
+        `allow_stale`), or (None, False). Counted under the query type `kind`.
+        """
+        key = CacheKey(query)
+        now = time.time()
+        with self.lock:
+            counters = self.by_type.setdefault(kind, {"fresh": 0, "stale": 0, "misses": 0, "age": 0.0, "refreshes": 0, "refresh_errors": 0})
+            row = self.db.execute("SELECT results, created, expires, stale_until FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                counters["misses"] += 1
+                return None, False
+            results, created, expires, stale_until = row
+            stale = expires <= now
+            if stale and (not allow_stale or stale_until <= now):
+                if stale_until <= now:
+                    self.delete(key)
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                counters["misses"] += 1
+                return None, False
+            self.db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.counters["stale_hits" if stale else "hits"] += 1
+            counters["stale" if stale else "fresh"] += 1
+            counters["age"] += now - created
+        if self.verbose:
+            print(f"[Cache] Using {'stale' if stale else 'cached'} results for: {query}")
+        return results, stale
+
+    def refreshed(self, kind, ok=True):
+        """Count a background refresh of a `kind` entry"""
+        with self.lock:
+            counters = self.by_type.setdefault(kind, {"fresh": 0, "stale": 0, "misses": 0, "age": 0.0, "refreshes": 0, "refresh_errors": 0})
+            counters["refreshes" if ok else "refresh_errors"] += 1
+
+    def set(self, query, results, ttl=None, created=None, max_stale=SearchCacheMaxStale):
+        key = CacheKey(query)
+        now = time.time()
+        created = now if created is None else created
+        expires = created + (self.ttl if ttl is None else ttl)
+        size = len(results.encode("utf-8"))
+        with self.lock:
+            old = self.db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (key, query, results, size, created, expires, stale_until, accessed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, query, results, size, created, expires, expires + max_stale, now),
+            )
+            self.bytes += size - (old[0] if old else 0)
+            self.counters["writes"] += 1
+            self.evict()
+        if now - self.last_purge > 600:
+            self.purge_expired(now)
+
+    def delete(self, key):
+        """Remove one entry (lock held)"""
+        row = self.db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row:
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.bytes -= row[0]
+
+    def purge_expired(self, now=None):
+        """Drop every entry past its staleness bound; returns how many there were"""
+        now = time.time() if now is None else now
+        with self.lock:
+            freed, count = self.db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries WHERE stale_until <= ?", (now,)).fetchone()
+            self.db.execute("DELETE FROM entries WHERE stale_until <= ?", (now,))
+            self.bytes -= freed
+            self.last_purge = now
+        return count
+
+    def evict(self):
+        """Drop least recently used entries until the byte budget holds (lock held)"""
+        while self.bytes > self.max_bytes:
+            rows = self.db.execute("SELECT key, size FROM entries ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                self.bytes = 0
+                return
+            for key, size in rows:
+                if self.bytes <= self.max_bytes:
+                    return
+                self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.bytes -= size
+                self.counters["evictions"] += 1
+
+    def migrate(self, directory):
+        """Import the old Data/SearchCache/*.json files (keeping their age), then remove them"""
+        if not os.path.isdir(directory):
+            return
+        imported = 0
+        for filename in os.listdir(directory):
+            path = os.path.join(directory, filename)
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("results"):
+                    self.set(data["query"], data["results"], created=data.get("timestamp", time.time()))
+                    imported += 1
+            except Exception as e:
+                print(f"[Cache] Could not migrate {filename}: {e}")
+                continue
+            os.remove(path)
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+        if imported:
+            print(f"[Cache] Migrated {imported} cached searches into {self.path}")
+
+    def stats(self):
+        with self.lock:
+            entries = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+            by_type = {}
+            for kind, counters in self.by_type.items():
+                served = counters["fresh"] + counters["stale"]
+                by_type[kind] = dict(counters, avg_age=counters["age"] / served if served else 0.0,
+                                     stale_rate=counters["stale"] / served if served else 0.0)
+            return dict(self.counters, entries=entries, bytes=self.bytes, by_type=by_type,
+                        hit_rate=(self.counters["hits"] + self.counters["stale_hits"]) / lookups if lookups else 0.0)
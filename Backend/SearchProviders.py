@@ -0,0 +1,234 @@
+from dotenv import dotenv_values
+from Backend.Startup import Lazy, LazyModule
+from Backend.Tracing import RecordSpan
+from Backend.Cancellation import CurrentToken, Cancelled
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor, wait
+import threading
+import time
+
+env_vars = dotenv_values(".env")
+# Providers asked in parallel, in the order their results are merged; more
+# (wikipedia, duckduckgo) are opt-in, each is another service seeing every query
+SearchProviderNames = [name.strip() for name in env_vars.get("SearchProviders", "google").split(",") if name.strip()]
+# Seconds the whole fan-out may take; slower providers are left out of the answer
+SearchDeadline = float(env_vars.get("SearchDeadline", 3.0))
+# Provider calls in flight at once (across concurrent searches)
+SearchWorkers = int(env_vars.get("SearchWorkers", 4))
+# Identifies the assistant to the APIs it calls (Wikipedia's policy asks for this)
+SearchUserAgent = env_vars.get("SearchUserAgent", "LioAI/1.0 (+https://github.com/mahendravelagapudi099-wq/Lio-AI-project)")
+
+# Imported on first use; googlesearch pulls in requests and bs4
+googlesearch = LazyModule("googlesearch")
+requests = LazyModule("requests")
+bs4 = LazyModule("bs4")
+
+
+def CreateSession():
+    session = requests.Session()
+    session.headers.update({"User-Agent": SearchUserAgent})
+    return session
+
+
+# Keep-alive connections of the HTTP providers and page fetches, one
+# requests.Session per thread (a Session is not safe to share between threads)
+local = threading.local()
+
+
+def Session():
+    """This thread's requests.Session"""
+    if getattr(local, "session", None) is None:
+        local.session = CreateSession()
+    return local.session
+
+
+# Providers block on HTTP, so they run on their own threads
+pool = Lazy("search.pool", lambda: ThreadPoolExecutor(max_workers=SearchWorkers, thread_name_prefix="Search"), warm=False)
+
+stats = {}
+stats_lock = threading.Lock()
+
+
+def Count(name, **amounts):
+    with stats_lock:
+        counters = stats.setdefault(name, {"calls": 0, "results": 0, "errors": 0, "timeouts": 0, "duplicates": 0, "seconds": 0.0})
+        for counter, amount in amounts.items():
+            counters[counter] += amount
+
+
+class SearchResult:
+    def __init__(self, title, url, description="", source=""):
+        self.title = title
+        self.url = url
+        self.description = description
+        self.source = source
+
+
+# ---------- providers ----------
+# A provider has a `name` and a blocking `search(query, max_results, timeout)`
+# returning SearchResults. Its HTTP calls time out after `timeout` seconds,
+# so the thread is free again around the deadline.
+
+class GoogleProvider:
+    name = "google"
+
+    def search(self, query, max_results, timeout):
+        results = list(googlesearch.search(query, advanced=True, num_results=max_results, timeout=timeout))
+        return [
+            SearchResult(getattr(r, "title", "No title"), getattr(r, "url", None) or getattr(r, "link", r),
+                         getattr(r, "description", ""), self.name)
+            for r in results
+        ]
+
+
+class WikipediaProvider:
+    name = "wikipedia"
+
+    def search(self, query, max_results, timeout):
+        response = Session().get(
+            "https://en.wikipedia.org/w/api.php",
+            params={"action": "opensearch", "search": query, "limit": max_results, "format": "json"},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        _, titles, descriptions, urls = response.json()
+        return [SearchResult(title, url, description, self.name) for title, description, url in zip(titles, descriptions, urls)]
+
+
+class DuckDuckGoProvider:
+    name = "duckduckgo"
+
+    def search(self, query, max_results, timeout):
+        response = Session().get(
+            "https://html.duckduckgo.com/html/",
+            params={"q": query},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        soup = bs4.BeautifulSoup(response.text, "html.parser")
+        results = []
+        for item in soup.select(".result")[:max_results]:
+            link = item.select_one("a.result__a")
+            snippet = item.select_one(".result__snippet")
+            if link and link.get("href"):
+                results.append(SearchResult(link.get_text(" ", strip=True), link["href"],
+                                            snippet.get_text(" ", strip=True) if snippet else "", self.name))
+        return results
+
+
+class FakeProvider:
+    """
+    Canned results after `latency` seconds (or `error` raised), for tests and
+    offline runs. Gives up after `timeout` seconds like the HTTP providers.
+    """
+
+    def __init__(self, name, results=(), latency=0.0, error=None):
+        self.name = name
+        self.results = list(results)
+        self.latency = latency
+        self.error = error
+
+    def search(self, query, max_results, timeout):
+        time.sleep(min(self.latency, timeout))
+        if self.latency > timeout:
+            raise TimeoutError(f"{self.name} timed out after {timeout:.1f}s")
+        if self.error:
+            raise self.error
+        return [SearchResult(title, url, description, self.name) for title, url, description in self.results[:max_results]]
+
+
+Available = {provider.name: provider for provider in (GoogleProvider(), WikipediaProvider(), DuckDuckGoProvider())}
+providers = [Available[name] for name in SearchProviderNames if name in Available]
+
+
+def SetProviders(new_providers):
+    """Replace the providers used by Search() (e.g. with FakeProviders in tests)"""
+    global providers
+    providers = list(new_providers)
+
+
+# ---------- fan-out ----------
+
+def CanonicalUrl(url):
+    """URL reduced to what identifies the page: no scheme, www., fragment, tracking parameters or trailing slash"""
+    parts = urlsplit(str(url).strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    params = [(key, value) for key, value in parse_qsl(parts.query) if not key.lower().startswith("utm_")]
+    path = parts.path.rstrip("/")
+    return f"{host}{path}" + (f"?{urlencode(params)}" if params else "")
+
+
+def Merge(result_lists, max_results):
+    """
+    Interleave the providers' rankings (first results first) and drop repeated
+    URLs. Results with a snippet come first: a bare title (Wikipedia's
+    opensearch often returns only titles) says little to the LLM.
+    """
+    merged, seen = [], set()
+    for with_snippet in (True, False):
+        for rank in range(max(map(len, result_lists), default=0)):
+            for results in result_lists:
+                if rank >= len(results):
+                    continue
+                result = results[rank]
+                if bool(result.description) != with_snippet:
+                    continue
+                url = CanonicalUrl(result.url)
+                if url in seen:
+                    Count(result.source, duplicates=1)
+                    continue
+                seen.add(url)
+                merged.append(result)
+    return merged[:max_results]
+
+
+def Timed(provider, query, max_results, timeout):
+    results = provider.search(query, max_results, timeout)
+    return results, time.time()
+
+
+def Search(query, max_results=5, deadline=None, search_providers=None):
+    """
+    Ask every provider in parallel and merge what has arrived by `deadline`
+    seconds (SearchDeadline by default). A slow or failing provider only loses
+    its own results. Records one trace span per provider.
+    """
+    token = CurrentToken()
+    search_providers = providers if search_providers is None else search_providers
+    deadline = SearchDeadline if deadline is None else deadline
+    start = time.time()
+    futures = {pool.get().submit(Timed, provider, query, max_results, deadline): provider for provider in search_providers}
+    if not futures:
+        return []
+    pending = set(futures)
+    # Short waits, so a cancelled turn stops waiting at once
+    while pending and time.time() - start < deadline:
+        _, pending = wait(pending, timeout=min(0.1, max(0.0, deadline - (time.time() - start))))
+        if token.cancelled:
+            raise Cancelled(token.reason)
+    now = time.time()
+
+    result_lists = []
+    for future, provider in futures.items():
+        Count(provider.name, calls=1)
+        if future in pending:
+            future.cancel()
+            Count(provider.name, timeouts=1)
+            outcome, end = "timeout", now
+            print(f"[Search] {provider.name} missed the {deadline:.1f}s deadline")
+        elif future.exception():
+            Count(provider.name, errors=1)
+            outcome, end = "error", now
+            print(f"[Search] {provider.name} error: {future.exception()}")
+        else:
+            results, end = future.result()
+            Count(provider.name, results=len(results), seconds=end - start)
+            outcome = "ok"
+            result_lists.append(results)
+        RecordSpan(f"search.provider.{provider.name}", start, end, outcome=outcome)
+    return Merge(result_lists, max_results)
+
+
+def Stats():
+    with stats_lock:
+        return {name: dict(counters) for name, counters in stats.items()}
@@ -0,0 +1,153 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from dotenv import dotenv_values
+from Backend.Model import classifier, decision_cache, PreCheck, LocalIntent, IntentConfidence, DecisionCacheEnabled
+from Backend.IntentClassifier import SplitClauses
+from Backend.Chatbot import ChatBot
+from Backend.RealtimeSearchEngine import GoogleSearch
+from Backend.Routing import QueryModifier, RunStreaming
+from Backend.Streaming import StreamBuffer
+from Backend.PersistentCache import NormalizeQuery
+from Backend.Cancellation import CancelToken, Cancelled, current_token
+from Backend.Tracing import Span
+import contextvars
+import threading
+import time
+
+env_vars = dotenv_values(".env")
+SpeculationEnabled = env_vars.get("Speculation", "True").lower() == "true"
+# Minimum local-classifier confidence for starting a branch before Cohere answers
+SpeculationConfidence = float(env_vars.get("SpeculationConfidence", 0.5))
+# Seconds a finished general branch waits for the decision before giving up
+SpeculationCommitTimeout = float(env_vars.get("SpeculationCommitTimeout", 30))
+
+# Own small pool so speculative work never delays the turn's real tasks
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="Speculation")
+
+stats = {"started": 0, "committed": 0, "wasted": 0, "saved_time": 0.0, "wasted_time": 0.0}
+stats_lock = threading.Lock()
+
+
+class Speculation:
+    """
+    A general or realtime branch started while FirstLayerDMM is still deciding.
+    general: the ChatBot stream runs into a StreamBuffer but only saves its
+    answer once committed. realtime: the Google search runs ahead.
+    Once the decision is known, call commit() if it matches, discard() otherwise.
+    """
+
+    def __init__(self, category, query, parent_token):
+        self.category = category
+        self.query = QueryModifier(query)
+        self.key = NormalizeQuery(query)
+        self.token = CancelToken()
+        self.decided = threading.Event()
+        self.state = "running"
+        self.started = time.time()
+        self.finished = None
+        self.buffer = StreamBuffer() if category == "general" else None
+        parent_token.on_cancel(self.cancel_with_turn)
+        # Same trace context as the turn, but its own cancel token
+        context = contextvars.copy_context()
+        self.future = executor.submit(context.run, self.run)
+
+    def run(self):
+        current_token.set(self.token)
+        try:
+            with Span(f"speculation.{self.category}"):
+                if self.category == "general":
+                    return RunStreaming(partial(ChatBot, BeforeSave=self.wait_for_commit), self.query, self.buffer)
+                return GoogleSearch(self.query)
+        finally:
+            self.finished = time.time()
+
+    def cancel_with_turn(self):
+        self.discard("turn cancelled")
+        self.token.cancel("turn cancelled")
+
+    def wait_for_commit(self):
+        """ChatBot's BeforeSave hook: save only once the speculation is committed"""
+        if not self.decided.wait(SpeculationCommitTimeout):
+            self.discard(f"no decision within {SpeculationCommitTimeout:.0f}s")
+        self.token.check()
+
+    def matches(self, category, payload):
+        return self.state == "running" and category == self.category and NormalizeQuery(payload) == self.key
+
+    def commit(self):
+        """Keep the speculative work; returns how much of a head start it had"""
+        self.state = "committed"
+        self.decided.set()
+        head_start = min(time.time(), self.finished or time.time()) - self.started
+        with stats_lock:
+            stats["committed"] += 1
+            stats["saved_time"] += head_start
+        print(f"[Speculation] Committed {self.category} branch ({head_start:.2f}s head start)")
+        return head_start
+
+    def discard(self, reason="decision did not match"):
+        if self.state != "running":
+            return
+        self.state = "discarded"
+        self.token.cancel(reason)
+        self.decided.set()
+        wasted = (self.finished or time.time()) - self.started
+        with stats_lock:
+            stats["wasted"] += 1
+            stats["wasted_time"] += wasted
+        print(f"[Speculation] Discarded {self.category} branch: {reason}")
+
+    # ---------- committed branches, used as TaskGraph node functions ----------
+
+    def answer(self):
+        """The committed ChatBot answer (its deltas are in self.buffer)"""
+        return self.future.result()
+
+    def search_results(self):
+        """The committed search results, for RealtimeSearchEngine(Search=...)"""
+        try:
+            return self.future.result()
+        except Cancelled:
+            raise
+        except Exception as e:
+            print(f"[Speculation] Speculative search failed, searching again: {e}")
+            return GoogleSearch(self.query)
+
+
+def Predict(query):
+    """
+    Return the category ("general"/"realtime") worth speculating on, or None.
+    Only when Cohere will actually be asked: pre-checked, cached or confident
+    local decisions arrive too fast for speculation to pay off. Compound
+    queries are left alone, their clauses may need other branches.
+    """
+    if not (SpeculationEnabled and LocalIntent):
+        return None
+    if PreCheck(query)[0]:
+        return None
+    if DecisionCacheEnabled and decision_cache.get().peek(NormalizeQuery(query)):
+        return None
+    if len(SplitClauses(query.strip().rstrip(".!"))) > 1:
+        return None
+    decision, confidence = classifier.get().Classify(query)
+    if len(decision) != 1 or not SpeculationConfidence <= confidence < IntentConfidence:
+        return None
+    category = decision[0].split(" ")[0]
+    return category if category in ("general", "realtime") else None
+
+
+def Speculate(query, parent_token):
+    """Start a speculative branch for `query` if one looks likely, else return None"""
+    category = Predict(query)
+    if not category:
+        return None
+    with stats_lock:
+        stats["started"] += 1
+    print(f"[Speculation] Starting {category} branch early")
+    return Speculation(category, query, parent_token)
+
+
+def Stats():
+    with stats_lock:
+        decided = stats["committed"] + stats["wasted"]
+        return dict(stats, commit_rate=stats["committed"] / decided if decided else 0.0)
@@ -1,4 +1,5 @@
 from dotenv import dotenv_values
+from Backend.EventBus import bus, STATUS
 import os
 import mtranslate as mt
 
@@ -48,22 +49,22 @@ HtmlCode = '''<!DOCTYPE html>
 # Inject chosen language
 HtmlCode = HtmlCode.replace("recognition.lang = '';", f"recognition.lang = '{InputLanguage}';")
 
-# Save HTML file
-os.makedirs("Data", exist_ok=True)
 html_file_path = os.path.join("Data", "Voice.html")
-with open(html_file_path, "w", encoding="utf-8") as f:
-    f.write(HtmlCode)
 
-print(f"Open this file in your browser to use speech recognition:\n{html_file_path}")
-
-# Temporary assistant status path
-TempDirPath = os.path.join(os.getcwd(), "Frontend", "Files")
-os.makedirs(TempDirPath, exist_ok=True)
+def WriteVoiceHtml():
+    """Write the speech recognition page the first time it is needed"""
+    if os.path.exists(html_file_path):
+        with open(html_file_path, "r", encoding="utf-8") as f:
+            if f.read() == HtmlCode:
+                return
+    os.makedirs("Data", exist_ok=True)
+    with open(html_file_path, "w", encoding="utf-8") as f:
+        f.write(HtmlCode)
+    print(f"Open this file in your browser to use speech recognition:\n{html_file_path}")
 
 def SetAssistantStatus(Status):
-    """Update assistant status."""
-    with open(os.path.join(TempDirPath, "Status.data"), "w", encoding='utf-8') as file:
-        file.write(Status)
+    """Update assistant status (the GUI listens on the event bus)."""
+    bus.publish(STATUS, Status)
 
 def QueryModifier(Query):
     """Format the text properly with punctuation."""
@@ -81,6 +82,7 @@ def SpeechRecognition():
     Instructions for the user to open the HTML file and get the speech input.
     Supports multiple languages (Hindi, Telugu, etc.) and translates to English if needed.
     """
+    WriteVoiceHtml()
     print("\nOpen the HTML file in your browser to start speech recognition.")
     print(f"File location: {html_file_path}")
     print("After speaking, copy the text from the browser output and paste it here.")
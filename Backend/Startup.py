@@ -0,0 +1,171 @@
+from concurrent.futures import ThreadPoolExecutor
+import importlib
+import threading
+import subprocess
+import time
+import sys
+import os
+
+# Time the process started importing the assistant; Main imports this module first
+ProcessStart = time.time()
+
+marks = []  # (name, seconds since ProcessStart)
+registry = []  # every Lazy/LazyModule, in creation order
+registry_lock = threading.Lock()
+
+
+def Mark(name):
+    """Record a startup milestone such as 'window shown'"""
+    elapsed = time.time() - ProcessStart
+    marks.append((name, elapsed))
+    print(f"[Startup] {name} after {elapsed:.2f}s")
+    return elapsed
+
+
+class Lazy:
+    """
+    A value built on first use, e.g. an API client or the microphone.
+    Thread-safe: concurrent first users wait for the same single build.
+    `warm=True` values are built in the background by WarmUp() once the GUI is up.
+    """
+
+    def __init__(self, name, factory, warm=True):
+        self.name = name
+        self.factory = factory
+        self.warm = warm
+        self.value = None
+        self.loaded = False
+        self.load_time = None
+        self.lock = threading.Lock()
+        with registry_lock:
+            registry.append(self)
+
+    def get(self):
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    start = time.time()
+                    self.value = self.factory()
+                    self.load_time = time.time() - start
+                    self.loaded = True
+        return self.value
+
+
+class LazyModule(Lazy):
+    """
+    Stand-in for a module that is imported on first attribute access,
+    so `pygame = LazyModule("pygame")` keeps `pygame.mixer.init()` call sites unchanged.
+    """
+
+    def __init__(self, module_name, warm=False):
+        super().__init__(module_name, lambda: importlib.import_module(module_name), warm)
+
+    def __getattr__(self, attribute):
+        return getattr(self.get(), attribute)
+
+
+def WarmUp(max_workers=4):
+    """Build every warm=True lazy value in parallel; returns when all are done"""
+    pending = [item for item in list(registry) if item.warm and not item.loaded]
+
+    def build(item):
+        try:
+            item.get()
+        except Exception as e:
+            print(f"[Startup] Could not warm up {item.name}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="WarmUp") as pool:
+        list(pool.map(build, pending))
+    return pending
+
+
+def StartWarmUp(on_done=None):
+    """Run WarmUp() in a background thread, then call `on_done()`"""
+    def run():
+        WarmUp()
+        Mark("backends ready")
+        StartupReport()
+        if on_done:
+            on_done()
+
+    thread = threading.Thread(target=run, daemon=True, name="StartupWarmUp")
+    thread.start()
+    return thread
+
+
+def MemoryUsage():
+    """Resident memory of this process in MB, or None if it cannot be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+def StartupReport(out=None):
+    out = out or sys.stdout
+    if marks:
+        print("\n[Startup] Milestones:", file=out)
+        for name, elapsed in marks:
+            print(f"  {name:<28}{elapsed:>8.2f}s", file=out)
+
+    loaded = [item for item in registry if item.loaded]
+    if loaded:
+        print("[Startup] Lazily built:", file=out)
+        for item in sorted(loaded, key=lambda item: -item.load_time):
+            print(f"  {item.name:<28}{item.load_time:>8.2f}s", file=out)
+    deferred = list(dict.fromkeys(item.name for item in registry if not item.loaded))
+    if deferred:
+        print(f"[Startup] Not loaded yet: {', '.join(deferred)}", file=out)
+
+    memory = MemoryUsage()
+    if memory is not None:
+        print(f"[Startup] Memory: {memory:.1f} MB", file=out)
+
+
+# ==================== IMPORT PROFILE ====================
+
+def ImportProfile(module="Main", top=20, cwd=None):
+    """
+    Import `module` in a fresh interpreter with -X importtime and
+    return [(cumulative_seconds, self_seconds, name)] for the slowest imports.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd or os.getcwd(), capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative_us) / 1e6, int(self_us) / 1e6, name.rstrip()))
+        except ValueError:
+            continue
+    if result.returncode != 0:
+        print(f"[Startup] import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+if __name__ == "__main__":
+    # python -m Backend.Startup [module] [--top N]
+    args = sys.argv[1:]
+    top = 20
+    if "--top" in args:
+        index = args.index("--top")
+        top = int(args[index + 1])
+        del args[index:index + 2]
+    module = args[0] if args else "Main"
+
+    print(f"Slowest imports for 'import {module}':")
+    print(f"{'cumulative':>11}{'self':>9}  module")
+    for cumulative, own, name in ImportProfile(module, top):
+        print(f"{cumulative:>10.3f}s{own:>8.3f}s  {name}")
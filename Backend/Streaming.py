@@ -0,0 +1,131 @@
+import contextvars
+import threading
+import asyncio
+import re
+
+# End of a sentence: terminal punctuation followed by whitespace, or a line break
+SentenceEnd = re.compile(r'(?<=[.!?])["\')\]]*\s+|\n+')
+Abbreviations = ("e.g.", "i.e.", "etc.", "vs.", "mr.", "mrs.", "dr.", "st.", "no.")
+
+
+class SentenceSplitter:
+    """
+    Cut a stream of text deltas into sentences as soon as they are complete.
+    Very short fragments ("1.", "e.g.") are held back and joined to the next one.
+    """
+
+    def __init__(self, min_length=12):
+        self.buffer = ""
+        self.min_length = min_length
+
+    def feed(self, delta):
+        """Add a delta and return the list of newly completed sentences"""
+        self.buffer += delta
+        sentences = []
+        start = 0
+        for match in SentenceEnd.finditer(self.buffer):
+            candidate = self.buffer[start:match.end()].strip()
+            if len(candidate) >= self.min_length and not candidate.lower().endswith(Abbreviations):
+                sentences.append(candidate)
+                start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Return whatever is left once the stream has ended"""
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
+
+
+class StreamBuffer:
+    """
+    Thread-safe buffer of text deltas written by one thread and read by another.
+    Readers see everything written so far, then follow new deltas until close().
+    """
+
+    def __init__(self):
+        self.deltas = []
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def write(self, delta):
+        with self.condition:
+            self.deltas.append(delta)
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: index < len(self.deltas) or self.closed)
+                pending = self.deltas[index:]
+                done = self.closed
+            index += len(pending)
+            yield from pending
+            if done and not pending:
+                return
+
+
+def Consume(stream, OnText=None):
+    """
+    Drain a StreamChatBot-style generator: text deltas go to `OnText`,
+    the final metadata dict is returned.
+    """
+    meta = {}
+    for item in stream:
+        if isinstance(item, dict):
+            meta = item
+        elif OnText:
+            OnText(item)
+    return meta
+
+
+async def AsyncIterate(generator):
+    """
+    Iterate a blocking generator from asyncio. It runs on a worker thread with
+    the caller's context (trace spans and cancel token carry over) and its items
+    are handed to the running loop. Leaving the `async for` early closes the
+    generator after its current item; cancel the turn to stop it sooner.
+    """
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def put(item, error=None):
+        try:
+            loop.call_soon_threadsafe(items.put_nowait, (item, error))
+        except RuntimeError:
+            stop.set()  # The loop has been closed
+
+    def run():
+        try:
+            for item in generator:
+                put(item)
+                if stop.is_set():
+                    break
+        except BaseException as e:
+            put(done, e)
+            return
+        finally:
+            generator.close()
+        put(done)
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), daemon=True, name="AsyncIterate").start()
+    try:
+        while True:
+            item, error = await items.get()
+            if item is done:
+                if error:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from dotenv import dotenv_values
+from Backend.Tracing import Span
+import contextvars
+import threading
+
+# Load environment variables
+env_vars = dotenv_values(".env")
+MaxParallelTasks = int(env_vars.get("MaxParallelTasks", 4))
+
+# Shared pool so concurrency stays bounded across overlapping requests
+executor = ThreadPoolExecutor(max_workers=MaxParallelTasks, thread_name_prefix="TaskGraph")
+
+
+class TaskNode:
+    """A single unit of work in a TaskGraph"""
+
+    def __init__(self, name, func, args, deps):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.deps = list(deps)
+        self.future = Future()
+        # Run in the context of the request that added the node so trace spans line up
+        self.context = contextvars.copy_context()
+
+    def __repr__(self):
+        return f"TaskNode({self.name!r})"
+
+
+class TaskGraph:
+    """
+    Per-request task graph.
+    Nodes whose dependencies are satisfied run in parallel on the shared pool;
+    results are handed back in the order the nodes were added.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool or executor
+        self.nodes = []
+        self.lock = threading.Lock()
+        self.started = False
+
+    def add(self, name, func, *args, deps=()):
+        """Add a task; `deps` are nodes that must finish successfully first"""
+        node = TaskNode(name, func, args, deps)
+        self.nodes.append(node)
+        return node
+
+    def start(self):
+        """Schedule every node; returns immediately"""
+        with self.lock:
+            if self.started:
+                return self
+            self.started = True
+
+        for node in self.nodes:
+            if not node.deps:
+                self._submit(node)
+            else:
+                self._wait_for_deps(node)
+        return self
+
+    def _wait_for_deps(self, node):
+        remaining = [len(node.deps)]
+
+        def on_dep_done(dep_future):
+            with self.lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                failed = [dep for dep in node.deps if dep.future.exception() is not None]
+                if failed:
+                    node.future.set_exception(RuntimeError(f"Dependency '{failed[0].name}' failed"))
+                else:
+                    self._submit(node)
+
+        for dep in node.deps:
+            dep.future.add_done_callback(on_dep_done)
+
+    def _submit(self, node):
+        def run():
+            if not node.future.set_running_or_notify_cancel():
+                return
+            try:
+                with Span(f"task.{node.name}"):
+                    result = node.func(*node.args)
+                node.future.set_result(result)
+            except BaseException as e:
+                node.future.set_exception(e)
+
+        self.pool.submit(node.context.run, run)
+
+    def results(self, before_wait=None):
+        """
+        Yield (node, result, error) in insertion order,
+        each one as soon as it and every earlier node has finished.
+        `before_wait(node)` runs when a node's turn comes, before blocking on it.
+        """
+        self.start()
+        for node in self.nodes:
+            if before_wait:
+                before_wait(node)
+            try:
+                yield node, node.future.result(), None
+            except Exception as e:
+                yield node, None, e
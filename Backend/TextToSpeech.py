@@ -1,11 +1,20 @@
-import pygame
 import random
 import asyncio
-import edge_tts
 import os
+import queue
+import threading
+import time
 from dotenv import dotenv_values
 from langdetect import detect
 import mtranslate as mt
+from Backend.Streaming import SentenceSplitter
+from Backend.Tracing import Span, RecordSpan, ContextRunner
+from Backend.Startup import LazyModule
+from Backend.Cancellation import CurrentToken
+
+# Imported in the background after the window is up (or on first speech)
+pygame = LazyModule("pygame", warm=True)
+edge_tts = LazyModule("edge_tts", warm=True)
 
 # Load environment variables
 env_vars = dotenv_values(".env")
@@ -23,15 +32,23 @@ FallbackLanguage = "en"  # Translate to English if language not supported
 os.makedirs("Data", exist_ok=True)
 SpeechFilePath = r"Data\speech.mp3"
 
-async def TextToAudioFile(text: str, voice: str, retries=3):
+# Only one turn plays audio (and writes speech.mp3) at a time
+PlaybackLock = threading.Lock()
+
+ShortAnswerResponses = [
+    "The rest of the text is available on the chat screen, kindly check it out sir.",
+    "Sir, please look at the chat screen for the remaining information.",
+]
+
+async def TextToAudioFile(text: str, voice: str, retries=3, path=SpeechFilePath):
     """Generate speech audio from text using Edge TTS with retry mechanism."""
-    if os.path.exists(SpeechFilePath):
-        os.remove(SpeechFilePath)
+    if os.path.exists(path):
+        os.remove(path)
 
     for attempt in range(retries):
         try:
             communicate = edge_tts.Communicate(text, voice, pitch='-3Hz', rate='+5%')
-            await communicate.save(SpeechFilePath)
+            await communicate.save(path)
             return True
         except edge_tts.exceptions.NoAudioReceived:
             print(f"[Warning] No audio received. Retrying {attempt+1}/{retries}...")
@@ -49,52 +66,202 @@ def TranslateIfNeeded(text: str) -> str:
         print(f"[Warning] Language detection failed: {e}")
         return text, "en"
 
+def AcquirePlayback(token):
+    """Wait for the audio output unless the turn is cancelled first"""
+    while not PlaybackLock.acquire(timeout=0.05):
+        if token.cancelled:
+            return False
+    return True
+
 def TTS(text: str, func=lambda r=None: True):
-    """Convert text to speech and play using pygame."""
-    while True:
-        try:
-            text_to_speak, lang = TranslateIfNeeded(text)
-            voice = VOICE_MAP.get(lang[:2], DEFAULT_VOICE)
-            print(f"[Info] Speaking in '{lang}' using voice '{voice}'")
-            asyncio.run(TextToAudioFile(text_to_speak, voice))
-
-            # Play audio using pygame
-            pygame.mixer.init()
-            pygame.mixer.music.load(SpeechFilePath)
-            pygame.mixer.music.play()
-            clock = pygame.time.Clock()
-            while pygame.mixer.music.get_busy():
-                if not func():
-                    break
-                clock.tick(10)
+    """Convert text to speech and play using pygame. Stops early if the turn is cancelled."""
+    token = CurrentToken()
+    if not AcquirePlayback(token):
+        return False
+    try:
+        while not token.cancelled:
+            try:
+                text_to_speak, lang = TranslateIfNeeded(text)
+                voice = VOICE_MAP.get(lang[:2], DEFAULT_VOICE)
+                print(f"[Info] Speaking in '{lang}' using voice '{voice}'")
+                with Span("tts.synthesize", chars=len(text_to_speak)):
+                    asyncio.run(TextToAudioFile(text_to_speak, voice))
+                if token.cancelled:
+                    return False
 
-            return True
+                # Play audio using pygame
+                with Span("tts.playback"):
+                    pygame.mixer.init()
+                    pygame.mixer.music.load(SpeechFilePath)
+                    pygame.mixer.music.play()
+                    while pygame.mixer.music.get_busy():
+                        if not func() or token.cancelled:
+                            break
+                        token.wait(0.1)
 
-        except Exception as e:
-            print(f"[Error] TTS failed: {e}")
+                return True
 
-        finally:
-            try:
-                func(False)
-                pygame.mixer.music.stop()
-                pygame.mixer.quit()
-            except:
-                pass
+            except Exception as e:
+                print(f"[Error] TTS failed: {e}")
+
+            finally:
+                try:
+                    func(False)
+                    pygame.mixer.music.stop()
+                    pygame.mixer.quit()
+                except:
+                    pass
+        return False
+    finally:
+        PlaybackLock.release()
 
 def TextToSpeech(text: str, func=lambda r=None: True):
     """Decide whether to speak full text or a shortened version."""
     sentences = str(text).split(".")
-    responses = [
-        "The rest of the text is available on the chat screen, kindly check it out sir.",
-        "Sir, please look at the chat screen for the remaining information.",
-    ]
 
     if len(sentences) > 4 and len(text) >= 250:
-        short_text = " ".join(sentences[:2]) + "." + random.choice(responses)
+        short_text = " ".join(sentences[:2]) + "." + random.choice(ShortAnswerResponses)
         TTS(short_text, func)
     else:
         TTS(text, func)
 
+class SpeechStream:
+    """
+    Speak an answer while it is still being generated.
+    Text deltas are cut into sentences; one thread synthesizes each sentence
+    while another plays the previous one, so speech starts after the first
+    sentence instead of after the whole answer.
+    Long answers are shortened the same way as TextToSpeech().
+    Synthesis and playback stop as soon as the current turn is cancelled.
+    """
+
+    def __init__(self, started_at=None, func=lambda r=None: True):
+        self.splitter = SentenceSplitter()
+        self.func = func
+        self.token = CurrentToken()
+        self.started_at = started_at or time.time()
+        self.first_audio_at = None
+        self.sentences = []
+        self.held = []
+        self.spoken_chars = 0
+        self.shortened = False
+        self.synth_queue = queue.Queue()
+        self.play_queue = queue.Queue()
+        self.synth_thread = threading.Thread(target=ContextRunner(self._synthesize), daemon=True)
+        self.play_thread = threading.Thread(target=ContextRunner(self._play), daemon=True)
+        self.synth_thread.start()
+        self.play_thread.start()
+
+    def feed(self, delta):
+        """Add a text delta from the LLM stream"""
+        if self.token.cancelled:
+            return
+        for sentence in self.splitter.feed(delta):
+            self._add_sentence(sentence)
+
+    def close(self, wait=True):
+        """Flush the last sentence and optionally wait until playback ends"""
+        for sentence in self.splitter.flush():
+            self._add_sentence(sentence)
+        if not self.shortened:
+            # Answer turned out short enough, speak the sentences held back
+            for sentence in self.held:
+                self.synth_queue.put(sentence)
+        self.held = []
+        self.synth_queue.put(None)
+        if wait:
+            self.wait()
+
+    def wait(self):
+        """Block until every queued sentence has been played"""
+        self.play_thread.join()
+        return self.first_audio_at
+
+    def _add_sentence(self, sentence):
+        self.sentences.append(sentence)
+        self.spoken_chars += len(sentence)
+        if self.shortened:
+            return
+        if len(self.sentences) <= 2:
+            self.synth_queue.put(sentence)
+        elif len(self.sentences) > 4 and self.spoken_chars >= 250:
+            # Same rule as TextToSpeech(): first two sentences plus a pointer to the screen
+            self.shortened = True
+            self.held = []
+            self.synth_queue.put(random.choice(ShortAnswerResponses))
+        else:
+            self.held.append(sentence)
+
+    def _synthesize(self):
+        loop = asyncio.new_event_loop()
+        index = 0
+        try:
+            while True:
+                sentence = self.synth_queue.get()
+                if sentence is None or self.token.cancelled:
+                    break
+                text_to_speak, lang = TranslateIfNeeded(sentence)
+                voice = VOICE_MAP.get(lang[:2], DEFAULT_VOICE)
+                index += 1
+                path = os.path.join("Data", f"speech_stream_{id(self)}_{index}.mp3")
+                try:
+                    with Span("tts.stream.synthesize", chars=len(text_to_speak)):
+                        synthesized = loop.run_until_complete(TextToAudioFile(text_to_speak, voice, path=path))
+                    if synthesized:
+                        self.play_queue.put(path)
+                except Exception as e:
+                    print(f"[Error] Streaming TTS failed: {e}")
+        finally:
+            loop.close()
+            self.play_queue.put(None)
+
+    def _play(self):
+        holding = False
+        try:
+            while True:
+                path = self.play_queue.get()
+                if path is None:
+                    break
+                try:
+                    # After a cancel, keep draining so the files are removed
+                    if self.token.cancelled:
+                        continue
+                    if not holding:
+                        if not AcquirePlayback(self.token):
+                            continue
+                        holding = True
+                        pygame.mixer.init()
+                    pygame.mixer.music.load(path)
+                    pygame.mixer.music.play()
+                    if self.first_audio_at is None:
+                        self.first_audio_at = time.time()
+                        print(f"[Info] Time to first audio: {self.first_audio_at - self.started_at:.2f}s")
+                        RecordSpan("tts.first_audio", self.started_at, self.first_audio_at)
+                    with Span("tts.stream.playback"):
+                        while pygame.mixer.music.get_busy():
+                            if not self.func() or self.token.cancelled:
+                                pygame.mixer.music.stop()
+                                break
+                            self.token.wait(0.1)
+                    pygame.mixer.music.unload()
+                finally:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        except Exception as e:
+            print(f"[Error] Streaming playback failed: {e}")
+        finally:
+            try:
+                self.func(False)
+                if holding:
+                    pygame.mixer.music.stop()
+                    pygame.mixer.quit()
+            except:
+                pass
+            if holding:
+                PlaybackLock.release()
+
 if __name__ == "__main__":
     print("Jarvis TTS running. Enter your text (Ctrl+C to exit).")
     while True:
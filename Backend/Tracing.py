@@ -0,0 +1,304 @@
+from dotenv import dotenv_values
+import contextvars
+import functools
+import asyncio
+import threading
+import atexit
+import json
+import math
+import time
+import uuid
+import os
+import sys
+
+# Load environment variables
+env_vars = dotenv_values(".env")
+# Off by default: turn it on to profile the pipeline (python -m Backend.Tracing prints the report)
+TracingEnabled = env_vars.get("Tracing", "False").lower() == "true"
+# Spans kept in memory before they are appended to the file, and the longest they wait
+TraceBufferSize = int(env_vars.get("TraceBufferSize", 256))
+TraceFlushInterval = float(env_vars.get("TraceFlushInterval", 5.0))
+# Once the file grows past this, it is moved to Traces.jsonl.1 (replacing the older one)
+TraceMaxBytes = int(env_vars.get("TraceMaxBytes", 10 * 1024 * 1024))
+
+TracePath = os.path.join("Data", "Traces.jsonl")
+
+# Current request ID and parent span, carried across function calls (and into
+# worker threads when the context is copied)
+current_request = contextvars.ContextVar("current_request", default=None)
+current_span = contextvars.ContextVar("current_span", default=None)
+
+write_lock = threading.Lock()
+buffer = []  # encoded spans not yet written
+last_flush = time.time()
+
+
+def NewRequestId():
+    return uuid.uuid4().hex[:12]
+
+
+def WriteSpan(record):
+    """Queue one finished span; the buffer is written once it is full or TraceFlushInterval has passed"""
+    if not TracingEnabled:
+        return
+    with write_lock:
+        buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+        due = len(buffer) >= TraceBufferSize or time.time() - last_flush >= TraceFlushInterval
+    if due:
+        FlushSpans()
+
+
+def FlushSpans(path=None):
+    """Append the buffered spans to the trace file, rotating it once it exceeds TraceMaxBytes"""
+    global buffer, last_flush
+    path = path or TracePath
+    with write_lock:
+        lines, buffer = buffer, []
+        last_flush = time.time()
+        if not lines:
+            return
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > TraceMaxBytes:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+        except Exception as e:
+            print(f"[Tracing] Error writing {len(lines)} spans: {e}")
+
+
+atexit.register(FlushSpans)
+
+
+class Span:
+    """
+    Record the wall time of one pipeline stage.
+    Use as a context manager:
+
+        with Span("groq", model="llama-3.3-70b-versatile"):
+            ...
+
+    Spans opened inside another span become its children. A span opened with
+    no request active starts a new request (trace) of its own.
+    """
+
+    def __init__(self, name, request_id=None, **attributes):
+        self.name = name
+        self.request_id = request_id
+        self.attributes = attributes
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = None
+        self.start = None
+        self.tokens = []
+
+    def __enter__(self):
+        if self.request_id:
+            self.tokens.append(current_request.set(self.request_id))
+        elif current_request.get() is None:
+            self.request_id = NewRequestId()
+            self.tokens.append(current_request.set(self.request_id))
+        else:
+            self.request_id = current_request.get()
+
+        self.parent_id = current_span.get()
+        self.tokens.append(current_span.set(self.span_id))
+        self.start = time.time()
+        return self
+
+    def set(self, **attributes):
+        """Attach extra attributes, e.g. token counts known only at the end"""
+        self.attributes.update(attributes)
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.time()
+        for token in reversed(self.tokens):
+            token.var.reset(token)
+        record = {
+            "request_id": self.request_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "end": end,
+            "duration": end - self.start,
+            "thread": threading.current_thread().name,
+        }
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        if self.attributes:
+            record["attributes"] = self.attributes
+        WriteSpan(record)
+        return False
+
+
+def Traced(name):
+    """Decorator form of Span; works for plain and async functions"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with Span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def RecordSpan(name, start, end, request_id=None, **attributes):
+    """Write a span whose start and end were measured elsewhere"""
+    record = {
+        "request_id": request_id or current_request.get() or NewRequestId(),
+        "span_id": uuid.uuid4().hex[:8],
+        "parent_id": current_span.get(),
+        "name": name,
+        "start": start,
+        "end": end,
+        "duration": end - start,
+        "thread": threading.current_thread().name,
+    }
+    if attributes:
+        record["attributes"] = attributes
+    WriteSpan(record)
+
+
+def ContextRunner(func):
+    """Wrap `func` so it runs inside a copy of the caller's trace context (for threads)"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+    return run
+
+
+def RunInRequest(request_id, func, *args, **kwargs):
+    """Run `func` with `request_id` as the current request (e.g. as a thread target)"""
+    token = current_request.set(request_id)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        current_request.reset(token)
+
+
+# ==================== REPORT ====================
+
+def LoadSpans(path=None):
+    FlushSpans()
+    spans = []
+    try:
+        with open(path or TracePath, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        pass  # Partially written line
+    except FileNotFoundError:
+        pass
+    return spans
+
+
+def Percentile(values, pct):
+    if not values:
+        return 0.0
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def StageStats(spans):
+    """Return {stage: {"count", "p50", "p95", "p99", "max"}} in seconds"""
+    durations = {}
+    for span in spans:
+        durations.setdefault(span["name"], []).append(span["duration"])
+    return {
+        name: {
+            "count": len(values),
+            "p50": Percentile(values, 50),
+            "p95": Percentile(values, 95),
+            "p99": Percentile(values, 99),
+            "max": max(values),
+        }
+        for name, values in durations.items()
+    }
+
+
+def CriticalPath(spans):
+    """
+    Return the leaf spans, in time order, that determined a turn's total time.
+    Within each span, start from the child that finished last and walk back
+    through the latest child that had finished before it started; each child
+    on that chain is expanded the same way.
+    """
+    children = {}
+    ids = {span["span_id"] for span in spans}
+    roots = []
+    for span in spans:
+        if span["parent_id"] in ids:
+            children.setdefault(span["parent_id"], []).append(span)
+        else:
+            roots.append(span)
+    if not roots:
+        return []
+
+    def expand(span):
+        candidates = children.get(span["span_id"])
+        if not candidates:
+            return [span]
+        chain = [max(candidates, key=lambda child: child["end"])]
+        while True:
+            earlier = [child for child in candidates if child["end"] <= chain[-1]["start"] + 0.001 and child is not chain[-1]]
+            if not earlier:
+                break
+            chain.append(max(earlier, key=lambda child: child["end"]))
+        path = []
+        for child in reversed(chain):
+            path.extend(expand(child))
+        return path
+
+    return expand(max(roots, key=lambda span: span["duration"]))
+
+
+def Report(path=None, turns=10, out=None):
+    out = out or sys.stdout
+    spans = LoadSpans(path)
+    if not spans:
+        print("No traces recorded yet.", file=out)
+        return
+
+    print(f"{'Stage':<28}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}", file=out)
+    print("-" * 71, file=out)
+    stats = StageStats(spans)
+    for name, row in sorted(stats.items(), key=lambda item: -item[1]["p50"]):
+        print(f"{name:<28}{row['count']:>7}{row['p50']:>9.3f}{row['p95']:>9.3f}{row['p99']:>9.3f}{row['max']:>9.3f}", file=out)
+
+    requests = {}
+    for span in spans:
+        requests.setdefault(span["request_id"], []).append(span)
+    recent = sorted(requests.values(), key=lambda group: min(span["start"] for span in group))[-turns:]
+
+    print(f"\nCritical path of the last {len(recent)} turn(s):", file=out)
+    for group in recent:
+        path_spans = CriticalPath(group)
+        if not path_spans:
+            continue
+        total = max(span["end"] for span in group) - min(span["start"] for span in group)
+        chain = " -> ".join(f"{span['name']} ({span['duration']:.2f}s)" for span in path_spans)
+        print(f"  {group[0]['request_id']}  {total:.2f}s  {chain}", file=out)
+
+
+if __name__ == "__main__":
+    # python -m Backend.Tracing [report] [trace file] [--turns N]
+    args = [arg for arg in sys.argv[1:] if arg != "report"]
+    turns = 10
+    if "--turns" in args:
+        index = args.index("--turns")
+        turns = int(args[index + 1])
+        del args[index:index + 2]
+    Report(args[0] if args else None, turns=turns)
@@ -0,0 +1,266 @@
+"""
+Micro-benchmark of Backend/KeywordRules.py: time the keyword heuristics
+(FallbackDMM, QueryModifier, DetectQueryType, NeedsAIGeneration,
+check_quick_response) against their original
+any(word in text ...) versions on a generated query corpus, and check that
+both give the same answers. Routing.FallbackDecision keeps its plain scans:
+its short tables usually hit on the first keyword, which beat a rule lookup.
+
+    python Benchmark/KeywordBenchmark.py [--size 20000] [--unique 2000] [--seed 0]
+
+--unique sets how many distinct queries the corpus repeats (real users repeat
+themselves); the shared automaton caches the rule hits of recent queries.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BenchmarkDir = os.path.dirname(os.path.abspath(__file__))
+ProjectRoot = os.path.dirname(BenchmarkDir)
+sys.path.insert(0, ProjectRoot)
+
+from Benchmark import Stubs  # noqa: E402
+
+Templates = [
+    "open {app}", "close {app}", "open {app} and {question}", "play {song}", "play {song} on youtube",
+    "search {topic} on youtube", "google search {topic}", "generate image of {thing}",
+    "write a {document} on notepad", "save the file as {thing}", "create a {document} about {topic}",
+    "{question}", "{question} and remind me to {task} at 5pm", "mute", "volume up", "what's the weather in {city}",
+    "latest news about {topic}", "{topic} vs {topic}", "how to {task}", "thank you", "how are you today",
+    "what's your name", "bye", "what is today's date", "top 10 {topic}", "should i learn {topic}",
+]
+Fillers = {
+    "app": ["chrome", "notepad", "spotify", "whatsapp", "telegram", "vs code", "calculator", "firefox"],
+    "song": ["despacito", "let her go", "afsanay by ys", "shape of you", "believer"],
+    "topic": ["python", "machine learning", "cricket", "bitcoin", "the stock market", "black holes", "java"],
+    "thing": ["a lion", "a sunset", "mountains at night", "report", "notes"],
+    "document": ["letter", "poem", "leave application", "story", "email", "joke"],
+    "question": ["who was akbar", "tell me about mahatma gandhi", "what is python", "who is elon musk",
+                 "how does gravity work", "explain recursion", "what time is it"],
+    "city": ["delhi", "mumbai", "london", "new york"],
+    "task": ["call mom", "bake bread", "fix a flat tire", "study effectively"],
+}
+
+
+def RandomQuery(rng):
+    template = rng.choice(Templates)
+    while "{" in template:
+        start = template.index("{")
+        name = template[start + 1:template.index("}")]
+        template = template[:start] + rng.choice(Fillers[name]) + template[template.index("}") + 1:]
+    return template
+
+
+def BuildCorpus(size, unique, seed):
+    rng = random.Random(seed)
+    with open(os.path.join(BenchmarkDir, "Corpus.json"), "r", encoding="utf-8") as f:
+        distinct = dict.fromkeys(entry["query"] for entry in json.load(f))
+    for _ in range(unique * 50):
+        if len(distinct) >= unique:
+            break
+        # Vary case and punctuation the way speech recognition does
+        query = RandomQuery(rng)
+        distinct[rng.choice([query, query.capitalize(), query + "?", query + "."])] = None
+    distinct = list(distinct)
+    return [rng.choice(distinct) for _ in range(size)]
+
+
+# ==================== ORIGINAL IMPLEMENTATIONS ====================
+# Kept verbatim (minus prints) as the reference for speed and answers
+
+def LegacyFallbackDMM(prompt):
+    prompt_lower = prompt.lower().strip()
+    if "save" in prompt_lower:
+        return [f"content {prompt}"]
+    if any(word in prompt_lower for word in ["write", "type", "create text", "create file"]):
+        return [f"content {prompt}"]
+    if any(word in prompt_lower for word in ["open", "launch", "start"]):
+        app_name = prompt_lower
+        for word in ["open", "launch", "start"]:
+            app_name = app_name.replace(word, "")
+        return [f"open {app_name.strip()}"]
+    if any(word in prompt_lower for word in ["close", "exit app", "quit"]):
+        app_name = prompt_lower
+        for word in ["close", "exit", "quit"]:
+            app_name = app_name.replace(word, "")
+        app_name = app_name.strip()
+        if app_name:
+            return [f"close {app_name}"]
+    if "play" in prompt_lower:
+        return [f"play {prompt_lower.replace('play', '').strip()}"]
+    if "search" in prompt_lower:
+        if "youtube" in prompt_lower:
+            return [f"youtube search {prompt_lower.replace('youtube', '').replace('search', '').strip()}"]
+        elif "google" in prompt_lower:
+            return [f"google search {prompt_lower.replace('google', '').replace('search', '').strip()}"]
+        else:
+            return [f"google search {prompt_lower.replace('search', '').strip()}"]
+    if any(word in prompt_lower for word in ["generate image", "create image", "make image"]):
+        image_prompt = prompt_lower
+        for word in ["generate image", "create image", "make image", "generate", "create", "make"]:
+            image_prompt = image_prompt.replace(word, "")
+        return [f"generate image {image_prompt.strip()}"]
+    if any(word in prompt_lower for word in ["remind", "reminder", "set reminder"]):
+        return [f"reminder {prompt}"]
+    if any(word in prompt_lower for word in ["volume", "mute", "unmute", "brightness"]):
+        return [f"system {prompt}"]
+    if any(word in prompt_lower for word in ["news", "weather", "temperature", "current", "latest", "today's"]):
+        return [f"realtime {prompt}"]
+    if any(word in prompt_lower for word in ["exit", "quit", "bye", "goodbye", "stop assistant"]):
+        return ["exit"]
+    return [f"general {prompt}"]
+
+
+def LegacyQueryModifier(Query):
+    new_query = Query.lower().strip()
+    query_words = new_query.split()
+    question_words = ['how','what','who','where','when','why','which','whom','can you',"what's", "where's","how's"]
+    if any(word + " " in new_query for word in question_words):
+        if query_words[-1][-1] in ['.','?','!']:
+            new_query = new_query[:-1] + "?"
+        else:
+            new_query += "?"
+    else:
+        if query_words[-1][-1] in ['.','?','!']:
+            new_query = new_query[:-1] + '.'
+        else:
+            new_query += '.'
+    return new_query.capitalize()
+
+
+def LegacyDetectQueryType(query):
+    query_lower = query.lower()
+    if any(word in query_lower for word in ["vs", "versus", "compare", "difference between", "better than"]):
+        return "comparison"
+    if any(word in query_lower for word in ["news", "latest", "recent", "today", "yesterday", "breaking"]):
+        return "news"
+    if any(word in query_lower for word in ["weather", "temperature", "forecast", "rain", "sunny", "climate"]):
+        return "weather"
+    if any(word in query_lower for word in ["time", "date", "day", "when is", "what day"]):
+        return "datetime"
+    if any(word in query_lower for word in ["what is", "who is", "where is", "define", "meaning", "explain"]):
+        return "factual"
+    if any(word in query_lower for word in ["how to", "tutorial", "guide", "steps", "instructions"]):
+        return "howto"
+    if any(word in query_lower for word in ["list of", "top 10", "best", "recommended", "suggestions"]):
+        return "list"
+    if any(word in query_lower for word in ["calculate", "solve", "math", "equation", "convert"]):
+        return "calculation"
+    if any(word in query_lower for word in ["review", "opinion", "should i", "is it worth", "recommend"]):
+        return "opinion"
+    return "general"
+
+
+def LegacyNeedsAIGeneration(query_lower):
+    ai_keywords = [
+        "letter", "application", "email", "essay", "story", "poem",
+        "article", "report", "speech", "script", "code", "program",
+        "proposal", "resume", "cv", "bio", "description", "review",
+        "summary", "analysis", "explanation", "tutorial", "guide",
+        "apology", "thank", "invitation", "announcement", "notice"
+    ]
+    for keyword in ai_keywords:
+        if keyword in query_lower:
+            return True
+    if "write" in query_lower or "create" in query_lower or "generate" in query_lower:
+        words_after = query_lower.split("write")[-1].strip() if "write" in query_lower else ""
+        if not words_after:
+            words_after = query_lower.split("create")[-1].strip() if "create" in query_lower else ""
+        if not words_after:
+            words_after = query_lower.split("generate")[-1].strip()
+        if len(words_after.split()) > 3:
+            return True
+    return False
+
+
+def LegacyQuickResponseKey(query):
+    from Backend.Hotword import QUICK_RESPONSES
+    query_lower = query.lower().strip()
+    for key in QUICK_RESPONSES:
+        if key in query_lower:
+            return key
+    return None
+
+
+# ==================== BENCHMARK ====================
+
+def Pairs():
+    """(name, original, current) for every converted heuristic"""
+    from Backend.Model import FallbackDMM
+    from Backend.Routing import QueryModifier
+    from Backend.RealtimeSearchEngine import DetectQueryType
+    from Backend.ContentModule import NeedsAIGeneration
+    from Backend.Hotword import QuickResponseRules
+    from Backend.KeywordRules import FirstRule
+
+    def QuickResponseKey(query):
+        rule = FirstRule(query, QuickResponseRules)
+        return rule[len("quick."):] if rule else None
+
+    return [
+        ("FallbackDMM", LegacyFallbackDMM, FallbackDMM),
+        ("QueryModifier", LegacyQueryModifier, QueryModifier),
+        ("DetectQueryType", LegacyDetectQueryType, DetectQueryType),
+        ("NeedsAIGeneration", lambda q: LegacyNeedsAIGeneration(q.lower()), lambda q: NeedsAIGeneration(q.lower())),
+        ("check_quick_response", LegacyQuickResponseKey, QuickResponseKey),
+    ]
+
+
+def Time(func, corpus):
+    start = time.perf_counter()
+    for query in corpus:
+        func(query)
+    return time.perf_counter() - start
+
+
+def Main():
+    parser = argparse.ArgumentParser(description="Compare KeywordRules against the original keyword scans")
+    parser.add_argument("--size", type=int, default=20000, help="Queries in the corpus")
+    parser.add_argument("--unique", type=int, default=2000, help="Distinct queries in the corpus")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    Stubs.Install()
+    os.chdir(tempfile.mkdtemp(prefix="lio-keywords-"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        pairs = Pairs()
+    from Backend.KeywordRules import Hits, Rules, KeywordMatcher
+
+    corpus = BuildCorpus(args.size, args.unique, args.seed)
+    print(f"{len(corpus)} queries ({len(set(corpus))} distinct), {len(Rules)} rules, "
+          f"{sum(len(keywords) for keywords in Rules.values())} keywords\n")
+    print(f"{'':<22}{'original':>11}{'rules':>11}{'speed-up':>10}  answers")
+    print("-" * 64)
+
+    total_original = total_current = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = []
+        for name, original, current in pairs:
+            mismatches = sum(original(query) != current(query) for query in set(corpus))
+            Hits.cache_clear()
+            original_time, current_time = Time(original, corpus), Time(current, corpus)
+            total_original += original_time
+            total_current += current_time
+            rows.append((name, original_time, current_time, mismatches))
+    for name, original_time, current_time, mismatches in rows:
+        answers = "same" if not mismatches else f"{mismatches} differ"
+        print(f"{name:<22}{original_time * 1000:>9.1f}ms{current_time * 1000:>9.1f}ms{original_time / current_time:>9.1f}x  {answers}")
+    print("-" * 64)
+    print(f"{'all heuristics':<22}{total_original * 1000:>9.1f}ms{total_current * 1000:>9.1f}ms{total_original / total_current:>9.1f}x")
+
+    # The automaton alone, without the per-query cache
+    matcher = KeywordMatcher(Rules)
+    lowered = [query.lower() for query in corpus]
+    scan_time = Time(matcher.match, lowered)
+    print(f"\nOne uncached scan for all {len(Rules)} rules: {scan_time / len(corpus) * 1e6:.1f} us per query")
+    print(f"Per-query cache: {Hits.cache_info()}")
+
+
+if __name__ == "__main__":
+    Main()
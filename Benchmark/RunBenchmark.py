@@ -0,0 +1,276 @@
+"""
+Offline benchmark: replay a corpus of recorded queries through MainExecution
+with every external service replaced by the stand-ins in Benchmark/Stubs.py,
+then report end-to-end and per-stage latency (p50/p95/p99) from the trace spans.
+
+    python Benchmark/RunBenchmark.py [--repeat 3] [--failure-rate 0.05]
+        [--set llm_ttft=0.5] [--env StreamingAnswers=False]
+        [--save results.json] [--baseline old_results.json] [--verbose]
+
+Runs in a throwaway working directory, so Data/ and Frontend/Files/ of the
+checkout are never touched.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BenchmarkDir = os.path.dirname(os.path.abspath(__file__))
+ProjectRoot = os.path.dirname(BenchmarkDir)
+sys.path.insert(0, ProjectRoot)
+
+from Benchmark import Stubs  # noqa: E402
+
+
+def LoadCorpus(path):
+    with open(path, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    for entry in corpus:
+        Stubs.Decisions[entry["query"].lower().strip()] = entry["decision"]
+    return corpus
+
+
+def Category(entry):
+    """Label a corpus entry by the kinds of task its decision contains"""
+    kinds = []
+    for cmd in entry["decision"].split(","):
+        cmd = cmd.strip().lower()
+        kind = "image" if cmd.startswith("generate image") else cmd.split(" ")[0]
+        if kind not in ("general", "realtime", "image"):
+            kind = "automation"
+        if kind not in kinds:
+            kinds.append(kind)
+    return "+".join(kinds)
+
+
+def ParseAssignments(pairs):
+    values = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        values[key.strip()] = value.strip()
+    return values
+
+
+def Summary(values):
+    from Backend.Tracing import Percentile
+    return {
+        "count": len(values),
+        "p50": Percentile(values, 50),
+        "p95": Percentile(values, 95),
+        "p99": Percentile(values, 99),
+        "mean": sum(values) / len(values) if values else 0.0,
+    }
+
+
+def RunCorpus(corpus, repeat, verbose, image_timeout):
+    """Import the assistant against the stand-ins and run every query `repeat` times"""
+    workdir = tempfile.mkdtemp(prefix="lio-bench-")
+    os.chdir(workdir)
+    print(f"[Benchmark] Working directory: {workdir}")
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    timings = []
+
+    with output:
+        import Main
+        from Backend.EventBus import bus, IMAGE
+        Main.StartImageJobs(show_images=False)
+
+        # Image jobs finish after MainExecution returns; count them to wait at the end
+        images = {"submitted": 0, "finished": 0}
+        images_done = threading.Condition()
+
+        def on_image(topic, event):
+            with images_done:
+                if event["state"] == "queued":
+                    images["submitted"] += 1
+                elif event["state"] in ("done", "failed"):
+                    images["finished"] += 1
+                    images_done.notify_all()
+
+        bus.subscribe(IMAGE, on_image)
+
+        for round_number in range(repeat):
+            for entry in corpus:
+                start = time.time()
+                Main.MainExecution(query=entry["query"])
+                timings.append((Category(entry), time.time() - start))
+
+        with images_done:
+            images_done.wait_for(lambda: images["finished"] >= images["submitted"], timeout=image_timeout)
+
+    return workdir, timings
+
+
+def BuildResults(timings):
+    from Backend.Tracing import LoadSpans, StageStats
+    from Backend.IntentClassifier import Stats as IntentStats
+    from Backend.Model import decision_cache, prompt_compiler
+    from Backend.Speculation import Stats as SpeculationStats
+    from Backend.LLMClient import Stats as LLMStats
+    from Backend.AnswerCache import Stats as AnswerCacheStats
+    from Backend.LLMRouter import Stats as RouterStats
+    from Backend.RealtimeSearchEngine import search_cache
+    from Backend.SearchProviders import Stats as SearchProviderStats
+    from Backend.PassageRanker import Stats as PassageStats
+
+    def DecisionCacheStats():
+        return decision_cache.get().stats() if decision_cache.loaded else {}
+    spans = LoadSpans()
+
+    by_category = {}
+    for category, seconds in timings:
+        by_category.setdefault(category, []).append(seconds)
+
+    return {
+        "config": dict(Stubs.Config),
+        "end_to_end": Summary([seconds for _, seconds in timings]),
+        "by_category": {category: Summary(values) for category, values in sorted(by_category.items())},
+        "stages": StageStats(spans),
+        "calls": dict(Stubs.calls),
+        "intent": IntentStats(),
+        "decision_cache": DecisionCacheStats(),
+        "speculation": SpeculationStats(),
+        "dmm_prompt": prompt_compiler.get().stats() if prompt_compiler.loaded else {},
+        "llm": LLMStats(),
+        "answer_cache": AnswerCacheStats(),
+        "router": RouterStats(),
+        "search_cache": search_cache.get().stats() if search_cache.loaded else {},
+        "search_providers": SearchProviderStats(),
+        "passages": PassageStats(),
+    }
+
+
+def PrintTable(title, rows, baseline=None):
+    print(f"\n{title}")
+    print(f"{'':<28}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}" + ("   p50 vs baseline" if baseline else ""))
+    print("-" * (62 + (18 if baseline else 0)))
+    for name, row in rows:
+        line = f"{name:<28}{row['count']:>7}{row['p50']:>9.3f}{row['p95']:>9.3f}{row['p99']:>9.3f}"
+        if baseline and name in baseline and baseline[name]["p50"]:
+            change = (row["p50"] - baseline[name]["p50"]) / baseline[name]["p50"] * 100
+            line += f"{change:>+17.1f}%"
+        print(line)
+
+
+def PrintResults(results, baseline=None):
+    base = baseline or {}
+    PrintTable("End-to-end (MainExecution wall time, seconds)",
+               [("all queries", results["end_to_end"])] + list(results["by_category"].items()),
+               baseline and dict([("all queries", base.get("end_to_end", {}))] + list(base.get("by_category", {}).items())))
+    PrintTable("Per stage (trace spans, seconds)",
+               sorted(results["stages"].items(), key=lambda item: -item[1]["p50"]),
+               baseline and base.get("stages"))
+
+    print("\nStand-in calls:")
+    for service, count in sorted(results["calls"].items()):
+        print(f"  {service:<26}{count:>7}")
+
+    intent = results.get("intent")
+    if intent:
+        print(f"\nIntent decisions: {intent['local']} local ({intent['hit_rate']:.0%}, avg {intent['local_avg_ms']:.1f} ms), "
+              f"{intent['remote']} Cohere (avg {intent['remote_avg_ms']:.1f} ms)")
+    cache = results.get("decision_cache")
+    if cache:
+        print(f"Decision cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.0%}), "
+              f"{cache['size']} entries, {cache['evictions']} evictions")
+    prompt = results.get("dmm_prompt")
+    if prompt and prompt["calls"]:
+        print(f"DMM prompt: {prompt['avg_tokens']:.0f} tokens per call on average "
+              f"(full preamble and history: {prompt['avg_full_tokens']:.0f})")
+    speculation = results.get("speculation")
+    if speculation and speculation["started"]:
+        print(f"Speculation: {speculation['started']} started, {speculation['committed']} committed "
+              f"({speculation['saved_time']:.2f}s saved), {speculation['wasted']} wasted ({speculation['wasted_time']:.2f}s of work)")
+    router = results.get("router")
+    if router and router["requests"]:
+        print(f"LLM router: {router['requests']} requests, {router['hedged']} hedged ({router['hedge_wins']} won by the hedge), "
+              f"{router['failovers']} failovers, {router['failed']} failed on every provider")
+    searches = results.get("search_cache")
+    if searches and searches["hits"] + searches["misses"]:
+        print(f"Search cache: {searches['hits']} hits, {searches.get('stale_hits', 0)} stale hits, {searches['misses']} misses ({searches['hit_rate']:.0%}), "
+              f"{searches['entries']} entries, {searches['bytes'] / 1024:.1f} KB, {searches['evictions']} evictions")
+        for kind, counters in sorted(searches.get("by_type", {}).items()):
+            print(f"  {kind:<12} {counters['fresh']} fresh, {counters['stale']} stale ({counters['stale_rate']:.0%}), "
+                  f"{counters['misses']} misses, avg age {counters['avg_age']:.0f}s, "
+                  f"{counters['refreshes']} refreshed, {counters['refresh_errors']} refresh errors")
+    for provider, counters in sorted(results.get("search_providers", {}).items()):
+        print(f"Search provider ({provider}): {counters['calls']} calls, {counters['results']} results, "
+              f"{counters['duplicates']} duplicates, {counters['timeouts']} timeouts, {counters['errors']} errors")
+    passages = results.get("passages")
+    if passages and passages["runs"]:
+        print(f"Page passages: {passages['fetched']} pages fetched, {passages['cached']} from cache, "
+              f"{passages['errors'] + passages['timeouts']} failed or late, {passages['selected']} of {passages['passages']} passages "
+              f"kept ({passages['tokens'] / passages['runs']:.0f} tokens per search)")
+    answers = results.get("answer_cache")
+    if answers and answers["hits"] + answers["misses"]:
+        print(f"Answer cache: {answers['hits']} hits, {answers['misses']} misses ({answers['hit_rate']:.0%}), "
+              f"{answers['skipped_context'] + answers['skipped_time']} not cacheable, {answers['saved_time']:.2f}s saved")
+    for provider, counters in sorted(results.get("llm", {}).items()):
+        if counters["requests"]:
+            print(f"LLM client ({provider}): {counters['requests']} requests, {counters['retries']} retries, "
+                  f"{counters['errors']} errors, {counters['waited']} waited for a free slot")
+
+
+def Main():
+    parser = argparse.ArgumentParser(description="Replay a query corpus through MainExecution offline")
+    parser.add_argument("--corpus", default=os.path.join(BenchmarkDir, "Corpus.json"))
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the corpus")
+    parser.add_argument("--failure-rate", type=float, help="Probability that any stand-in call fails")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--set", action="append", metavar="KEY=SECONDS", help="Override a stand-in setting from Stubs.Config")
+    parser.add_argument("--env", action="append", metavar="KEY=VALUE", help="Extra .env setting seen by the assistant")
+    parser.add_argument("--image-timeout", type=float, default=60, help="Seconds to wait for queued image jobs")
+    parser.add_argument("--save", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Earlier --save output to compare against")
+    parser.add_argument("--turns", type=int, default=0, help="Also print the critical path of the last N turns")
+    parser.add_argument("--verbose", action="store_true", help="Show the assistant's own output")
+    args = parser.parse_args()
+
+    for key, value in ParseAssignments(args.set).items():
+        if key not in Stubs.Config:
+            parser.error(f"Unknown stand-in setting '{key}'; choose from {', '.join(Stubs.Config)}")
+        Stubs.Config[key] = type(Stubs.Config[key])(float(value))
+    if args.failure_rate is not None:
+        Stubs.Config["failure_rate"] = args.failure_rate
+    # The per-stage table is built from the trace spans
+    Stubs.EnvValues["Tracing"] = "True"
+    Stubs.EnvValues.update(ParseAssignments(args.env))
+    Stubs.rng.seed(args.seed)
+    Stubs.Install()
+
+    corpus = LoadCorpus(os.path.abspath(args.corpus))
+    baseline = None
+    if args.baseline:
+        with open(os.path.abspath(args.baseline), "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    save_path = os.path.abspath(args.save) if args.save else None
+
+    workdir, timings = RunCorpus(corpus, args.repeat, args.verbose, args.image_timeout)
+    results = BuildResults(timings)
+    PrintResults(results, baseline)
+
+    if args.turns:
+        from Backend.Tracing import Report
+        print()
+        Report(turns=args.turns)
+
+    if save_path:
+        with open(save_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"\n[Benchmark] Results saved to {save_path}")
+    print(f"[Benchmark] Traces kept in {os.path.join(workdir, 'Data', 'Traces.jsonl')}")
+
+    # Worker threads (image worker, task pool) are not daemonic everywhere
+    from Backend.ChatLog import FlushChatLogs
+    FlushChatLogs()
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    Main()
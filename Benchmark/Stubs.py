@@ -0,0 +1,497 @@
+"""
+Local stand-ins for every external service and desktop library the assistant
+touches, so MainExecution can be replayed offline on a plain Linux box.
+
+Install() must run before any Backend/Frontend module is imported. Each
+service stand-in sleeps for a configurable latency and fails with a
+configurable probability; calls are counted in `calls`.
+"""
+import asyncio
+import base64
+import random
+import sys
+import time
+import types
+from html.parser import HTMLParser
+import json
+from collections import Counter
+
+# Latency in seconds and failure probability per service; edited by the runner
+Config = {
+    "dmm_latency": 0.45,          # Cohere FirstLayerDMM round trip
+    "dmm_input_token_latency": 0.0001,  # Cohere per prompt token (preamble, history, message)
+    "llm_ttft": 0.35,             # Groq time to first token
+    "llm_token_latency": 0.008,   # Groq per streamed token
+    "cohere_ttft": 0.5,           # Cohere time to first token for chat answers (hedged requests)
+    "llm_sentences": 4,           # Sentences in a generated answer
+    "search_latency": 0.6,        # googlesearch
+    "wikipedia_latency": 0.3,     # Wikipedia opensearch API
+    "page_latency": 0.3,          # Fetching one result page
+    "tts_latency": 0.25,          # edge-tts synthesis per call
+    "playback_per_char": 0.0,     # Simulated audio length per character
+    "image_latency": 1.5,         # HuggingFace inference per image
+    "automation_latency": 0.05,   # AppOpener / pywhatkit actions
+    "failure_rate": 0.0,          # Probability that any service call fails
+}
+
+# Decision the Cohere stand-in returns for a query; anything else is "general <query>"
+Decisions = {}
+
+calls = Counter()
+rng = random.Random(0)
+
+
+class StubServiceError(Exception):
+    pass
+
+
+def Call(service, latency_key):
+    """Count a call, sleep its latency and maybe raise an injected failure"""
+    calls[service] += 1
+    time.sleep(Config[latency_key])
+    if rng.random() < Config["failure_rate"]:
+        calls[f"{service}.failed"] += 1
+        raise StubServiceError(f"Injected {service} failure")
+
+
+async def AsyncCall(service, latency_key):
+    calls[service] += 1
+    await asyncio.sleep(Config[latency_key])
+    if rng.random() < Config["failure_rate"]:
+        calls[f"{service}.failed"] += 1
+        raise StubServiceError(f"Injected {service} failure")
+
+
+def FakeAnswer(messages):
+    """Build a deterministic multi-sentence answer for the last user message"""
+    question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "your question")
+    sentences = [f"This is a simulated answer about {question.strip(' ?.')}."]
+    for i in range(1, Config["llm_sentences"]):
+        sentences.append(f"Sentence number {i + 1} adds a little more simulated detail to it.")
+    return " ".join(sentences)
+
+
+def Module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+# ==================== GROQ ====================
+
+class GroqChunk:
+    def __init__(self, content):
+        delta = types.SimpleNamespace(content=content)
+        self.choices = [types.SimpleNamespace(delta=delta)]
+
+
+class GroqCompletions:
+    def create(self, model=None, messages=None, stream=False, **kwargs):
+        Call("groq", "llm_ttft")
+        words = FakeAnswer(messages or []).split(" ")
+
+        def chunks():
+            for i, word in enumerate(words):
+                if i:
+                    time.sleep(Config["llm_token_latency"])
+                yield GroqChunk(word + (" " if i < len(words) - 1 else ""))
+            yield GroqChunk(None)
+        return chunks()
+
+
+class Groq:
+    def __init__(self, api_key=None, **kwargs):
+        self.chat = types.SimpleNamespace(completions=GroqCompletions())
+
+
+class AsyncGroqStream:
+    def __init__(self, words):
+        self.words = words
+        self.closed = False
+
+    async def __aiter__(self):
+        for i, word in enumerate(self.words):
+            if self.closed:
+                return
+            if i:
+                await asyncio.sleep(Config["llm_token_latency"])
+            yield GroqChunk(word + (" " if i < len(self.words) - 1 else ""))
+        yield GroqChunk(None)
+
+    async def close(self):
+        self.closed = True
+
+
+class AsyncGroqCompletions:
+    async def create(self, model=None, messages=None, stream=False, **kwargs):
+        await AsyncCall("groq", "llm_ttft")
+        return AsyncGroqStream(FakeAnswer(messages or []).split(" "))
+
+
+class AsyncGroq:
+    def __init__(self, api_key=None, **kwargs):
+        self.chat = types.SimpleNamespace(completions=AsyncGroqCompletions())
+
+
+# ==================== COHERE ====================
+
+class CohereResponse:
+    def __init__(self, text):
+        self.text = text
+
+    def __iter__(self):
+        yield ("text", self.text)
+
+
+class CohereClient:
+    def __init__(self, api_key=None, **kwargs):
+        pass
+
+    def chat(self, message="", **kwargs):
+        Call("cohere", "dmm_latency")
+        prompt = " ".join([kwargs.get("preamble") or "", message] + [turn["message"] for turn in kwargs.get("chat_history") or []])
+        time.sleep(len(prompt.split()) * Config["dmm_input_token_latency"])
+        if "preamble" in kwargs:
+            return CohereResponse(Decisions.get(message.lower().strip(), f"general {message}"))
+        return CohereResponse(FakeAnswer([{"role": "user", "content": message}]))
+
+
+class CohereAsyncClient:
+    def __init__(self, api_key=None, **kwargs):
+        pass
+
+    async def chat_stream(self, message="", model=None, **kwargs):
+        if model != "command-xlarge-nightly":
+            # A chat answer (hedge or failover for Groq), streamed word by word
+            await AsyncCall("cohere", "cohere_ttft")
+            words = FakeAnswer([{"role": "user", "content": message}]).split(" ")
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(Config["llm_token_latency"])
+                yield types.SimpleNamespace(event_type="text-generation", text=word + (" " if i < len(words) - 1 else ""))
+            return
+        await AsyncCall("cohere", "dmm_latency")
+        prompt = " ".join([kwargs.get("preamble") or "", message] + [turn["message"] for turn in kwargs.get("chat_history") or []])
+        await asyncio.sleep(len(prompt.split()) * Config["dmm_input_token_latency"])
+        if "preamble" in kwargs:
+            text = Decisions.get(message.lower().strip(), f"general {message}")
+        else:
+            text = FakeAnswer([{"role": "user", "content": message}])
+        yield types.SimpleNamespace(event_type="text-generation", text=text)
+
+
+# ==================== GOOGLESEARCH ====================
+
+def search(query, advanced=False, num_results=5, **kwargs):
+    Call("googlesearch", "search_latency")
+    results = [
+        types.SimpleNamespace(
+            title=f"Result {i} for {query}",
+            url=f"https://example.com/{i}/{query.replace(' ', '-')}",
+            description=f"Simulated description {i} of {query}, with a few facts and figures from 2024.",
+        )
+        for i in range(1, num_results + 1)
+    ]
+    return results if advanced else [r.url for r in results]
+
+
+# ==================== EDGE-TTS ====================
+
+class NoAudioReceived(Exception):
+    pass
+
+
+class Communicate:
+    def __init__(self, text, voice=None, pitch=None, rate=None, **kwargs):
+        self.text = text
+
+    async def save(self, path):
+        await AsyncCall("edge_tts", "tts_latency")
+        with open(path, "wb") as f:
+            f.write(b"\0" * max(1, len(self.text)))
+
+
+# ==================== HUGGINGFACE (requests) ====================
+
+class RequestException(Exception):
+    pass
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200, content_type="application/json"):
+        self.content = content
+        self.text = content.decode("utf-8", "ignore")
+        self.status_code = status_code
+        self.headers = {"Content-Type": content_type}
+        self.encoding = "utf-8"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RequestException(f"HTTP {self.status_code}")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class Session:
+    def __init__(self):
+        self.headers = {}
+
+    def get(self, url, params=None, **kwargs):
+        try:
+            if "wikipedia.org/w/api.php" in url:
+                Call("wikipedia", "wikipedia_latency")
+                return FakeResponse(WikipediaPayload((params or {}).get("search", ""), int((params or {}).get("limit", 5))))
+            Call("pages", "page_latency")
+            return FakeResponse(PagePayload(url), content_type="text/html; charset=utf-8")
+        except StubServiceError as e:
+            raise RequestException(str(e))
+
+    def post(self, url, json=None, **kwargs):
+        try:
+            Call("huggingface", "image_latency")
+        except StubServiceError as e:
+            raise RequestException(str(e))
+        return FakeResponse(ImagePayload())
+
+    def close(self):
+        pass
+
+
+def WikipediaPayload(query, limit):
+    """Opensearch answer: [query, titles, descriptions, urls]"""
+    titles = [f"{query.title()} ({i})" for i in range(1, min(limit, 3) + 1)]
+    urls = [f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}" for title in titles]
+    return json.dumps([query, titles, [f"Encyclopedia entry about {title}." for title in titles], urls]).encode()
+
+
+def PagePayload(url):
+    """A result page: navigation, a few paragraphs on the topic named in the URL, filler and a footer"""
+    topic = url.rstrip("/").rsplit("/", 1)[-1].replace("-", " ").replace("_", " ")
+    paragraphs = [
+        f"{topic.title()} is described here in some detail, with the history of {topic} and why it matters in 2024.",
+        f"Experts say {topic} changed a lot over the last decade; the main facts about {topic} are summarised below.",
+        "This paragraph is about something else entirely and only fills the page with unrelated words and numbers.",
+        "Subscribe to our newsletter for weekly updates, offers and more articles like this one from our editors.",
+        f"A short list of figures: {topic} reached 3.2 million users, grew 14 percent and is covered by many sources.",
+    ]
+    body = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    return (f"<html><head><script>var tracking = 1;</script></head><body><nav>Home | About | Contact</nav>"
+            f"<article><h1>{topic.title()}</h1>{body}</article><footer>Copyright 2024</footer></body></html>").encode()
+
+
+# ==================== BS4 ====================
+# Just enough of BeautifulSoup for page text extraction
+
+VoidTags = {"br", "img", "meta", "link", "input", "hr", "source", "wbr"}
+
+
+class Tag:
+    def __init__(self, name, attrs=(), parent=None):
+        self.name = name
+        self.attrs = dict(attrs)
+        self.parent = parent
+        self.children = []
+
+    def __call__(self, names):
+        return self.find_all(names)
+
+    def __getattr__(self, name):
+        return self.find(name)
+
+    def __getitem__(self, attribute):
+        return self.attrs[attribute]
+
+    def get(self, attribute, default=None):
+        return self.attrs.get(attribute, default)
+
+    def descendants(self):
+        for child in self.children:
+            if isinstance(child, Tag):
+                yield child
+                yield from child.descendants()
+
+    def find_all(self, names):
+        names = {names} if isinstance(names, str) else set(names)
+        return [tag for tag in self.descendants() if tag.name in names]
+
+    def find(self, name):
+        return next(iter(self.find_all(name)), None)
+
+    def decompose(self):
+        if self.parent:
+            self.parent.children.remove(self)
+
+    def get_text(self, separator="", strip=False):
+        parts = []
+        for child in self.children:
+            text = child.get_text(separator, strip) if isinstance(child, Tag) else (child.strip() if strip else child)
+            if text:
+                parts.append(text)
+        return separator.join(parts)
+
+
+class TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.root = self.current = Tag("[document]")
+
+    def handle_starttag(self, name, attrs):
+        tag = Tag(name, attrs, self.current)
+        self.current.children.append(tag)
+        if name not in VoidTags:
+            self.current = tag
+
+    def handle_endtag(self, name):
+        tag = self.current
+        while tag is not self.root and tag.name != name:
+            tag = tag.parent
+        if tag is not self.root:
+            self.current = tag.parent
+
+    def handle_data(self, data):
+        self.current.children.append(data)
+
+
+def BeautifulSoup(markup, features=None):
+    builder = TreeBuilder()
+    builder.feed(markup)
+    builder.close()
+    return builder.root
+
+
+def ImagePayload():
+    image = base64.b64encode(b"\xff\xd8\xff\xe0 simulated jpeg").decode()
+    return json.dumps({"images": [image]}).encode()
+
+
+# ==================== PYGAME ====================
+
+class Music:
+    def __init__(self):
+        self.busy_until = 0.0
+        self.length = 0.0
+
+    def load(self, path):
+        try:
+            with open(path, "rb") as f:
+                self.length = len(f.read()) * Config["playback_per_char"]
+        except OSError:
+            self.length = 0.0
+
+    def play(self):
+        calls["playback"] += 1
+        self.busy_until = time.time() + self.length
+
+    def get_busy(self):
+        return time.time() < self.busy_until
+
+    def stop(self):
+        self.busy_until = 0.0
+
+    def unload(self):
+        pass
+
+
+class Clock:
+    def tick(self, fps=0):
+        time.sleep(1 / fps if fps else 0)
+
+
+# ==================== DESKTOP LIBRARIES ====================
+
+def QtModule(name):
+    """Module whose every attribute is a do-nothing Qt-like class"""
+    module = Module(name)
+
+    class QtObject:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def __getattr__(self, attribute):
+            return QtObject()
+
+        def __call__(self, *args, **kwargs):
+            return QtObject()
+
+    def getattr_(attribute):
+        return type(attribute, (QtObject,), {})
+
+    module.__getattr__ = getattr_
+    return module
+
+
+def Install():
+    """Register every stand-in in sys.modules"""
+    Module("dotenv",
+           dotenv_values=lambda path=None: dict(EnvValues),
+           get_key=lambda path, key: EnvValues.get(key))
+    Module("groq", Groq=Groq, AsyncGroq=AsyncGroq)
+    Module("cohere", Client=CohereClient, AsyncClient=CohereAsyncClient)
+    Module("googlesearch", search=search)
+    Module("edge_tts", Communicate=Communicate,
+           exceptions=types.SimpleNamespace(NoAudioReceived=NoAudioReceived))
+    Module("bs4", BeautifulSoup=BeautifulSoup)
+    Module("requests", Session=Session, RequestException=RequestException,
+           exceptions=types.SimpleNamespace(RequestException=RequestException),
+           get=lambda *a, **k: Session().get(*a, **k),
+           post=lambda *a, **k: Session().post(*a, **k))
+
+    Module("pygame", mixer=types.SimpleNamespace(init=lambda *a, **k: None, quit=lambda: None, music=Music()),
+           time=types.SimpleNamespace(Clock=Clock))
+    Module("langdetect", detect=lambda text: "en")
+    Module("mtranslate", translate=lambda text, to="en", source="auto": text)
+    Module("speech_recognition", Recognizer=type("Recognizer", (), {}), Microphone=type("Microphone", (), {}),
+           UnknownValueError=type("UnknownValueError", (Exception,), {}),
+           RequestError=type("RequestError", (Exception,), {}))
+
+    def automation_action(name):
+        def action(*args, **kwargs):
+            Call(name, "automation_latency")
+            return True
+        return action
+
+    Module("AppOpener", open=automation_action("appopener"), close=automation_action("appopener"))
+    Module("pywhatkit", search=automation_action("pywhatkit"), playonyt=automation_action("pywhatkit"))
+    Module("pyautogui", write=automation_action("pyautogui"), press=automation_action("pyautogui"),
+           hotkey=automation_action("pyautogui"))
+
+    try:
+        import rich  # noqa: F401
+    except ImportError:
+        Module("rich", print=print)
+
+    pil = Module("PIL")
+    pil.Image = Module("PIL.Image", open=lambda path: (_ for _ in ()).throw(IOError(path)))
+
+    try:
+        import PyQt5.QtWidgets  # noqa: F401  Real Qt is harmless without a QApplication
+    except ImportError:
+        qt = Module("PyQt5")
+        for name in ("QtWidgets", "QtGui", "QtCore"):
+            setattr(qt, name, QtModule(f"PyQt5.{name}"))
+        sys.modules["PyQt5.QtCore"].pyqtSignal = lambda *types_: types.SimpleNamespace(
+            emit=lambda *a: None, connect=lambda *a: None)
+
+
+# Settings the backends read from .env
+EnvValues = {
+    "Username": "Bench",
+    "Assistantname": "Lio",
+    "GroqAPIKey": "stub",
+    "CohereAPIKey": "stub",
+    "HuggingFaceAPIKey": "stub",
+    "InputLanguage": "en",
+    "AssistantVoice": "en-US-GuyNeural",
+}
@@ -1,7 +1,9 @@
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTextEdit, QStackedWidget, QWidget, QLineEdit, QGridLayout, QVBoxLayout, QHBoxLayout, QPushButton, QFrame, QLabel, QSizePolicy)
-from PyQt5.QtGui import QIcon, QPainter, QMovie, QColor, QTextCharFormat, QFont, QPixmap, QTextBlockFormat
-from PyQt5.QtCore import Qt, QSize, QTimer
+from PyQt5.QtGui import QIcon, QPainter, QMovie, QColor, QTextCharFormat, QFont, QPixmap, QTextBlockFormat, QTextCursor
+from PyQt5.QtCore import Qt, QSize, QObject, QTimer, pyqtSignal
 from dotenv import dotenv_values
+from Backend.EventBus import bus, FileMirror, STATUS, RESPONSE, PARTIAL, MIC
+from Backend.Routing import QueryModifier  # Shared with the server; re-exported for Main
 import sys
 import os
 
@@ -21,49 +23,22 @@ def AnswerModifier(Answer):
     return modified_answer
 
 
-def QueryModifier(Query):
-    new_query = Query.lower().strip()
-    query_words  = new_query.split()
-    question_words = ['how','what','who','where','when','why','which','whom','can you',"what's", "where's","how's"]
-
-    if any(word + " " in new_query for word in question_words):
-        if query_words[-1][-1] in ['.','?','!']:
-            new_query = new_query[:-1] + "?"
-        else:
-            new_query += "?"
-    else:
-        if query_words[-1][-1] in ['.','?','!']:
-            new_query = new_query[:-1] + '.'
-        else:
-            new_query += '.'
-
-    return new_query.capitalize()
-
-
 def SetMicrophoneStatus(Command):
-    with open(TempDirectoryPath('Mic.data'), 'w', encoding='utf-8') as file:
-        file.write(Command)
+    bus.publish(MIC, Command)
     
 
 def GetMicrophoneStatus():
-    
-    with open(TempDirectoryPath('Mic.data'), 'r', encoding='utf-8') as file:
-        Status = file.read().strip()
-    return Status
+    return str(bus.get(MIC, "False")).strip()
 
 
 def SetAsssistantStatus(Status):
-    with open(rf'{TempDirPath}\Status.data','w',encoding='utf-8') as file:
-        file.write(Status)
+    bus.publish(STATUS, Status)
 
 
 def GetAssistantStatus():
-    with open(rf'{TempDirPath}\Status.data', 'r', encoding='utf-8') as file:
-        Status = file.read()
-    return Status
+    return bus.get(STATUS, "")
     
 
-    
 # Define placeholders for the missing functions
 def MicButtonInitiated():
     SetMicrophoneStatus("False")
@@ -81,8 +56,43 @@ def TempDirectoryPath(Filename):
     return path
 
 def ShowTextToScreen(Text):
-    with open (rf'{TempDirPath}\Responses.data','w', encoding='utf-8') as file:
-        file.write(Text)
+    bus.publish(RESPONSE, Text)
+
+def ShowPartialTextToScreen(Text):
+    """Show an answer that is still streaming; replaced by the next ShowTextToScreen"""
+    bus.publish(PARTIAL, Text)
+
+
+# Mirror status, response and mic events into Frontend/Files/*.data for external tools
+if env_vars.get("MirrorStatusFiles", "False").lower() == "true":
+    FileMirror(bus, {
+        STATUS: TempDirectoryPath('Status.data'),
+        RESPONSE: TempDirectoryPath('Responses.data'),
+        MIC: TempDirectoryPath('Mic.data'),
+    }).start()
+
+
+class BusSignals(QObject):
+    """Re-emit bus events as Qt signals so widgets update on the GUI thread"""
+    statusChanged = pyqtSignal(str)
+    responseChanged = pyqtSignal(str)
+    partialChanged = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        bus.subscribe(STATUS, lambda topic, value: self.statusChanged.emit(str(value)))
+        bus.subscribe(RESPONSE, lambda topic, value: self.responseChanged.emit(str(value)))
+        bus.subscribe(PARTIAL, lambda topic, value: self.partialChanged.emit(str(value)))
+
+
+bus_signals = None
+
+def GetBusSignals():
+    """Create the signal bridge lazily, after the QApplication exists"""
+    global bus_signals
+    if bus_signals is None:
+        bus_signals = BusSignals()
+    return bus_signals
 
     
 class ChatSection(QWidget):
@@ -128,10 +138,13 @@ class ChatSection(QWidget):
         font.setPointSize(13)
         self.chat_text_edit.setFont(font)
 
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.loadMessages)
-        self.timer.timeout.connect(self.SpeechRecogText)
-        self.timer.start(5)
+        self.stream_start = None
+        signals = GetBusSignals()
+        signals.responseChanged.connect(self.loadMessages)
+        signals.partialChanged.connect(self.showPartialMessage)
+        signals.statusChanged.connect(self.SpeechRecogText)
+        self.loadMessages(bus.get(RESPONSE, ""))
+        self.SpeechRecogText(bus.get(STATUS, ""))
 
         self.chat_text_edit.viewport().installEventFilter(self)
         self.setStyleSheet("""
@@ -173,24 +186,38 @@ class ChatSection(QWidget):
 
         """)
 
-    def loadMessages(self):
+    def loadMessages(self, messages):
         global old_chat_message
-        try:
-            with open(rf'{TempDirPath}\Responses.data', 'r', encoding='utf-8') as file:
-                messages = file.read()
-            if messages and messages != old_chat_message:
-                self.addMessage(message=messages, color='White')
-                old_chat_message = messages
-        except FileNotFoundError:
-            pass
-
-    def SpeechRecogText(self):
-        try:
-            with open(rf'{TempDirPath}\Status.data', 'r', encoding='utf-8') as file:
-                messages = file.read()
-            self.label.setText(messages)
-        except FileNotFoundError:
-            pass
+        self.clearPartialMessage()
+        if messages and messages != old_chat_message:
+            self.addMessage(message=messages, color='White')
+            old_chat_message = messages
+
+    def showPartialMessage(self, message):
+        cursor = self.chat_text_edit.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        if self.stream_start is None:
+            self.stream_start = cursor.position()
+        else:
+            # Replace the previously shown partial text
+            cursor.setPosition(self.stream_start, QTextCursor.KeepAnchor)
+        format = QTextCharFormat()
+        format.setForeground(QColor('White'))
+        cursor.setCharFormat(format)
+        cursor.insertText(message + "\n")
+        self.chat_text_edit.setTextCursor(cursor)
+
+    def clearPartialMessage(self):
+        if self.stream_start is None:
+            return
+        cursor = self.chat_text_edit.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.setPosition(self.stream_start, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        self.stream_start = None
+
+    def SpeechRecogText(self, messages):
+        self.label.setText(messages)
 
     def load_icon(self, path, width=60, height=60):
         pixmap = QPixmap(path)
@@ -260,14 +287,11 @@ class InitialScreen(QWidget):
         self.setFixedHeight(screen_height)
         self.setFixedWidth(screen_width)
         self.setStyleSheet("background-color: black;")
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.SpeechRecogText)
-        self.timer.start(5)
+        GetBusSignals().statusChanged.connect(self.SpeechRecogText)
+        self.SpeechRecogText(bus.get(STATUS, ""))
 
-    def SpeechRecogText(self):
-        with open(TempDirPath + r'\Status.data', 'r', encoding='utf-8') as file:  # Fixed this line
-            messages = file.read()
-            self.label.setText(messages)
+    def SpeechRecogText(self, messages):
+        self.label.setText(messages)
 
     def load_icon(self, path, width=60, height=60):
         pixmap = QPixmap(path)
@@ -406,10 +430,13 @@ class MainWindow(QMainWindow):
         self.setMenuWidget(top_bar)
         self.setCentralWidget(stacked_widget)
 
-def GraphicalUserInterface():
+def GraphicalUserInterface(on_shown=None):
+    """Run the GUI; `on_shown()` is called once the event loop has shown the window"""
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    if on_shown:
+        QTimer.singleShot(0, on_shown)
     sys.exit(app.exec_())
 # Run the application
 if __name__ == "__main__":
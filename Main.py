@@ -1,7 +1,9 @@
+from Backend.Startup import Mark, StartWarmUp
 from Frontend.GUI import (
     GraphicalUserInterface,
     SetAsssistantStatus,
     ShowTextToScreen,
+    ShowPartialTextToScreen,
     TempDirectoryPath,
     SetMicrophoneStatus,
     AnswerModifier,
@@ -11,57 +13,47 @@ from Frontend.GUI import (
 )
 from Backend.Model import FirstLayerDMM
 from Backend.RealtimeSearchEngine import RealtimeSearchEngine
-from Backend.Automation import Automation
 from Backend.SpeechToText import SpeechRecognition
 from Backend.Chatbot import ChatBot
-from Backend.TextToSpeech import TextToSpeech
+from Backend.TextToSpeech import TextToSpeech, SpeechStream
 from Backend.Hotword import StartHotwordThread
-from Backend.ContentModule import Content  # ✅ ADDED
+from Backend.EventBus import bus, MIC, IMAGE
+from Backend.ImageGeneration import StartImageWorker
+from Backend.Routing import FallbackDecision, CategorizeDecision, RunAutomation, RunStreaming, StartImageGeneration
+from Backend.TaskGraph import TaskGraph
+from Backend.Streaming import StreamBuffer
+from Backend.Tracing import Span, Traced, FlushSpans
+from Backend.Cancellation import Cancellable, CurrentToken, Cancelled, IsStopCommand
+from Backend.Speculation import Speculate
+from Backend.ChatLog import ReadChatLog, FlushChatLogs, Store as ChatLogStore
+from functools import partial
 from dotenv import dotenv_values
-from asyncio import run
 from time import sleep
-import subprocess
 import threading
-import json
+import time
 import os
 
 # Load environment variables
 env_vars = dotenv_values(".env")
 Username = env_vars.get("Username", "User")
 Assistantname = env_vars.get("Assistantname", "Assistant")
+StreamingAnswers = env_vars.get("StreamingAnswers", "True").lower() == "true"
 
 DefaultMessage = f""" {Username}: Hello {Assistantname}, How are you?
 {Assistantname}: Welcome {Username}. I am doing well. How may I help you? """
 
 functions = ["open", "close", "play", "system", "content", "google search", "youtube search"]
-subprocess_list = []
 
-# Ensure a default chat log exists if no chats are logged
+# Show a default greeting if no chats are logged
 def ShowDefaultChatIfNoChats():
-    try:
-        with open(r'Data\ChatLog.json', "r", encoding='utf-8') as file:
-            if len(file.read()) < 5:
-                with open(TempDirectoryPath('Database.data'), 'w', encoding='utf-8') as temp_file:
-                    temp_file.write("")
-                with open(TempDirectoryPath('Responses.data'), 'w', encoding='utf-8') as response_file:
-                    response_file.write(DefaultMessage)
-    except FileNotFoundError:
-        print("ChatLog.json file not found. Creating default response.")
-        os.makedirs("Data", exist_ok=True)
-        with open(r'Data\ChatLog.json', "w", encoding='utf-8') as file:
-            file.write("[]")
-        with open(TempDirectoryPath('Responses.data'), 'w', encoding='utf-8') as response_file:
-            response_file.write(DefaultMessage)
-
-# Read chat log from JSON
+    if not len(ChatLogStore()):
+        with open(TempDirectoryPath('Database.data'), 'w', encoding='utf-8') as temp_file:
+            temp_file.write("")
+        ShowTextToScreen(DefaultMessage)
+
+# Read the chat log (migrated from the old ChatLog.json on first use)
 def ReadChatLogJson():
-    try:
-        with open(r'Data\ChatLog.json', 'r', encoding='utf-8') as file:
-            chatlog_data = json.load(file)
-        return chatlog_data
-    except FileNotFoundError:
-        print("ChatLog.json not found.")
-        return []
+    return ReadChatLog()
 
 # Integrate chat logs into a readable format
 def ChatLogIntegration():
@@ -86,8 +78,7 @@ def ShowChatOnGUI():
         with open(TempDirectoryPath('Database.data'), 'r', encoding='utf-8') as file:
             data = file.read()
         if len(str(data)) > 0:
-            with open(TempDirectoryPath('Responses.data'), 'w', encoding='utf-8') as response_file:
-                response_file.write(data)
+            ShowTextToScreen(data)
     except FileNotFoundError:
         print("Database.data file not found.")
 
@@ -95,161 +86,163 @@ def ShowChatOnGUI():
 def InitialExecution():
     SetMicrophoneStatus("False")
     ShowTextToScreen("")
+
+# Show the logged conversation (or the greeting); reads the whole chat log, so it runs off the startup path
+def LoadChatHistory():
     ShowDefaultChatIfNoChats()
     ChatLogIntegration()
     ShowChatOnGUI()
 
+@Traced("turn")
+@Cancellable
 def MainExecution(query=None):
     """
     Execute the recognized command(s).
     If `query` is None, use SpeechRecognition to get the query.
+    Every call is a new turn: whatever the previous turn is still doing
+    (LLM stream, search, speech, automation) is cancelled.
     """
+    token = CurrentToken()
+    speculation = None
     try:
         TaskExecution = False
         ImageExecution = False
         ImageGenerationQuery = ""
+        started_at = time.time()
 
         SetAsssistantStatus("Listening...")
 
         if query:
             Query = query
         else:
-            Query = SpeechRecognition()
+            with Span("stt"):
+                Query = SpeechRecognition()
+            # A hotword command took over while this turn waited for input: run the query as a turn of its own
+            if token.cancelled and Query:
+                return MainExecution(Query)
 
         ShowTextToScreen(f"{Username}: {Query}")
+
+        # "stop" only interrupts; starting this turn already cancelled the previous one
+        if IsStopCommand(Query):
+            print("[MainExecution] Stopped by user")
+            SetAsssistantStatus("Available...")
+            return
+
         SetAsssistantStatus("Thinking...")
 
+        # Start a likely answer/search branch while Cohere decides
+        speculation = Speculate(Query, token)
         Decision = FirstLayerDMM(Query)
+        token.check()
         print(f"\nDecision from FirstLayerDMM: {Decision}\n")
 
         # FIX: If FirstLayerDMM returns empty, parse query directly
         if not Decision or Decision == []:
-            print("[Fix] FirstLayerDMM returned empty. Parsing query directly...")
-            Query_lower = Query.lower().strip()
-            
-            # Check for automation commands
-            if any(keyword in Query_lower for keyword in ["open", "close", "play", "start", "launch"]):
-                Decision = [Query_lower]
-                print(f"[Fix] Detected automation command: {Decision}")
-            
-            # Check for search commands
-            elif "search" in Query_lower:
-                if "youtube" in Query_lower:
-                    Decision = [Query_lower]
-                elif "google" in Query_lower:
-                    Decision = [Query_lower]
-                else:
-                    Decision = [f"google search {Query_lower.replace('search', '').strip()}"]
-                print(f"[Fix] Detected search command: {Decision}")
-            
-            # Check for content/notepad commands
-            elif any(keyword in Query_lower for keyword in ["write", "create", "type"]) and "notepad" in Query_lower:
-                Decision = [f"content {Query}"]
-                print(f"[Fix] Detected content command: {Decision}")
-            
-            # Check for exit commands
-            elif any(keyword in Query_lower for keyword in ["exit", "quit", "bye", "goodbye", "stop"]):
-                Decision = ["exit"]
-                print(f"[Fix] Detected exit command")
-            
-            # Otherwise treat as general query
-            else:
-                Decision = [f"general {Query}"]
-                print(f"[Fix] Treating as general query")
+            Decision = FallbackDecision(Query)
 
         print(f"\nFinal Decision: {Decision}\n")
 
-        # Define valid functions for automation
-        valid_functions = [
-            "open", "close", "play", "system", "content", 
-            "google search", "youtube search",
-            "open file", "edit file", "read file", "create file",
-            "delete file", "copy file", "move file", "rename file",
-            "list files", "file info"
-        ]
-        
         # Categorize commands
-        automation_commands = []
-        general_queries = []
-        realtime_queries = []
-        image_queries = []
-        
-        for cmd in Decision:
-            cmd_lower = cmd.lower()
-            
-            # Check if it's an automation command
-            if any(cmd_lower.startswith(func) for func in valid_functions):
-                automation_commands.append(cmd)
-            # Check for general queries
-            elif cmd_lower.startswith("general"):
-                general_queries.append(cmd.replace("general", "").strip())
-            # Check for realtime queries
-            elif cmd_lower.startswith("realtime"):
-                realtime_queries.append(cmd.replace("realtime", "").strip())
-            # Check for image generation
-            elif "generate" in cmd_lower or "image" in cmd_lower:
-                image_queries.append(cmd)
-            # Default to general query if no match
-            else:
-                general_queries.append(cmd)
+        ordered_tasks, groups = CategorizeDecision(Decision)
+        automation_commands = groups["automation"]
+        general_queries = groups["general"]
+        realtime_queries = groups["realtime"]
+        image_queries = groups["image"]
 
         print(f"Automation commands: {automation_commands}")
         print(f"General queries: {general_queries}")
         print(f"Realtime queries: {realtime_queries}")
         print(f"Image queries: {image_queries}\n")
 
-        # Execute automation commands
-        if automation_commands:
-            print(f"[MainExecution] Running automation with: {automation_commands}")
-            try:
-                run(Automation(automation_commands))
-                TaskExecution = True
-            except Exception as e:
-                print(f"[MainExecution] Automation error: {e}")
-                import traceback
-                traceback.print_exc()
-
-        # Handle image generation
-        if image_queries:
-            ImageGenerationQuery = image_queries[0]
-            ImageExecution = True
-            try:
-                with open(r'Frontend\Files\ImageGeneration.data', "w") as file:
-                    file.write(f"{ImageGenerationQuery},True")
-                
-                p1 = subprocess.Popen(
-                    ['python', r"Backend\ImageGeneration.py"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    stdin=subprocess.PIPE,
-                    shell=False,
-                )
-                subprocess_list.append(p1)
-                print(f"[MainExecution] Image generation started")
-            except Exception as e:
-                print(f"[MainExecution] Error starting ImageGeneration.py: {e}")
+        # Build the task graph for this request; independent branches run in parallel
+        graph = TaskGraph()
+        streams = {}   # node -> StreamBuffer of answer deltas
+        speeches = {}  # node -> SpeechStream speaking that answer
+
+        for category, payload in ordered_tasks:
+            if category == "automation":
+                print(f"[MainExecution] Running automation with: {automation_commands}")
+                graph.add(category, RunAutomation, payload)
+            elif category == "image":
+                graph.add(category, StartImageGeneration, payload)
+            elif speculation and speculation.matches(category, payload):
+                speculation.commit()
+                if category == "general":
+                    node = graph.add(category, speculation.answer)
+                    if StreamingAnswers:
+                        streams[node] = speculation.buffer
+                    continue
+                func = partial(RealtimeSearchEngine, Search=speculation.search_results)
+                if StreamingAnswers:
+                    buffer = StreamBuffer()
+                    node = graph.add(category, RunStreaming, func, QueryModifier(payload), buffer)
+                    streams[node] = buffer
+                else:
+                    graph.add(category, func, QueryModifier(payload))
+            elif category in ("general", "realtime"):
+                func = ChatBot if category == "general" else RealtimeSearchEngine
+                if StreamingAnswers:
+                    buffer = StreamBuffer()
+                    node = graph.add(category, RunStreaming, func, QueryModifier(payload), buffer)
+                    streams[node] = buffer
+                else:
+                    graph.add(category, func, QueryModifier(payload))
+
+        if speculation:
+            speculation.discard(f"decision was {Decision}")
+
+        def SpeakWhileStreaming(node):
+            """Speak and display an answer sentence by sentence while it streams"""
+            if node not in streams:
+                return
+            speech = SpeechStream(started_at)
+            speeches[node] = speech
+            text = ""
+            for delta in streams[node]:
+                if not text:
+                    SetAsssistantStatus("Answering...")
+                text += delta
+                speech.feed(delta)
+                ShowPartialTextToScreen(f"{Assistantname}: {text}")
+            speech.close(wait=False)
+
+        SetAsssistantStatus("Searching..." if realtime_queries else "Thinking...")
+
+        # Deliver results in the original order, each as soon as it is ready
+        for node, result, error in graph.results(before_wait=SpeakWhileStreaming):
+            if token.cancelled:
+                print(f"[MainExecution] Turn cancelled: {token.reason}")
+                return
+
+            if node.name == "automation":
+                if error:
+                    print(f"[MainExecution] Automation error: {error}")
+                else:
+                    TaskExecution = True
 
-        # Handle general queries
-        for query in general_queries:
-            try:
-                SetAsssistantStatus("Thinking...")
-                Answer = ChatBot(QueryModifier(query))
-                ShowTextToScreen(f"{Assistantname}: {Answer}")
-                SetAsssistantStatus("Answering...")
-                TextToSpeech(Answer)
-            except Exception as e:
-                print(f"[MainExecution] ChatBot error: {e}")
+            elif node.name == "image":
+                if error:
+                    print(f"[MainExecution] Error queuing image generation: {error}")
+                else:
+                    ImageExecution = True
 
-        # Handle realtime queries
-        for query in realtime_queries:
-            try:
-                SetAsssistantStatus("Searching...")
-                Answer = RealtimeSearchEngine(QueryModifier(query))
-                ShowTextToScreen(f"{Assistantname}: {Answer}")
-                SetAsssistantStatus("Answering...")
-                TextToSpeech(Answer)
-            except Exception as e:
-                print(f"[MainExecution] RealtimeSearch error: {e}")
+            elif error:
+                label = "ChatBot" if node.name == "general" else "RealtimeSearch"
+                print(f"[MainExecution] {label} error: {error}")
+                if node in speeches:
+                    speeches[node].wait()
+
+            else:
+                try:
+                    ShowTextToScreen(f"{Assistantname}: {result}")
+                    SetAsssistantStatus("Answering...")
+                    if node in speeches:
+                        speeches[node].wait()
+                    else:
+                        TextToSpeech(result)
+                except Exception as e:
+                    print(f"[MainExecution] TextToSpeech error: {e}")
 
         # Handle exit command
         if "exit" in [cmd.lower() for cmd in Decision]:
@@ -259,28 +252,51 @@ def MainExecution(query=None):
                 SetAsssistantStatus("Answering...")
                 TextToSpeech(Answer)
                 sleep(2)
+                FlushChatLogs()
+                FlushSpans()
                 os._exit(1)
             except Exception as e:
                 print(f"[MainExecution] Exit error: {e}")
+                FlushChatLogs()
+                FlushSpans()
                 os._exit(1)
 
         # Set back to available if no speaking required
         if not general_queries and not realtime_queries:
             SetAsssistantStatus("Available...")
 
+    except Cancelled as e:
+        print(f"[MainExecution] Turn cancelled: {e}")
     except Exception as e:
         print(f"[MainExecution] Critical error: {e}")
         import traceback
         traceback.print_exc()
         SetAsssistantStatus("Available...")
+    finally:
+        if speculation:
+            speculation.discard("turn ended")
+
+def ShowImageProgress(topic, event):
+    """Log image worker events published on the bus"""
+    if event["state"] == "done":
+        print(f"[ImageWorker] Job {event['job_id']} finished: {len(event['images'])} image(s)")
+    elif event["state"] == "failed":
+        print(f"[ImageWorker] Job {event['job_id']} failed")
+
+def StartImageJobs(show_images=True):
+    """Start the image worker, reporting its progress and completion on the event bus"""
+    StartImageWorker(on_event=lambda event: bus.publish(IMAGE, event), show_images=show_images)
+    bus.subscribe(IMAGE, ShowImageProgress)
 
 def FirstThread():
-    """Monitor microphone status and trigger MainExecution"""
+    """Wait for microphone status events and trigger MainExecution"""
     last_microphone_status = ""
     last_assistant_status = ""
 
     while True:
         try:
+            # Remember the version we acted on so the wait below wakes on the next change
+            mic_version, _ = bus.snapshot(MIC)
             CurrentStatus = GetMicrophoneStatus()
             AIStatus = GetAssistantStatus()
 
@@ -300,8 +316,7 @@ def FirstThread():
             else:
                 if "Available..." not in AIStatus:
                     SetAsssistantStatus("Available...")
-
-            sleep(1)
+                bus.wait(MIC, mic_version)
 
         except Exception as e:
             print(f"[FirstThread] Error: {e}")
@@ -309,10 +324,10 @@ def FirstThread():
             traceback.print_exc()
             sleep(1)
 
-def SecondThread():
+def SecondThread(on_shown=None):
     """Start the graphical user interface"""
     try:
-        GraphicalUserInterface()
+        GraphicalUserInterface(on_shown)
     except Exception as e:
         print(f"[SecondThread] Error: {e}")
         import traceback
@@ -324,24 +339,35 @@ if __name__ == "__main__":
     print("="*70 + "\n")
     
     try:
+        Mark("imports done")
+
+        # Image jobs report on the bus and open the finished images on this desktop
+        StartImageJobs()
+
         # Initialize the application
         InitialExecution()
-        
-        # Start hotword detection thread
-        print("[Main] Starting hotword detection...")
-        StartHotwordThread(MainExecution)
-        
+
+        def OnWindowShown():
+            """Warm up API clients, audio and the microphone once the window is on screen"""
+            Mark("window shown")
+            threading.Thread(target=LoadChatHistory, daemon=True, name="ChatHistory").start()
+            # Hotword detection starts once the microphone is ready
+            print("[Main] Warming up backends...")
+            StartWarmUp(on_done=lambda: StartHotwordThread(MainExecution))
+
         # Start monitoring thread
         print("[Main] Starting monitoring thread...")
         thread1 = threading.Thread(target=FirstThread, daemon=True)
         thread1.start()
         
-        # Start GUI (blocking)
+        # Start GUI (blocking); backends initialize in the background after it appears
         print("[Main] Starting GUI...")
-        SecondThread()
+        SecondThread(OnWindowShown)
         
     except KeyboardInterrupt:
         print("\n[Main] Shutting down gracefully...")
+        FlushChatLogs()
+        FlushSpans()
         os._exit(0)
     except Exception as e:
         print(f"[Main] Critical startup error: {e}")
@@ -0,0 +1,455 @@
+"""
+Network server mode: serve several users and devices from one box.
+
+    python Server.py [--host 127.0.0.1] [--port 8765]
+
+Endpoints (every session has its own chat history under Data/Sessions/<id>/):
+    GET  /health                     server status
+    GET  /history?session=<id>       the session's conversation
+    POST /query                      {"session": "<id>", "query": "..."}; streams
+                                     newline-delimited JSON events back
+    GET  /ws?session=<id>            WebSocket; send {"query": "..."} (or plain
+                                     text) and receive the same JSON events
+
+Events: {"type": "decision"}, {"type": "delta", "task", "text"},
+{"type": "result", "task", "result"}, {"type": "error", ...} and finally
+{"type": "done", "cancelled"} once every task of the query has finished.
+A new query on the same session (or WebSocket) cancels the one still running.
+Sessions idle for ServerSessionIdleTimeout are forgotten; their history stays on disk.
+
+Automation (opening/closing apps, system commands) is off unless
+ServerAutomation=True, and even then only while the server listens on a
+loopback address: there is no authentication.
+
+The backends are synchronous, so each query runs on a worker thread; the
+event loop only moves bytes. A slow client fills its bounded event queue,
+which pauses the worker that is producing for it.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+from dotenv import dotenv_values
+from Backend.Model import FirstLayerDMM
+from Backend.Chatbot import ChatBot
+from Backend.RealtimeSearchEngine import RealtimeSearchEngine
+from Backend.ImageGeneration import StartImageWorker
+from Backend.ChatLog import ReadChatLog, CloseChatLog
+from Backend.Routing import QueryModifier, FallbackDecision, CategorizeDecision, RunAutomation, RunStreaming, StartImageGeneration
+from Backend.TaskGraph import TaskGraph
+from Backend.Streaming import StreamBuffer
+from Backend.Tracing import Span
+from Backend.Cancellation import TurnManager, current_token
+import ipaddress
+import argparse
+import asyncio
+import hashlib
+import base64
+import struct
+import json
+import time
+import os
+import re
+
+# Load environment variables
+env_vars = dotenv_values(".env")
+ServerHost = env_vars.get("ServerHost", "127.0.0.1")
+ServerPort = int(env_vars.get("ServerPort", 8765))
+MaxConnections = int(env_vars.get("ServerMaxConnections", 32))
+EventQueueSize = int(env_vars.get("ServerEventQueueSize", 64))
+MaxBodySize = int(env_vars.get("ServerMaxBodySize", 64 * 1024))
+RequestTimeout = float(env_vars.get("ServerRequestTimeout", 30))
+# Off by default: any client that can reach the server could open apps and run commands
+AllowAutomation = env_vars.get("ServerAutomation", "False").lower() == "true"
+SessionIdleTimeout = float(env_vars.get("ServerSessionIdleTimeout", 30 * 60))
+
+SessionsDirPath = os.path.join("Data", "Sessions")
+SessionIdPattern = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+WebSocketGUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+StatusText = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+              413: "Payload Too Large", 503: "Service Unavailable"}
+
+# One thread per connection at most; the task graph pool bounds the backend work itself
+turn_executor = ThreadPoolExecutor(max_workers=MaxConnections, thread_name_prefix="ServerTurn")
+
+# Set by Serve(): AllowAutomation, and only on a loopback address
+automation_enabled = False
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ==================== SESSIONS ====================
+
+class Session:
+    """Conversation state of one user/device"""
+
+    def __init__(self, session_id):
+        self.id = session_id
+        self.log_path = os.path.join(SessionsDirPath, session_id, "ChatLog.jsonl")
+        # One query at a time per session so its history stays in order;
+        # a new query cancels the one still running
+        self.lock = asyncio.Lock()
+        self.turns = TurnManager()
+        self.last_seen = time.time()
+        self.users = 0  # open WebSockets and running queries; a session in use is never evicted
+
+
+sessions = {}
+
+
+def GetSession(session_id):
+    if not session_id or not SessionIdPattern.match(session_id):
+        raise HttpError(400, "session must be 1-64 letters, digits, '-' or '_'")
+    if session_id not in sessions:
+        sessions[session_id] = Session(session_id)
+    session = sessions[session_id]
+    session.last_seen = time.time()
+    return session
+
+
+async def EvictIdleSessions():
+    """Forget sessions unused for SessionIdleTimeout seconds and close their chat logs"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(min(60, SessionIdleTimeout))
+        now = time.time()
+        for session_id, session in list(sessions.items()):
+            if session.users or now - session.last_seen < SessionIdleTimeout:
+                continue
+            del sessions[session_id]
+            await loop.run_in_executor(turn_executor, CloseChatLog, session.log_path)
+            print(f"[Server] Session {session_id} idle, evicted")
+
+
+def IsLoopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# ==================== QUERY EXECUTION ====================
+
+def RunTurn(session, query, emit, token):
+    """
+    Route one query through FirstLayerDMM and the backends (runs on a worker thread).
+    `emit(event)` blocks while the client's event queue is full.
+    """
+    reset = current_token.set(token)
+    try:
+        with Span("server.turn", session=session.id):
+            Decision = FirstLayerDMM(query)
+            if not Decision:
+                Decision = FallbackDecision(query)
+            emit({"type": "decision", "decision": Decision})
+
+            ordered_tasks, groups = CategorizeDecision(Decision)
+            graph = TaskGraph()
+            streams = {}
+
+            for category, payload in ordered_tasks:
+                if category == "automation":
+                    if automation_enabled:
+                        graph.add(category, RunAutomation, payload)
+                    else:
+                        emit({"type": "error", "task": category, "error": "Automation is disabled on this server"})
+                elif category == "image":
+                    graph.add(category, StartImageGeneration, payload)
+                elif category in ("general", "realtime"):
+                    func = partial(ChatBot if category == "general" else RealtimeSearchEngine, LogPath=session.log_path)
+                    buffer = StreamBuffer()
+                    node = graph.add(category, RunStreaming, func, QueryModifier(payload), buffer)
+                    streams[node] = buffer
+
+            def ForwardDeltas(node):
+                if node in streams:
+                    for delta in streams[node]:
+                        emit({"type": "delta", "task": node.name, "text": delta})
+
+            for node, result, error in graph.results(before_wait=ForwardDeltas):
+                if error:
+                    emit({"type": "error", "task": node.name, "error": str(error)})
+                else:
+                    emit({"type": "result", "task": node.name, "result": result})
+    except Exception as e:
+        print(f"[Server] Error in session {session.id}: {e}")
+        emit({"type": "error", "error": str(e)})
+    finally:
+        current_token.reset(reset)
+        session.turns.end(token)
+        emit({"type": "done", "cancelled": token.cancelled})
+
+
+async def StreamTurn(session, query, send, token=None):
+    """
+    Run a query on a worker thread and pass its events to `send(event)` as they arrive.
+    `token` is the turn's CancelToken if the caller already began the turn.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue(maxsize=EventQueueSize)
+
+    def emit(event):
+        asyncio.run_coroutine_threadsafe(events.put(event), loop).result()
+
+    token = token or session.turns.begin()
+    session.users += 1
+    try:
+        async with session.lock:
+            worker = loop.run_in_executor(turn_executor, RunTurn, session, query, emit, token)
+            client_gone = False
+            while True:
+                event = await events.get()
+                if not client_gone:
+                    try:
+                        await send(event)
+                    except (ConnectionError, asyncio.IncompleteReadError):
+                        # Stop the work and keep draining so the worker is never stuck on a full queue
+                        client_gone = True
+                        token.cancel("client disconnected")
+                if event["type"] == "done":
+                    break
+            await worker
+    finally:
+        session.users -= 1
+        session.last_seen = time.time()
+
+
+# ==================== HTTP ====================
+
+async def ReadRequest(reader):
+    """Return (method, path, query_params, headers, body)"""
+    request_line = await reader.readline()
+    if not request_line:
+        raise ConnectionError("Client closed the connection")
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0) or 0)
+    if length > MaxBodySize:
+        raise HttpError(413, f"Body larger than {MaxBodySize} bytes")
+    body = await reader.readexactly(length) if length else b""
+
+    url = urlsplit(target)
+    params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    return method.upper(), url.path, params, headers, body
+
+
+async def SendResponse(writer, status, payload, content_type="application/json"):
+    body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} {StatusText.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+        + body
+    )
+    await writer.drain()
+
+
+async def HandleQuery(writer, body):
+    """POST /query: stream the events as chunked newline-delimited JSON"""
+    try:
+        request = json.loads(body or b"{}")
+    except ValueError:
+        raise HttpError(400, "Body must be JSON")
+    query = str(request.get("query", "")).strip()
+    if not query:
+        raise HttpError(400, "query is required")
+    session = GetSession(str(request.get("session", "")))
+
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                 b"Transfer-Encoding: chunked\r\nConnection: close\r\n\r\n")
+
+    async def send(event):
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        writer.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        await writer.drain()
+
+    await StreamTurn(session, query, send)
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+# ==================== WEBSOCKET ====================
+
+async def ReadFrame(reader):
+    """Return (opcode, payload) of the next client frame"""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > MaxBodySize:
+        raise HttpError(413, "Frame too large")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return opcode, payload
+
+
+def EncodeFrame(opcode, payload):
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack("!H", length)
+    else:
+        header += bytes([127]) + struct.pack("!Q", length)
+    return header + payload
+
+
+async def HandleWebSocket(reader, writer, params, headers):
+    """
+    GET /ws: one session per connection. Frames are read while a query runs,
+    so a new query cancels the running one instead of waiting behind it.
+    """
+    key = headers.get("sec-websocket-key")
+    if headers.get("upgrade", "").lower() != "websocket" or not key:
+        raise HttpError(400, "Expected a WebSocket upgrade")
+    session = GetSession(params.get("session", ""))
+
+    accept = base64.b64encode(hashlib.sha1((key + WebSocketGUID).encode()).digest()).decode()
+    writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+
+    async def send(event):
+        writer.write(EncodeFrame(0x1, json.dumps(event, ensure_ascii=False).encode("utf-8")))
+        await writer.drain()
+
+    running = {}  # task -> CancelToken of this connection's queries
+    session.users += 1
+    try:
+        while True:
+            try:
+                opcode, payload = await ReadFrame(reader)
+            except HttpError as e:
+                # Past the handshake an HTTP response would corrupt the stream: close with 1009 (message too big)
+                writer.write(EncodeFrame(0x8, struct.pack("!H", 1009) + str(e).encode("utf-8")))
+                await writer.drain()
+                return
+            if opcode == 0x8:  # close
+                writer.write(EncodeFrame(0x8, payload[:2]))
+                await writer.drain()
+                return
+            if opcode == 0x9:  # ping
+                writer.write(EncodeFrame(0xA, payload))
+                await writer.drain()
+                continue
+            if opcode != 0x1:
+                continue
+
+            text = payload.decode("utf-8", "replace").strip()
+            try:
+                query = str(json.loads(text).get("query", "")).strip()
+            except (ValueError, AttributeError):
+                query = text
+            if query:
+                session.last_seen = time.time()
+                # Beginning the turn here cancels the running query right away
+                token = session.turns.begin()
+                task = asyncio.ensure_future(StreamTurn(session, query, send, token))
+                running[task] = token
+                task.add_done_callback(lambda done: running.pop(done, None))
+    finally:
+        session.users -= 1
+        for token in list(running.values()):
+            token.cancel("client disconnected")
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+
+# ==================== CONNECTIONS ====================
+
+connection_slots = None
+active_connections = 0
+
+
+async def HandleConnection(reader, writer):
+    # Refuse instead of queueing once every slot is taken
+    if connection_slots.locked():
+        await SendResponse(writer, 503, {"error": "Server busy, try again shortly"})
+        writer.close()
+        return
+
+    global active_connections
+    async with connection_slots:
+        active_connections += 1
+        try:
+            method, path, params, headers, body = await asyncio.wait_for(ReadRequest(reader), RequestTimeout)
+
+            if path == "/health" and method == "GET":
+                await SendResponse(writer, 200, {
+                    "status": "ok",
+                    "sessions": len(sessions),
+                    "connections": active_connections,
+                })
+            elif path == "/history" and method == "GET":
+                session = GetSession(params.get("session", ""))
+                # Reading the log touches the disk; keep it off the event loop
+                messages = await asyncio.get_running_loop().run_in_executor(turn_executor, ReadChatLog, session.log_path)
+                await SendResponse(writer, 200, {"session": session.id, "messages": messages})
+            elif path == "/query":
+                if method != "POST":
+                    raise HttpError(405, "Use POST")
+                await HandleQuery(writer, body)
+            elif path == "/ws":
+                await HandleWebSocket(reader, writer, params, headers)
+            else:
+                raise HttpError(404, f"No route for {path}")
+
+        except HttpError as e:
+            try:
+                await SendResponse(writer, e.status, {"error": str(e)})
+            except ConnectionError:
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        except Exception as e:
+            print(f"[Server] Error handling connection: {e}")
+        finally:
+            active_connections -= 1
+            writer.close()
+
+
+async def Serve(host=ServerHost, port=ServerPort):
+    global connection_slots, automation_enabled
+    connection_slots = asyncio.Semaphore(MaxConnections)
+    automation_enabled = AllowAutomation and IsLoopback(host)
+    if AllowAutomation and not automation_enabled:
+        print(f"[Server] ServerAutomation ignored: {host} is not a loopback address and clients are not authenticated")
+    StartImageWorker()
+    asyncio.ensure_future(EvictIdleSessions())
+    server = await asyncio.start_server(HandleConnection, host, port)
+    print(f"[Server] Listening on http://{host}:{port} (max {MaxConnections} connections)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the assistant over HTTP/WebSocket")
+    parser.add_argument("--host", default=ServerHost)
+    parser.add_argument("--port", type=int, default=ServerPort)
+    args = parser.parse_args()
+    try:
+        asyncio.run(Serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n[Server] Shutting down...")